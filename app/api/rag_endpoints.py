@@ -0,0 +1,279 @@
+# Unity项目问答（RAG）API
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+
+from app.core.config import settings
+from app.models.schemas import RAGAskRequest, RAGBatchRequest, RAGIndexRequest, RAGSearchRequest
+from app.services.batch_runner import BatchQARunner, completed_ids
+from app.services.unity_rag_system import UnityRAGSystem
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/rag", tags=["rag"])
+
+# 每个项目路径一个常驻的 UnityRAGSystem（模型、索引、连接池在请求之间复用）
+_rag_systems: Dict[str, UnityRAGSystem] = {}
+_registry_lock = threading.Lock()
+
+# 启动预热状态：pending / warming / ready / failed / disabled
+_warmup: Dict = {'state': 'pending', 'error': None, 'seconds': None}
+
+# 本进程内提交的批量问答任务：任务ID -> {'runner', 'task', 'project', 'error', 'summary'}
+_batch_jobs: Dict[str, Dict] = {}
+_JOB_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+
+def _configured_projects() -> Dict[str, str]:
+    """允许访问的项目：绝对路径 -> 配置中的写法"""
+    paths = [settings.RAG_PROJECT_PATH, *settings.RAG_PROJECT_PATHS]
+    return {os.path.abspath(path): path for path in paths if path}
+
+
+def _resolve_project(project_path: Optional[str]) -> str:
+    key = os.path.abspath(project_path or settings.RAG_PROJECT_PATH)
+    if key not in _configured_projects():
+        raise HTTPException(status_code=404, detail=f"未配置的Unity项目: {project_path}")
+    return key
+
+
+def _persist_directory(project_key: str) -> str:
+    """默认项目沿用 RAG_PERSIST_DIRECTORY，其他项目各用一个子目录，互不覆盖索引"""
+    if project_key == os.path.abspath(settings.RAG_PROJECT_PATH):
+        return settings.RAG_PERSIST_DIRECTORY
+    digest = hashlib.blake2b(project_key.encode('utf-8'), digest_size=4).hexdigest()
+    name = os.path.basename(project_key.rstrip(os.sep)) or "project"
+    return os.path.join(settings.RAG_PERSIST_DIRECTORY, f"{name}-{digest}")
+
+
+def _get_or_create(project_key: str) -> UnityRAGSystem:
+    """创建系统会加载嵌入模型，在线程中执行；加锁保证每个项目只创建一次"""
+    with _registry_lock:
+        rag_system = _rag_systems.get(project_key)
+        if rag_system is None:
+            rag_system = UnityRAGSystem(project_key, persist_directory=_persist_directory(project_key))
+            _rag_systems[project_key] = rag_system
+        return rag_system
+
+
+async def get_rag_system(project_path: Optional[str] = None, initialize: bool = True) -> UnityRAGSystem:
+    """获取（首次调用时创建并初始化）项目的RAG系统；并发的首次请求共享同一次初始化"""
+    project_key = _resolve_project(project_path)
+    rag_system = _rag_systems.get(project_key)
+    if rag_system is None:
+        rag_system = await asyncio.get_running_loop().run_in_executor(None, _get_or_create, project_key)
+    if initialize:
+        await rag_system.initialize()
+    return rag_system
+
+
+async def warm_up():
+    """应用启动时预热：创建默认项目的系统、打开 / 构建索引、加载嵌入（与重排）模型并跑一次检索"""
+    if not settings.RAG_WARMUP_ENABLED:
+        _warmup['state'] = 'disabled'
+        return
+    _warmup['state'] = 'warming'
+    start = time.perf_counter()
+    try:
+        rag_system = await get_rag_system()
+        if rag_system.reranker is not None:
+            await rag_system.executor.run(lambda: rag_system.reranker.available)
+        await rag_system.search("warm up", n_results=1)
+    except Exception as e:
+        _warmup.update(state='failed', error=str(e))
+        logger.error(f"❌ RAG预热失败: {e}")
+        return
+    _warmup.update(state='ready', seconds=round(time.perf_counter() - start, 3))
+    logger.info(f"🔥 RAG预热完成: {rag_system.unity_project_path} ({_warmup['seconds']}s)")
+
+
+async def shutdown():
+    """应用退出时停止批量任务，关闭所有系统的大模型连接与线程池"""
+    running = [job['task'] for job in _batch_jobs.values() if not job['task'].done()]
+    for task in running:
+        task.cancel()
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+    for rag_system in list(_rag_systems.values()):
+        try:
+            await rag_system.close()
+        except Exception as e:
+            logger.warning(f"⚠️ 关闭RAG系统失败: {e}")
+    _rag_systems.clear()
+
+
+def _sse(event: Dict) -> str:
+    """一个事件编码为一条 SSE 消息（event 名即事件类型）"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def _stream_answer(rag_system: UnityRAGSystem, question: str,
+                         file_types: Optional[List[str]]) -> AsyncIterator[str]:
+    try:
+        async for event in rag_system.ask_stream(question, file_types):
+            yield _sse(event)
+    except Exception as e:
+        logger.error(f"❌ 流式问答失败: {e}")
+        yield _sse({'type': 'error', 'message': str(e)})
+
+
+async def _sse_response(question: str, file_types: Optional[List[str]],
+                        project_path: Optional[str] = None) -> StreamingResponse:
+    rag_system = await get_rag_system(project_path, initialize=False)
+    return StreamingResponse(
+        _stream_answer(rag_system, question, file_types),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ask")
+async def ask(request: RAGAskRequest):
+    """问答：返回完整回答与引用的来源"""
+    rag_system = await get_rag_system(request.project_path)
+    try:
+        return await rag_system.ask_about_unity_project(request.question, request.file_types)
+    except Exception as e:
+        logger.error(f"❌ 问答失败: {e}")
+        raise HTTPException(status_code=500, detail=f"问答失败: {str(e)}")
+
+
+@router.post("/ask/stream")
+async def ask_stream(request: RAGAskRequest):
+    """流式问答（SSE）：先推送 sources 事件，再推送 token 事件，最后 done 事件带 ttft_ms / total_ms"""
+    return await _sse_response(request.question, request.file_types, request.project_path)
+
+
+@router.get("/ask/stream")
+async def ask_stream_get(question: str = Query(..., min_length=1, max_length=2000),
+                         file_types: Optional[List[str]] = Query(default=None)):
+    """与 POST 相同，供浏览器 EventSource 直接订阅"""
+    return await _sse_response(question, file_types)
+
+
+@router.post("/search")
+async def search(request: RAGSearchRequest):
+    """只检索不回答：返回命中的文本块（文件、类型、分数、内容）"""
+    rag_system = await get_rag_system(request.project_path)
+    results = await rag_system.search(request.query, request.n_results, request.file_types)
+    return {'query': request.query, 'results': results}
+
+
+@router.get("/index")
+async def index_status(project_path: Optional[str] = None):
+    """索引状态：是否就绪、当前集合、重建代数、文本块数、是否正在重建"""
+    rag_system = await get_rag_system(project_path, initialize=False)
+    return await rag_system.executor.run(rag_system.index_status)
+
+
+@router.post("/index")
+async def rebuild_index(request: RAGIndexRequest):
+    """重建索引；background=True 时立即返回，重建期间查询继续由旧索引提供"""
+    rag_system = await get_rag_system(request.project_path, initialize=False)
+    if not rag_system.is_initialized:
+        await rag_system.initialize()
+        status = 'initialized'
+    elif request.background:
+        await rag_system.reinitialize(background=True)
+        status = 'rebuilding'
+    else:
+        await rag_system.reinitialize()
+        status = 'rebuilt'
+    return {'status': status, **(await rag_system.executor.run(rag_system.index_status))}
+
+
+@router.get("/ready")
+async def readiness():
+    """就绪探针：预热完成（默认项目的模型与索引已加载）前返回503，负载均衡据此决定是否转发流量"""
+    rag_system = _rag_systems.get(os.path.abspath(settings.RAG_PROJECT_PATH))
+    ready = _warmup['state'] == 'disabled' or (
+        _warmup['state'] == 'ready' and rag_system is not None and rag_system.is_initialized
+    )
+    content = {'ready': ready, 'warmup': _warmup}
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+
+def _batch_paths(job_id: str) -> Dict[str, str]:
+    return {
+        'input': os.path.join(settings.RAG_BATCH_DIR, f"{job_id}.input.jsonl"),
+        'output': os.path.join(settings.RAG_BATCH_DIR, f"{job_id}.output.jsonl")
+    }
+
+
+def _write_batch_input(path: str, items: List[Dict]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def _batch_finished(job_id: str, task: asyncio.Task):
+    job = _batch_jobs.get(job_id)
+    if job is None or task.cancelled():
+        return
+    if task.exception() is not None:
+        job['error'] = str(task.exception())
+        logger.error(f"❌ 批量问答任务 {job_id} 失败: {job['error']}")
+    else:
+        job['summary'] = task.result()
+
+
+@router.post("/batch")
+async def submit_batch(request: RAGBatchRequest):
+    """提交批量问答任务，立即返回任务ID；传入已有任务ID时从断点继续"""
+    job_id = request.job_id or uuid.uuid4().hex[:12]
+    job = _batch_jobs.get(job_id)
+    if job is not None and not job['task'].done():
+        raise HTTPException(status_code=409, detail=f"批量问答任务 {job_id} 正在运行")
+
+    rag_system = await get_rag_system(request.project_path, initialize=False)
+    paths = _batch_paths(job_id)
+    items = [item.model_dump(exclude_none=True) for item in request.items]
+    await rag_system.executor.run(_write_batch_input, paths['input'], items)
+
+    runner = BatchQARunner(rag_system, max_concurrency=request.max_concurrency, rate_limit=request.rate_limit)
+    task = asyncio.create_task(runner.run(paths['input'], paths['output']))
+    _batch_jobs[job_id] = {
+        'runner': runner, 'task': task, 'project': rag_system.unity_project_path,
+        'error': None, 'summary': None
+    }
+    task.add_done_callback(lambda finished: _batch_finished(job_id, finished))
+    return {'job_id': job_id, 'status': 'running', 'total': len(items)}
+
+
+@router.get("/batch/{job_id}")
+async def batch_status(job_id: str = Path(..., pattern=_JOB_ID_PATTERN)):
+    """批量问答进度：总数、已跳过、成功、失败、命中缓存、省掉的检索次数；结束后附带汇总"""
+    job = _batch_jobs.get(job_id)
+    if job is None:
+        # 之前进程中的任务：只能报告已完成的数量，重新提交同一任务ID即可续跑
+        output_path = _batch_paths(job_id)['output']
+        if not os.path.exists(output_path):
+            raise HTTPException(status_code=404, detail=f"批量问答任务不存在: {job_id}")
+        completed = await asyncio.get_running_loop().run_in_executor(None, completed_ids, output_path)
+        return {'job_id': job_id, 'state': 'stopped', 'done': len(completed)}
+
+    task = job['task']
+    progress = dict(job['runner'].progress)
+    if task.done():
+        progress['state'] = 'cancelled' if task.cancelled() else ('failed' if job['error'] else 'finished')
+    return {'job_id': job_id, 'project': job['project'], **progress,
+            'error': job['error'], 'summary': job['summary']}
+
+
+@router.get("/batch/{job_id}/results")
+async def batch_results(job_id: str = Path(..., pattern=_JOB_ID_PATTERN)):
+    """批量问答结果（JSONL，运行中也可下载已完成的部分；同一ID有多行时以最后一行为准）"""
+    output_path = _batch_paths(job_id)['output']
+    if not os.path.exists(output_path):
+        raise HTTPException(status_code=404, detail=f"批量问答任务没有结果: {job_id}")
+    return FileResponse(output_path, media_type="application/x-ndjson", filename=f"{job_id}.jsonl")
@@ -1,5 +1,6 @@
 # 配置文件
 import os
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,5 +13,72 @@ class Settings(BaseSettings):
     # 应用配置
     PROJECT_TEMP_DIR: str = "temp_projects"
     MAX_PROJECT_SIZE: int = 50 * 1024 * 1024  # 50MB
+    
+    # Unity RAG配置
+    RAG_PROJECT_PATH: str = "unity_projects/ShootBubble"  # API / Web界面默认问答的Unity项目
+    RAG_PROJECT_PATHS: List[str] = []  # API 允许访问的其他Unity项目（索引存放在持久化目录下按项目区分的子目录）
+    RAG_WARMUP_ENABLED: bool = True  # 应用启动时预加载模型与索引，完成前就绪探针返回503
+    RAG_VECTOR_BACKEND: str = "chroma"  # chroma / numpy
+    RAG_PERSIST_DIRECTORY: str = "./chroma_unity_db"
+    RAG_SNAPSHOT_PATH: str = ""  # 索引快照文件；存在时启动直接加载快照而不重建索引
+    RAG_STARTUP_FAST_PATH: bool = True  # 项目指纹 / 嵌入模型 / 分割器版本未变时直接打开已持久化的索引
+    RAG_EXECUTOR_WORKERS: int = 4  # 检索 / 嵌入线程池大小
+    RAG_EXECUTOR_QUEUE: int = 64  # 线程池最多排队的任务数，超出时调用方异步等待
+    RAG_EMBEDDING_BACKEND: str = "sentence_transformer"  # sentence_transformer / hashing
+    RAG_EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    RAG_HASHING_DIM: int = 384
+    RAG_QUERY_CACHE_SIZE: int = 1024
+    RAG_RESULT_CACHE_SIZE: int = 512
+    RAG_QUERY_CACHE_TTL: int = 3600  # 秒
+    RAG_WRITE_BATCH_SIZE: int = 1000
+    RAG_HNSW_SPACE: str = "cosine"  # cosine / ip / l2
+    RAG_HNSW_M: int = 16
+    RAG_HNSW_CONSTRUCTION_EF: int = 100
+    RAG_HNSW_SEARCH_EF: int = 64
+    RAG_HYBRID_ENABLED: bool = True  # BM25 + 向量混合检索
+    RAG_HYBRID_CANDIDATES: int = 30  # 每路检索的候选数
+    RAG_RRF_K: int = 60
+    RAG_SYMBOL_FAST_PATH: bool = True  # 问题点名符号时直接走符号索引
+    RAG_ROUTER_ENABLED: bool = True  # 未指定文件类型时自动选择检索范围与策略
+    RAG_ROUTER_MIN_CONFIDENCE: float = 0.6  # 路由模型置信度低于该值时不过滤
+    RAG_ROUTER_MIN_RESULTS: int = 3  # 过滤后结果少于该值时改为不过滤重新检索
+    RAG_ROUTER_VECTOR_STRATEGY: bool = False  # 纯自然语言问题只走向量检索（默认仍用混合检索，见检索质量评测）
+    RAG_BITMAP_FILTER: bool = True  # 元数据过滤先经位图索引解析为行集合
+    RAG_PREFILTER_EXACT_MAX: int = 2000  # 命中行数不超过该值时做预过滤精确检索
+    RAG_PREFILTER_CACHE_SIZE: int = 32  # 缓存的候选向量块个数
+    RAG_RERANK_ENABLED: bool = False  # 交叉编码器重排（需要 sentence-transformers）
+    RAG_RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RAG_RERANK_CANDIDATES: int = 30  # 第一阶段多取的候选数 K
+    RAG_RERANK_TOP_N: int = 5  # 重排后送入提示词的块数 N
+    RAG_RERANK_BUDGET_MS: float = 300  # 重排延迟预算（毫秒），0 表示不限制
+    RAG_RERANK_CACHE_SIZE: int = 4096
+    RAG_RERANK_MAX_CHARS: int = 1024  # 每个候选参与打分的最大字符数
+    RAG_MMR_ENABLED: bool = False  # 最大边际相关性选择，去掉重叠 / 同文件的冗余块（默认关闭，保持前10块的行为）
+    RAG_MMR_CANDIDATES: int = 20  # MMR 的候选池大小
+    RAG_MMR_TOP_N: int = 6  # MMR 选出送入提示词的块数
+    RAG_MMR_LAMBDA: float = 0.7  # 1 = 只看相关性，越小越偏向多样性
+    RAG_MMR_PER_FILE_CAP: int = 3  # 同一文件最多选的块数，0 表示不限制
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1000  # 提示词上下文的 token 预算（按目标模型的上下文窗口调整），0 表示不限制
+    RAG_CONTEXT_MIN_TOKENS: int = 48  # 剩余预算不少于此值时截断装入，否则丢弃该段
+    RAG_LLM_BASE_URL: str = "https://api.openai.com/v1"  # OpenAI 兼容接口地址（可指向本地桩服务器）
+    RAG_LLM_MODEL: str = "gpt-3.5-turbo"
+    RAG_LLM_TIMEOUT: float = 60  # 单次请求总超时（秒）
+    RAG_LLM_CONNECT_TIMEOUT: float = 10
+    RAG_LLM_MAX_CONCURRENCY: int = 8  # 同时进行的大模型请求数
+    RAG_LLM_MAX_RETRIES: int = 3
+    RAG_LLM_BACKOFF_BASE: float = 0.5  # 重试退避基数（秒），按 2^n 增长并加全抖动
+    RAG_LLM_BACKOFF_MAX: float = 8
+    RAG_LLM_POOL_SIZE: int = 16  # HTTP 连接池上限
+    RAG_LLM_KEEPALIVE: float = 30  # 空闲连接保持时间（秒）
+    RAG_ANSWER_CACHE_ENABLED: bool = True  # 语义回答缓存：相似问题 + 相同检索上下文时复用回答
+    RAG_ANSWER_CACHE_PATH: str = ""  # 默认 <RAG_PERSIST_DIRECTORY>/answer_cache.sqlite3
+    RAG_ANSWER_CACHE_SIZE: int = 2048
+    RAG_ANSWER_CACHE_TTL: int = 7 * 24 * 3600  # 秒
+    RAG_ANSWER_CACHE_THRESHOLD: float = 0.92  # 问题向量的最低余弦相似度
+    RAG_BATCH_SIZE: int = 32  # 批量问答每批检索的问题数
+    RAG_BATCH_CONCURRENCY: int = 8  # 批量问答同时进行的大模型调用数
+    RAG_BATCH_RATE_LIMIT: float = 0  # 批量问答每秒最多发起的大模型调用数，0 表示不限速
+    RAG_BATCH_DEDUPE_THRESHOLD: float = 0.97  # 同一批内问题向量余弦不低于此值时共用检索结果
+    RAG_BATCH_DIR: str = "batch_jobs"  # API 提交的批量问答任务的输入 / 结果文件目录
 
 settings = Settings()
\ No newline at end of file
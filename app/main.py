@@ -1,4 +1,6 @@
 # FastAPI应用入口
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -33,12 +35,33 @@ except ImportError as e:
     async def test():
         return {"message": "基础API工作正常"}
 
+try:
+    from app.api import rag_endpoints
+    rag_router = rag_endpoints.router
+except ImportError as e:
+    logger.error(f"❌ RAG接口导入失败: {e}")
+    rag_endpoints = None
+    rag_router = None
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """启动时在后台预热RAG（模型与索引），/health 立即可用，/api/v1/rag/ready 预热完成后才返回200"""
+    warmup_task = None
+    if rag_endpoints is not None:
+        warmup_task = asyncio.create_task(rag_endpoints.warm_up())
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if rag_endpoints is not None:
+        await rag_endpoints.shutdown()
+
 def create_application() -> FastAPI:
     """创建FastAPI应用实例"""
     application = FastAPI(
         title="Unity AI Generator",
         description="基于阿里通义大模型的Unity项目智能生成系统",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
     
     # 配置CORS中间件
@@ -56,6 +79,8 @@ def create_application() -> FastAPI:
     
     # 包含API路由
     application.include_router(api_router, prefix="/api/v1")
+    if rag_router is not None:
+        application.include_router(rag_router, prefix="/api/v1")
     
     # 创建必要的目录
     required_dirs = ["temp_projects", "logs", "static/css", "static/js", "templates"]
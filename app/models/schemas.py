@@ -39,4 +39,106 @@ class GameGenerationRequest(BaseModel):
                 "include_assets": True,
                 "asset_style": "pixel_art"
             }
-        }
\ No newline at end of file
+        }
+
+class RAGAskRequest(BaseModel):
+    """Unity项目问答请求模型"""
+    question: str = Field(
+        ...,
+        min_length=1,
+        max_length=2000,
+        description="关于Unity项目的问题",
+        examples=["玩家点击气泡后会发生什么？"]
+    )
+    file_types: Optional[List[str]] = Field(
+        default=None,
+        description="只在这些文件类型中检索",
+        examples=[["code", "prefab"]]
+    )
+    project_path: Optional[str] = Field(
+        default=None,
+        description="Unity项目路径，默认 RAG_PROJECT_PATH（只能是已配置的项目）"
+    )
+
+class RAGSearchRequest(BaseModel):
+    """Unity项目检索请求模型（不调用大模型）"""
+    query: str = Field(
+        ...,
+        min_length=1,
+        max_length=2000,
+        description="检索内容（问题、类名、方法名等）",
+        examples=["BubbleManager.Update"]
+    )
+    n_results: int = Field(
+        default=10,
+        ge=1,
+        le=50,
+        description="返回的文本块数"
+    )
+    file_types: Optional[List[str]] = Field(
+        default=None,
+        description="只在这些文件类型中检索",
+        examples=[["code"]]
+    )
+    project_path: Optional[str] = Field(
+        default=None,
+        description="Unity项目路径，默认 RAG_PROJECT_PATH（只能是已配置的项目）"
+    )
+
+class RAGIndexRequest(BaseModel):
+    """Unity项目重建索引请求模型"""
+    project_path: Optional[str] = Field(
+        default=None,
+        description="Unity项目路径，默认 RAG_PROJECT_PATH（只能是已配置的项目）"
+    )
+    background: bool = Field(
+        default=True,
+        description="是否在后台重建（重建期间继续使用旧索引回答），否则等待重建完成"
+    )
+
+class RAGBatchItem(BaseModel):
+    """批量问答中的一个问题"""
+    id: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="问题ID，默认按问题与文件类型生成"
+    )
+    question: str = Field(
+        ...,
+        min_length=1,
+        max_length=2000,
+        description="关于Unity项目的问题"
+    )
+    file_types: Optional[List[str]] = Field(
+        default=None,
+        description="只在这些文件类型中检索"
+    )
+
+class RAGBatchRequest(BaseModel):
+    """Unity项目批量问答请求模型（后台执行，按任务ID查询进度与结果）"""
+    items: List[RAGBatchItem] = Field(
+        ...,
+        min_length=1,
+        max_length=5000,
+        description="问题列表"
+    )
+    job_id: Optional[str] = Field(
+        default=None,
+        pattern=r"^[A-Za-z0-9_-]{1,64}$",
+        description="任务ID；传入已有任务的ID会从断点继续，跳过已完成的问题"
+    )
+    project_path: Optional[str] = Field(
+        default=None,
+        description="Unity项目路径，默认 RAG_PROJECT_PATH（只能是已配置的项目）"
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=64,
+        description="同时进行的大模型调用数，默认 RAG_BATCH_CONCURRENCY"
+    )
+    rate_limit: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="每秒最多发起的大模型调用数，0 表示不限，默认 RAG_BATCH_RATE_LIMIT"
+    )
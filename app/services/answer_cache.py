@@ -0,0 +1,212 @@
+# app/services/answer_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """语义回答缓存（SQLite 持久化）
+
+    命中条件：命名空间相同（嵌入模型 + 大模型 + 提示词版本）、检索到的块ID集合完全相同，
+    且问题向量与缓存条目的余弦相似度不低于阈值。块ID集合相同保证提示词的上下文一致，
+    相似度阈值只负责把不同措辞的同一问题归并到一起。
+
+    淘汰：超过 ttl_seconds 的条目视为过期；条目数超过 max_entries 时按最近访问时间淘汰（LRU）。
+    失效：任一被引用的块发生变化（删除 / 内容改变导致块ID变化）时删除引用它的条目。
+    """
+
+    def __init__(self, path: str, max_entries: int = 2048, ttl_seconds: float = 7 * 24 * 3600,
+                 threshold: float = 0.92, namespace: str = ""):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                chunk_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                cost_ms REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_answers_key ON answers(namespace, chunk_key);
+            CREATE INDEX IF NOT EXISTS idx_answers_access ON answers(last_access);
+            CREATE TABLE IF NOT EXISTS answer_chunks (
+                answer_id INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_answer_chunks_chunk ON answer_chunks(chunk_id);
+            CREATE INDEX IF NOT EXISTS idx_answer_chunks_answer ON answer_chunks(answer_id);
+        """)
+        self._conn.commit()
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_ms = 0.0
+        self._hit_latencies = deque(maxlen=1000)
+
+    @staticmethod
+    def chunk_key(chunk_ids: Iterable[str]) -> str:
+        """块ID集合的键（与顺序无关）"""
+        joined = "\n".join(sorted(set(chunk_ids)))
+        return hashlib.blake2b(joined.encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: np.ndarray, chunk_ids: Sequence[str]) -> Optional[Dict]:
+        """查找可复用的回答，未命中返回 None"""
+        start = time.perf_counter()
+        query = self._unit(embedding)
+        key = self.chunk_key(chunk_ids)
+        now = time.time()
+        with self._lock:
+            self.lookups += 1
+            rows = self._conn.execute(
+                "SELECT id, question, embedding, answer, cost_ms FROM answers "
+                "WHERE namespace = ? AND chunk_key = ? AND created_at >= ?",
+                (self.namespace, key, now - self.ttl_seconds)
+            ).fetchall()
+            if not rows:
+                return None
+            matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+            if matrix.shape[1] != query.shape[0]:
+                return None
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            entry_id, question, _, answer, cost_ms = rows[best]
+            self._conn.execute(
+                "UPDATE answers SET last_access = ?, hits = hits + 1 WHERE id = ?", (now, entry_id)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.saved_ms += cost_ms
+            self._hit_latencies.append((time.perf_counter() - start) * 1000)
+        return {
+            'answer': answer,
+            'cached_question': question,
+            'similarity': round(float(similarities[best]), 4)
+        }
+
+    def put(self, question: str, embedding: np.ndarray, chunk_ids: Sequence[str],
+            answer: str, cost_ms: float = 0.0):
+        """写入一条回答，超出容量时淘汰最久未访问的条目"""
+        vector = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO answers (namespace, chunk_key, question, embedding, answer, cost_ms, "
+                "created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, self.chunk_key(chunk_ids), question, vector.tobytes(),
+                 answer, float(cost_ms), now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO answer_chunks (answer_id, chunk_id) VALUES (?, ?)",
+                [(cursor.lastrowid, chunk_id) for chunk_id in set(chunk_ids)]
+            )
+            self.stores += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """删除过期条目，再按LRU裁剪到容量以内（调用方持有锁）"""
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT id FROM answers WHERE created_at < ?", (now - self.ttl_seconds,)
+        )]
+        overflow = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - len(expired) - self.max_entries
+        if overflow > 0:
+            expired += [row[0] for row in self._conn.execute(
+                "SELECT id FROM answers WHERE created_at >= ? ORDER BY last_access LIMIT ?",
+                (now - self.ttl_seconds, overflow)
+            )]
+        self._delete_entries(expired)
+        self.evictions += len(expired)
+
+    def _delete_entries(self, entry_ids: List[int]):
+        for offset in range(0, len(entry_ids), 500):
+            batch = entry_ids[offset:offset + 500]
+            marks = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM answers WHERE id IN ({marks})", batch)
+            self._conn.execute(f"DELETE FROM answer_chunks WHERE answer_id IN ({marks})", batch)
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """删除引用了这些块的所有条目，返回删除的条目数"""
+        chunk_ids = list(set(chunk_ids))
+        with self._lock:
+            entry_ids = set()
+            for offset in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[offset:offset + 500]
+                marks = ",".join("?" * len(batch))
+                entry_ids.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT answer_id FROM answer_chunks WHERE chunk_id IN ({marks})", batch
+                ))
+            self._delete_entries(sorted(entry_ids))
+            self._conn.commit()
+            self.invalidations += len(entry_ids)
+        if entry_ids:
+            logger.info(f"🧹 回答缓存失效: {len(entry_ids)} 条（{len(chunk_ids)} 个块变化）")
+        return len(entry_ids)
+
+    def retain_chunks(self, valid_chunk_ids: Iterable[str]) -> int:
+        """索引重建后调用：引用了已不存在的块的条目全部失效"""
+        valid = set(valid_chunk_ids)
+        with self._lock:
+            referenced = [row[0] for row in self._conn.execute("SELECT DISTINCT chunk_id FROM answer_chunks")]
+        return self.invalidate_chunks([chunk_id for chunk_id in referenced if chunk_id not in valid])
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("DELETE FROM answer_chunks")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def stats(self) -> Dict:
+        latencies = list(self._hit_latencies)
+        return {
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            'llm_calls_avoided': self.hits,
+            'saved_ms': round(self.saved_ms, 2),
+            'hit_p50_ms': round(float(np.percentile(latencies, 50)), 3) if latencies else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
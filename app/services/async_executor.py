@@ -0,0 +1,104 @@
+# app/services/async_executor.py
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """有界线程池：把阻塞调用（向量检索、模型推理、Chroma I/O）移出事件循环
+
+    max_workers 个线程执行，最多再有 max_queue 个任务排队；超出时 run() 在事件循环上
+    异步等待（背压），不会无限堆积。向量检索与嵌入推理主要在 NumPy / HNSW / PyTorch
+    的C层执行并释放GIL，线程池即可并行，且不需要在进程间复制索引。
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, name: str = "rag"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.backpressure_waits = 0
+        self.queued = 0
+        self.running = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """每个事件循环一个信号量（Gradio / 测试脚本可能在不同循环中调用）"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_workers + self.max_queue)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """在线程池中执行 fn(*args, **kwargs) 并等待结果"""
+        semaphore = self._semaphore()
+        if semaphore.locked():
+            self.backpressure_waits += 1
+        async with semaphore:
+            enqueued_at = time.perf_counter()
+            with self._lock:
+                self.submitted += 1
+                self.queued += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+            def task():
+                started_at = time.perf_counter()
+                with self._lock:
+                    self.queued -= 1
+                    self.running += 1
+                    self.total_wait_seconds += started_at - enqueued_at
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self.running -= 1
+                        self.total_run_seconds += time.perf_counter() - started_at
+
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._pool, task)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            with self._lock:
+                self.completed += 1
+            return result
+
+    def stats(self) -> Dict:
+        """队列深度与耗时统计"""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                'name': self.name,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queue_depth': self.queued,
+                'running': self.running,
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'backpressure_waits': self.backpressure_waits,
+                'avg_wait_ms': round(self.total_wait_seconds * 1000 / finished, 3) if finished else 0.0,
+                'avg_run_ms': round(self.total_run_seconds * 1000 / finished, 3) if finished else 0.0
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
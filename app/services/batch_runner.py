@@ -0,0 +1,279 @@
+# app/services/batch_runner.py
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from .unity_rag_system import LLM_FAILURE_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRateLimiter:
+    """按固定间隔放行的限速器（每秒 rate 个），rate <= 0 表示不限速
+
+    只在单个事件循环上使用：读取和更新下一次放行时间之间没有 await，不需要加锁。
+    """
+
+    def __init__(self, rate: float = 0):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_at = 0.0
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        wait = self._next_at - now
+        self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def item_id(question: str, file_types: Optional[List[str]] = None) -> str:
+    """未提供 id 的问题按 问题 + 文件类型 生成稳定ID，续跑时据此跳过已完成的问题"""
+    key = question.strip() + "|" + ",".join(sorted(file_types or []))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def load_items(path: str) -> List[Dict]:
+    """读取问题文件：JSONL（{"id", "question", "file_types"}）或每行一个问题的纯文本"""
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                question = record['question']
+                file_types = record.get('file_types') or None
+                items.append({
+                    'id': str(record.get('id') or item_id(question, file_types)),
+                    'question': question,
+                    'file_types': file_types
+                })
+            else:
+                items.append({'id': item_id(line), 'question': line, 'file_types': None})
+    return items
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """已成功完成的问题ID（失败的和被中断写了一半的行不算，续跑时重做）"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'ok':
+                done.add(record.get('id'))
+    return done
+
+
+class BatchQARunner:
+    """批量问答：一个 JSONL 问题文件 -> 一个 JSONL 结果文件
+
+    - 每批 batch_size 个问题的查询向量一次批量计算；同一批内相同或高度相似
+      （余弦 >= dedupe_threshold）且文件类型相同的问题共用一次检索；
+    - 大模型调用在信号量（max_concurrency）和限速器（rate_limit 次/秒）下并发，命中回答缓存的不占名额；
+    - 下一批的检索与上一批的大模型调用重叠进行；
+    - 每完成一个问题立即追加一行结果（带各阶段耗时），中断后以同一输出文件重跑即从断点继续。
+    结果文件中同一ID可能有多行（失败后重试），以最后一行为准。
+    """
+
+    def __init__(self, rag_system, max_concurrency: Optional[int] = None,
+                 rate_limit: Optional[float] = None, batch_size: Optional[int] = None,
+                 dedupe_threshold: Optional[float] = None):
+        self.rag = rag_system
+        self.max_concurrency = max(1, max_concurrency or settings.RAG_BATCH_CONCURRENCY)
+        self.rate_limit = settings.RAG_BATCH_RATE_LIMIT if rate_limit is None else rate_limit
+        self.batch_size = max(1, batch_size or settings.RAG_BATCH_SIZE)
+        self.dedupe_threshold = settings.RAG_BATCH_DEDUPE_THRESHOLD if dedupe_threshold is None else dedupe_threshold
+        self.progress = {
+            'state': 'pending', 'total': 0, 'skipped': 0, 'done': 0,
+            'failed': 0, 'cached': 0, 'retrievals_saved': 0
+        }
+
+    def _representatives(self, questions: List[str]) -> Tuple[List[int], List[int]]:
+        """贪心聚类：返回 (代表问题的下标, 每个问题所属的代表)
+
+        与已有代表问题足够相似的问题直接复用代表的检索结果；查询向量经查询缓存计算，检索阶段复用。
+        """
+        rag = self.rag
+        embeddings = np.asarray(rag.query_cache.get_embeddings(
+            questions, rag.processor.embed_queries, rag.vector_store.index_version
+        ), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        unit = embeddings / norms
+
+        representatives: List[int] = []
+        owner: List[int] = []
+        for row in range(len(questions)):
+            if representatives:
+                similarity = unit[representatives] @ unit[row]
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.dedupe_threshold:
+                    owner.append(representatives[best])
+                    continue
+            representatives.append(row)
+            owner.append(row)
+        return representatives, owner
+
+    async def _retrieve_batch(self, items: List[Dict]) -> Tuple[List[List[Dict]], int]:
+        """一批问题的检索，返回 (每个问题的上下文, 省掉的检索次数)"""
+        docs_per_item: List[Optional[List[Dict]]] = [None] * len(items)
+        saved = 0
+        groups: Dict[Tuple, List[int]] = {}
+        for i, item in enumerate(items):
+            groups.setdefault(tuple(sorted(item['file_types'] or [])), []).append(i)
+
+        for file_types, indexes in groups.items():
+            where_filter = {"file_type": {"$in": list(file_types)}} if file_types else None
+            questions = [items[i]['question'] for i in indexes]
+            representatives, owner = await self.rag.executor.run(self._representatives, questions)
+            contexts = await self.rag.retrieve_contexts(
+                [questions[row] for row in representatives], where_filter
+            )
+            by_representative = dict(zip(representatives, contexts))
+            for row, i in enumerate(indexes):
+                docs_per_item[i] = by_representative[owner[row]]
+            saved += len(questions) - len(representatives)
+        return docs_per_item, saved
+
+    async def _answer(self, item: Dict, docs: List[Dict], lookup, retrieval_ms: float,
+                      semaphore: asyncio.Semaphore, limiter: AsyncRateLimiter) -> Dict:
+        start = time.perf_counter()
+        timings = {'retrieval_ms': round(retrieval_ms, 2), 'wait_ms': 0.0, 'llm_ms': 0.0}
+        record = {'id': item['id'], 'question': item['question'], 'file_types': item['file_types']}
+        try:
+            if lookup[1] is not None:
+                result = await self.rag.answer_with_context(item['question'], docs, lookup)
+            else:
+                async with semaphore:
+                    await limiter.acquire()
+                    llm_start = time.perf_counter()
+                    timings['wait_ms'] = round((llm_start - start) * 1000, 2)
+                    result = await self.rag.answer_with_context(item['question'], docs, lookup)
+                    timings['llm_ms'] = round((time.perf_counter() - llm_start) * 1000, 2)
+            failed = result['answer'].startswith(LLM_FAILURE_PREFIX)
+            record.update(
+                status='error' if failed else 'ok',
+                answer=result['answer'],
+                sources=result['relevant_sources'],
+                cached=result['cached']
+            )
+            if failed:
+                record['error'] = result['answer']
+        except Exception as e:
+            logger.error(f"❌ 问题 {item['id']} 处理失败: {e}")
+            record.update(status='error', error=str(e), cached=False)
+        timings['total_ms'] = round(retrieval_ms + (time.perf_counter() - start) * 1000, 2)
+        record['timings'] = timings
+        return record
+
+    async def run(self, input_path: str, output_path: str, resume: bool = True) -> Dict:
+        """处理 input_path 中的全部问题，结果追加到 output_path，返回汇总"""
+        if not self.rag.is_initialized:
+            await self.rag.initialize()
+
+        items = load_items(input_path)
+        done = completed_ids(output_path) if resume else set()
+        pending = [item for item in items if item['id'] not in done]
+        self.progress.update(state='running', total=len(items), skipped=len(items) - len(pending))
+        print(f"📋 批量问答: 共 {len(items)} 个问题，跳过已完成 {len(items) - len(pending)} 个")
+
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = AsyncRateLimiter(self.rate_limit)
+        records: List[Dict] = []
+        in_flight = set()
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        # 上次中断时可能只写了半行，先补一个换行
+        needs_newline = False
+        if resume and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out:
+            if needs_newline:
+                out.write('\n')
+
+            def write(task: asyncio.Task):
+                if task.cancelled():
+                    return
+                record = task.result()
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+                records.append(record)
+                self.progress['done' if record['status'] == 'ok' else 'failed'] += 1
+                self.progress['cached'] += bool(record.get('cached'))
+
+            try:
+                for offset in range(0, len(pending), self.batch_size):
+                    batch = pending[offset:offset + self.batch_size]
+                    retrieval_start = time.perf_counter()
+                    docs_per_item, saved = await self._retrieve_batch(batch)
+                    lookups = await self.rag.lookup_answers(
+                        [item['question'] for item in batch], docs_per_item
+                    )
+                    retrieval_ms = (time.perf_counter() - retrieval_start) * 1000 / len(batch)
+                    self.progress['retrievals_saved'] += saved
+
+                    for item, docs, lookup in zip(batch, docs_per_item, lookups):
+                        task = asyncio.create_task(
+                            self._answer(item, docs, lookup, retrieval_ms, semaphore, limiter)
+                        )
+                        task.add_done_callback(write)
+                        in_flight.add(task)
+                        task.add_done_callback(in_flight.discard)
+
+                    # 积压超过一批时先等一部分完成，再检索下一批
+                    while len(in_flight) > self.batch_size:
+                        await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+
+                if in_flight:
+                    await asyncio.wait(in_flight)
+            except BaseException:
+                # 被取消或出错时不留下孤儿任务；未写入的问题在续跑时重做
+                self.progress['state'] = 'stopped'
+                for task in list(in_flight):
+                    task.cancel()
+                raise
+
+        elapsed = time.perf_counter() - started
+        self.progress['state'] = 'finished'
+        summary = self._summarize(records, elapsed)
+        print(f"✅ 批量问答完成: {summary['done']} 成功, {summary['failed']} 失败, "
+              f"{summary['cached']} 命中缓存, 用时 {elapsed:.1f}s")
+        return summary
+
+    def _summarize(self, records: List[Dict], elapsed: float) -> Dict:
+        def percentile(key: str, point: int) -> float:
+            values = [r['timings'][key] for r in records if r['timings'].get(key)]
+            return round(float(np.percentile(values, point)), 2) if values else 0.0
+
+        return {
+            **{key: self.progress[key] for key in ('total', 'skipped', 'done', 'failed', 'cached', 'retrievals_saved')},
+            'processed': len(records),
+            'elapsed_s': round(elapsed, 3),
+            'questions_per_s': round(len(records) / elapsed, 2) if elapsed > 0 else 0.0,
+            'llm_ms_p50': percentile('llm_ms', 50),
+            'llm_ms_p95': percentile('llm_ms', 95),
+            'total_ms_p50': percentile('total_ms', 50),
+            'total_ms_p95': percentile('total_ms', 95),
+            'max_concurrency': self.max_concurrency,
+            'rate_limit': self.rate_limit
+        }
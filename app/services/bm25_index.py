@@ -0,0 +1,242 @@
+# app/services/bm25_index.py
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Sequence, Tuple
+import logging
+
+from .code_tokenizer import tokenize_code
+from .chunk_utils import unpack_chunk
+
+logger = logging.getLogger(__name__)
+
+
+class BM25Index:
+    """代码感知分词的持久化 BM25 倒排索引
+
+    倒排表以 CSR 形式存放（按词项排序的 文档行号 / 预计算BM25权重），
+    查询时只需拼接查询词的倒排段并做一次 bincount，全部向量化。
+    写入后倒排表在下次查询时重建；查询在线程池中并发执行，重建加锁，
+    三个数组作为一个元组整体替换，读到的总是同一次构建的结果。
+    """
+
+    def __init__(self, persist_path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.persist_path = persist_path
+        self.k1 = k1
+        self.b = b
+        self._build_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空索引"""
+        self.ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self.vocab: Dict[str, int] = {}
+        self._doc_terms: List[np.ndarray] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._dirty = True
+        # (indptr, 文档行号, BM25权重)
+        self._postings: Tuple[np.ndarray, np.ndarray, np.ndarray] = (
+            np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        )
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def _term_ids(self, text: str) -> np.ndarray:
+        vocab = self.vocab
+        return np.fromiter(
+            (vocab.setdefault(token, len(vocab)) for token in tokenize_code(text)),
+            dtype=np.int32
+        )
+
+    def add_documents(self, chunks) -> int:
+        """写入文档块（upsert语义）"""
+        alive = list(self._alive)
+        added = 0
+        for chunk in chunks:
+            text, _, chunk_id = unpack_chunk(chunk)
+            if not text:
+                continue
+            terms = self._term_ids(text)
+            row = self._id_to_row.get(chunk_id)
+            if row is None:
+                self._id_to_row[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+                self._doc_terms.append(terms)
+                alive.append(True)
+            else:
+                self._doc_terms[row] = terms
+                alive[row] = True
+            added += 1
+        self._alive = np.asarray(alive, dtype=bool)
+        self._dirty = True
+        return added
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """按ID删除（标记删除，下次构建倒排时剔除）"""
+        removed = 0
+        for chunk_id in ids:
+            row = self._id_to_row.get(chunk_id)
+            if row is not None and self._alive[row]:
+                self._alive[row] = False
+                self._doc_terms[row] = np.zeros(0, dtype=np.int32)
+                removed += 1
+        if removed:
+            self._dirty = True
+        return removed
+
+    def _build(self):
+        """构建CSR倒排表并预计算每个倒排项的BM25权重"""
+        n_docs = len(self.ids)
+        n_terms = len(self.vocab)
+        lengths = np.fromiter((len(t) for t in self._doc_terms), dtype=np.int64, count=n_docs)
+        if n_docs == 0 or lengths.sum() == 0:
+            self._postings = (
+                np.zeros(n_terms + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+            )
+            self._dirty = False
+            return
+
+        rows = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+        terms = np.concatenate(self._doc_terms).astype(np.int64)
+
+        # (词项, 文档) 去重得到词频；key 先按词项排序，天然得到CSR顺序
+        keys, tf = np.unique(terms * n_docs + rows, return_counts=True)
+        post_terms = keys // n_docs
+        post_rows = keys % n_docs
+
+        df = np.bincount(post_terms, minlength=n_terms)
+        n_alive = max(1, int(self._alive.sum()))
+        idf = np.log1p((n_alive - df + 0.5) / (df + 0.5))
+
+        avgdl = lengths[self._alive].mean() if self._alive.any() else 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths[post_rows] / max(avgdl, 1e-9))
+        weights = idf[post_terms] * tf * (self.k1 + 1) / (tf + norm)
+
+        self._postings = (
+            np.concatenate(([0], np.cumsum(df))).astype(np.int64),
+            post_rows.astype(np.int32),
+            weights.astype(np.float32)
+        )
+        self._dirty = False
+
+    def _current_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """需要时重建倒排表（双重检查加锁，并发查询只构建一次）"""
+        if self._dirty:
+            with self._build_lock:
+                if self._dirty:
+                    self._build()
+        return self._postings
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+    def score(self, query: str) -> np.ndarray:
+        """返回所有文档行的BM25分数"""
+        indptr, post_rows, post_weights = self._current_postings()
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        term_ids = sorted({self.vocab[t] for t in tokenize_code(query) if t in self.vocab})
+        term_ids = [t for t in term_ids if t + 1 < len(indptr)]
+        if not term_ids:
+            return scores
+        segments = [slice(indptr[t], indptr[t + 1]) for t in term_ids]
+        rows = np.concatenate([post_rows[s] for s in segments])
+        weights = np.concatenate([post_weights[s] for s in segments])
+        return np.bincount(rows, weights=weights, minlength=len(self.ids)).astype(np.float32)
+
+    def search(self, query: str, n_results: int = 10,
+               row_mask: Optional[np.ndarray] = None) -> List[Dict]:
+        """BM25检索，返回 [{'id', 'score'}]"""
+        scores = self.score(query)
+        if not len(scores):
+            return []
+        scores[~self._alive] = 0
+        if row_mask is not None:
+            scores[~row_mask] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        k = min(n_results, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [{'id': self.ids[row], 'score': float(scores[row])} for row in top]
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def save(self):
+        """保存到 .npz（不使用pickle）"""
+        if not self.persist_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.persist_path)), exist_ok=True)
+        lengths = np.fromiter((len(t) for t in self._doc_terms), dtype=np.int64, count=len(self.ids))
+        terms = np.concatenate(self._doc_terms) if self._doc_terms else np.zeros(0, dtype=np.int32)
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        tmp_path = self.persist_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=np.asarray(self.ids, dtype=str),
+            vocab=np.asarray(vocab, dtype=str),
+            doc_offsets=np.concatenate(([0], np.cumsum(lengths))),
+            doc_terms=terms.astype(np.int32),
+            alive=self._alive,
+            params=np.asarray([self.k1, self.b], dtype=np.float64)
+        )
+        os.replace(tmp_path, self.persist_path)
+        logger.info(f"💾 BM25索引已保存: {self.persist_path} ({len(self)} 个文档, {len(vocab)} 个词项)")
+
+    def load(self) -> bool:
+        """从磁盘加载，文件不存在时返回 False"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return False
+        self.reset()
+        with np.load(self.persist_path, allow_pickle=False) as data:
+            self.ids = data['ids'].tolist()
+            self.vocab = {term: i for i, term in enumerate(data['vocab'].tolist())}
+            offsets = data['doc_offsets']
+            terms = data['doc_terms']
+            self._doc_terms = [terms[offsets[i]:offsets[i + 1]] for i in range(len(self.ids))]
+            self._alive = data['alive'].astype(bool)
+            self.k1, self.b = (float(v) for v in data['params'])
+        self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._dirty = True
+        logger.info(f"✅ 加载BM25索引: {self.persist_path} ({len(self)} 个文档)")
+        return True
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[Dict]:
+    """倒数排名融合（RRF）
+
+    每个结果列表需按相关性降序排列且带 'id'。融合分数归一化到 [0, 1]
+    写入 'score'，原始分数保留在 'rrf_sources' 中。
+    """
+    weights = weights or [1.0] * len(result_lists)
+    max_score = sum(w / (k + 1) for w in weights) or 1.0
+    fused: Dict[str, Dict] = {}
+    totals: Dict[str, float] = {}
+
+    for list_index, (results, weight) in enumerate(zip(result_lists, weights)):
+        for rank, result in enumerate(results):
+            doc_id = result['id']
+            totals[doc_id] = totals.get(doc_id, 0.0) + weight / (k + rank + 1)
+            if doc_id not in fused:
+                fused[doc_id] = dict(result)
+                fused[doc_id]['rrf_sources'] = {}
+            fused[doc_id]['rrf_sources'][list_index] = {
+                'rank': rank + 1,
+                'score': result.get('score')
+            }
+
+    ordered = sorted(fused, key=lambda doc_id: totals[doc_id], reverse=True)
+    output = []
+    for doc_id in ordered:
+        result = fused[doc_id]
+        result['score'] = totals[doc_id] / max_score
+        output.append(result)
+    return output
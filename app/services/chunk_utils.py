@@ -0,0 +1,90 @@
+# app/services/chunk_utils.py
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+
+def compute_chunk_id(content: str, metadata: Dict) -> str:
+    """按 文件路径 + 块区间 + 内容哈希 生成稳定的块ID
+
+    同一文件同一位置的同一内容在每次重建时得到相同ID（幂等写入），
+    不同项目、不同文件之间不会冲突。
+    """
+    content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    key = "|".join([
+        str(metadata.get('file_path', '')),
+        str(metadata.get('chunk_start', metadata.get('chunk_index', ''))),
+        str(metadata.get('chunk_end', '')),
+        content_hash
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def unpack_chunk(chunk: Any) -> Tuple[Optional[str], Dict, Optional[str]]:
+    """从字典或带属性的对象中取出 (文本, 元数据, ID)"""
+    if isinstance(chunk, dict):
+        text = chunk.get('text', '') or chunk.get('content', '')
+        metadata = chunk.get('metadata', {}) or {}
+        chunk_id = chunk.get('id')
+    elif hasattr(chunk, 'text'):
+        text = chunk.text
+        metadata = getattr(chunk, 'metadata', {}) or {}
+        chunk_id = getattr(chunk, 'id', None)
+    else:
+        return None, {}, None
+
+    if text and not chunk_id:
+        chunk_id = compute_chunk_id(text, metadata)
+    return text, metadata, chunk_id
+
+
+def clean_chunk_metadata(metadata: Dict) -> Dict:
+    """清理元数据，确保没有 None 值且只包含标量类型"""
+    cleaned_metadata = {}
+    for key, value in metadata.items():
+        if value is None:
+            # 对于 None 值，提供默认值
+            cleaned_metadata[key] = ""
+        elif isinstance(value, (str, int, float, bool)):
+            cleaned_metadata[key] = value
+        else:
+            # 将其他类型转换为字符串
+            cleaned_metadata[key] = str(value)
+    return cleaned_metadata
+
+
+def metadata_matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """判断单条元数据是否满足Chroma风格的where条件"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(metadata_matches(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(metadata_matches(metadata, sub) for sub in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for op, expected in condition.items():
+                if op == '$eq' and value != expected:
+                    return False
+                if op == '$ne' and value == expected:
+                    return False
+                if op == '$in' and value not in expected:
+                    return False
+                if op == '$nin' and value in expected:
+                    return False
+                if op in ('$gt', '$gte', '$lt', '$lte'):
+                    if not isinstance(value, (int, float)):
+                        return False
+                    if op == '$gt' and not value > expected:
+                        return False
+                    if op == '$gte' and not value >= expected:
+                        return False
+                    if op == '$lt' and not value < expected:
+                        return False
+                    if op == '$lte' and not value <= expected:
+                        return False
+    return True
@@ -0,0 +1,56 @@
+# app/services/code_tokenizer.py
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# 标识符 / 数字 / 连续中文
+_WORD_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+|[一-鿿]+')
+# camelCase 拆分：HTTPServer -> HTTP, Server；OnTriggerEnter2D -> On, Trigger, Enter, 2, D
+_CAMEL_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+
+def _is_cjk(word: str) -> bool:
+    return '一' <= word[0] <= '鿿'
+
+
+@lru_cache(maxsize=100_000)
+def _word_tokens(word: str) -> Tuple[str, ...]:
+    """单个标识符的分词结果（代码中标识符重复度很高，缓存）"""
+    parts = split_identifier(word)
+    if len(parts) > 1:
+        return (word.lower(), *parts)
+    return (word.lower(),)
+
+
+def split_identifier(identifier: str) -> List[str]:
+    """拆分 camelCase / snake_case 标识符为小写子词（丢弃纯数字）"""
+    parts = []
+    for piece in identifier.split('_'):
+        if not piece:
+            continue
+        for part in _CAMEL_RE.findall(piece):
+            if not part.isdigit():
+                parts.append(part.lower())
+    return parts
+
+
+def tokenize_code(text: str) -> List[str]:
+    """代码感知分词
+
+    - 标识符保留完整小写形式，并追加 camelCase / snake_case 子词
+    - 连续中文切成重叠的二元组
+    - 纯数字（YAML 中大量的 fileID 等）丢弃
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        if word.isdigit():
+            continue
+        if _is_cjk(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            continue
+
+        tokens.extend(_word_tokens(word))
+    return tokens
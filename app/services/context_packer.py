@@ -0,0 +1,204 @@
+# app/services/context_packer.py
+import re
+import textwrap
+import threading
+from typing import Callable, Dict, List, Optional
+import logging
+
+from app.core.config import settings
+from .diversity import rank_relevance
+from .token_counter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_BLANK_LINES_RE = re.compile(r'\n\s*\n(\s*\n)+')
+
+
+def compact_text(text: str) -> str:
+    """去掉公共缩进、行尾空白和多余空行（代码块里的缩进对模型几乎没有信息量）"""
+    lines = [line.rstrip() for line in text.expandtabs(4).split('\n')]
+    text = textwrap.dedent('\n'.join(lines)).strip('\n')
+    return _BLANK_LINES_RE.sub('\n\n', text)
+
+
+def merge_spans(docs: List[Dict], relevance: List[float]) -> List[Dict]:
+    """合并同一文件中重叠或首尾相接的块，去掉重复块
+
+    块的 chunk_start / chunk_end 是在原文件中的字符区间（见 UnityTextProcessor）；
+    相邻块有 150 字符左右的重叠，合并后重叠部分只保留一次。没有区间信息的块单独成段，
+    内容完全相同的块只保留第一个。返回的段带 relevance（成员中的最大值）与 rank（最靠前的成员排名）。
+    """
+    units: List[Dict] = []
+    seen_ids = set()
+    seen_texts = set()
+    by_file: Dict[str, List[Dict]] = {}
+
+    for rank, (doc, score) in enumerate(zip(docs, relevance)):
+        content = doc.get('content') or ''
+        key = content.strip()
+        if not key or doc.get('id') in seen_ids or key in seen_texts:
+            continue
+        seen_ids.add(doc.get('id'))
+        seen_texts.add(key)
+
+        metadata = doc.get('metadata', {})
+        unit = {
+            'ids': [doc.get('id')],
+            'metadata': metadata,
+            'content': content,
+            'relevance': float(score),
+            'rank': rank,
+            'start': metadata.get('chunk_start'),
+            'end': metadata.get('chunk_end')
+        }
+        if isinstance(unit['start'], int) and isinstance(unit['end'], int):
+            by_file.setdefault(metadata.get('file_path', ''), []).append(unit)
+        else:
+            units.append(unit)
+
+    for spans in by_file.values():
+        spans.sort(key=lambda unit: unit['start'])
+        current = spans[0]
+        for span in spans[1:]:
+            if span['start'] > current['end']:
+                units.append(current)
+                current = span
+                continue
+            # 重叠或相接：只追加超出当前段末尾的部分
+            if span['end'] > current['end']:
+                current['content'] += span['content'][current['end'] - span['start']:]
+                current['end'] = span['end']
+            current['ids'].extend(span['ids'])
+            current['relevance'] = max(current['relevance'], span['relevance'])
+            current['rank'] = min(current['rank'], span['rank'])
+        units.append(current)
+
+    for unit in units:
+        unit['content'] = compact_text(unit['content'])
+    return units
+
+
+class ContextPacker:
+    """按 token 预算打包提示词上下文
+
+    1. 合并同一文件的重叠 / 相邻块，去重，压缩缩进与空行；
+    2. 按 相关性 / token 数 从高到低贪心装入预算，最相关的段始终保留；
+       放不下的段在剩余预算不少于 min_tokens 时按行截断后装入；
+    3. 选中的段按原排名输出，格式统一：一行来源标题 + 代码块。
+    相关性按排名换算（与 MMR 一致），不同阶段的 score 量纲不可比。
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, min_tokens: Optional[int] = None,
+                 language_of: Optional[Callable[[str], str]] = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.token_budget = settings.RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+        self.min_tokens = settings.RAG_CONTEXT_MIN_TOKENS if min_tokens is None else min_tokens
+        self.language_of = language_of or (lambda file_type: 'text')
+        self.count_tokens = count_tokens
+        self._lock = threading.Lock()
+        self.packs = 0
+        self.input_chunks = 0
+        self.merged_chunks = 0
+        self.dropped_segments = 0
+        self.truncated_segments = 0
+        self.total_tokens = 0
+
+    def _header(self, index: int, unit: Dict) -> str:
+        metadata = unit['metadata']
+        kind = metadata.get('file_type', 'unknown')
+        block_type = metadata.get('block_type')
+        if block_type:
+            kind = f"{kind}/{block_type}"
+        return f"[{index}] {metadata.get('file_path', 'unknown')} ({kind})"
+
+    def _render(self, index: int, unit: Dict, content: str) -> str:
+        language = self.language_of(unit['metadata'].get('file_type', ''))
+        return f"{self._header(index, unit)}\n```{language}\n{content}\n```"
+
+    def _truncate(self, unit: Dict, budget: float, keep_first: bool = False) -> Optional[str]:
+        """按行截断到预算以内，至少保留一行
+
+        一行也放不下时返回 None；keep_first 时（最相关的段）改为把首行截短到剩余预算，
+        预算连标题都放不下时只保留标题与省略号。
+        """
+        lines = unit['content'].split('\n')
+        overhead = self.count_tokens(self._render(0, unit, "…"))
+        kept, used = [], overhead
+        for line in lines:
+            cost = self.count_tokens(line) + 1
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        if kept:
+            return '\n'.join(kept) + '\n…'
+        if not keep_first:
+            return None
+        first = lines[0]
+        while first and overhead + self.count_tokens(first) + 1 > budget:
+            first = first[:len(first) // 2]
+        return f"{first}\n…" if first else "…"
+
+    def pack(self, docs: List[Dict]) -> Dict:
+        """返回 {'text', 'tokens', 'chars', 'segments', 'ids', 'merged', 'dropped', 'truncated'}"""
+        if not docs:
+            return {'text': '', 'tokens': 0, 'chars': 0, 'segments': 0, 'ids': [],
+                    'merged': 0, 'dropped': 0, 'truncated': 0}
+
+        units = merge_spans(docs, rank_relevance(len(docs)).tolist())
+        for unit in units:
+            unit['tokens'] = max(1, self.count_tokens(self._render(0, unit, unit['content'])))
+
+        # 最相关的段先放，其余按单位 token 的相关性排序
+        ordered = sorted(units, key=lambda unit: unit['rank'])
+        ordered = ordered[:1] + sorted(ordered[1:], key=lambda unit: -unit['relevance'] / unit['tokens'])
+
+        budget = self.token_budget if self.token_budget > 0 else float('inf')
+        selected, used, truncated = [], 0, 0
+        for position, unit in enumerate(ordered):
+            remaining = budget - used
+            if unit['tokens'] <= remaining:
+                selected.append((unit, unit['content']))
+                used += unit['tokens']
+            elif position == 0 or remaining >= self.min_tokens:
+                content = self._truncate(unit, remaining, keep_first=position == 0)
+                if content is None:
+                    continue
+                selected.append((unit, content))
+                used += self.count_tokens(self._render(0, unit, content))
+                truncated += 1
+
+        selected.sort(key=lambda item: item[0]['rank'])
+        text = '\n\n'.join(
+            self._render(i + 1, unit, content) for i, (unit, content) in enumerate(selected)
+        )
+        result = {
+            'text': text,
+            'tokens': self.count_tokens(text),
+            'chars': sum(len(content) for _, content in selected),
+            'segments': len(selected),
+            'ids': [chunk_id for unit, _ in selected for chunk_id in unit['ids']],
+            'merged': sum(len(unit['ids']) - 1 for unit in units),
+            'dropped': len(units) - len(selected),
+            'truncated': truncated
+        }
+        with self._lock:
+            self.packs += 1
+            self.input_chunks += len(docs)
+            self.merged_chunks += result['merged']
+            self.dropped_segments += result['dropped']
+            self.truncated_segments += truncated
+            self.total_tokens += result['tokens']
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'token_budget': self.token_budget,
+                'packs': self.packs,
+                'avg_tokens': round(self.total_tokens / self.packs, 1) if self.packs else 0.0,
+                'avg_input_chunks': round(self.input_chunks / self.packs, 2) if self.packs else 0.0,
+                'merged_chunks': self.merged_chunks,
+                'dropped_segments': self.dropped_segments,
+                'truncated_segments': self.truncated_segments
+            }
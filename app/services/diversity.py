@@ -0,0 +1,88 @@
+# app/services/diversity.py
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def rank_relevance(n: int) -> np.ndarray:
+    """按候选的排名给出 (0, 1] 的相关性
+
+    候选的 score 来源不一（向量相似度、RRF、符号命中、交叉编码器分数），量纲不可比；
+    排名是上游各阶段共同认可的顺序，用线性衰减换算成相关性。
+    """
+    if n <= 0:
+        return np.zeros(0, dtype=np.float32)
+    return (1.0 - np.arange(n, dtype=np.float32) / n).astype(np.float32)
+
+
+def mmr_select(doc_embeddings: np.ndarray, relevance: np.ndarray, k: int,
+               lambda_mult: float = 0.7, file_keys: Optional[Sequence[str]] = None,
+               per_file_cap: int = 0) -> List[int]:
+    """最大边际相关性（MMR）选择，返回被选中的候选下标（按选中顺序）
+
+    每一步选 lambda * 相关性 - (1 - lambda) * 与已选块的最大余弦相似度 最大的候选；
+    lambda = 1 退化为按相关性截断，越小越偏向多样性。per_file_cap > 0 时同一文件最多选
+    per_file_cap 个块。相似度矩阵一次算出，每步只做一次向量化的 max 更新。
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    vectors = np.asarray(doc_embeddings, dtype=np.float32).reshape(n, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+    similarity = vectors @ vectors.T
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    if file_keys is not None and per_file_cap > 0:
+        _, file_ids = np.unique(np.asarray(file_keys, dtype=object).astype(str), return_inverse=True)
+        file_counts = np.zeros(file_ids.max() + 1, dtype=np.int32)
+    else:
+        file_ids = None
+
+    selected: List[int] = []
+    for step in range(k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity if step else relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+        if file_ids is not None:
+            file_counts[file_ids[best]] += 1
+            if file_counts[file_ids[best]] >= per_file_cap:
+                available[file_ids == file_ids[best]] = False
+    return selected
+
+
+def diversify(docs: List[Dict], embeddings_by_id: Dict[str, np.ndarray], k: int,
+              lambda_mult: float = 0.7, per_file_cap: int = 0) -> List[Dict]:
+    """对一组按相关性排好序的检索结果做 MMR / 单文件上限选择
+
+    缺少向量的候选按零向量处理（只参与相关性，不产生冗余惩罚）。
+    """
+    if len(docs) <= 1:
+        return docs[:k]
+    dims = {len(v) for v in embeddings_by_id.values()}
+    if len(dims) != 1:
+        return docs[:k]
+    dim = dims.pop()
+
+    matrix = np.zeros((len(docs), dim), dtype=np.float32)
+    for row, doc in enumerate(docs):
+        vector = embeddings_by_id.get(doc['id'])
+        if vector is not None:
+            matrix[row] = vector
+    file_keys = [doc['metadata'].get('file_path', doc['id']) for doc in docs]
+    selected = mmr_select(matrix, rank_relevance(len(docs)), k, lambda_mult, file_keys, per_file_cap)
+    return [docs[row] for row in selected]
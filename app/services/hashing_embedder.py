@@ -0,0 +1,120 @@
+# app/services/hashing_embedder.py
+import zlib
+import numpy as np
+from typing import List, Dict, Tuple
+import logging
+
+from .code_tokenizer import tokenize_code
+
+logger = logging.getLogger(__name__)
+
+
+class HashingEmbedder:
+    """基于特征哈希的确定性嵌入器
+
+    对代码感知分词结果和字符 n-gram 做带符号的特征哈希，
+    无需下载模型，结果与进程、机器无关（使用 crc32 而非 Python 内置 hash）。
+    接口与 SentenceTransformer.encode 保持兼容，可以直接替换。
+    """
+
+    VERSION = 1
+
+    def __init__(self, dim: int = 384, ngram_range: Tuple[int, int] = (3, 4),
+                 token_weight: float = 1.0, ngram_weight: float = 0.5,
+                 max_cache_size: int = 200_000):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.token_weight = token_weight
+        self.ngram_weight = ngram_weight
+        self.max_cache_size = max_cache_size
+        # token -> (bucket数组, 带符号权重数组)
+        self._feature_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def model_name(self) -> str:
+        lo, hi = self.ngram_range
+        return f"hashing-v{self.VERSION}-d{self.dim}-ng{lo}{hi}"
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _token_features(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        """计算单个 token 的哈希特征（带缓存，代码中 token 重复度很高）"""
+        cached = self._feature_cache.get(token)
+        if cached is not None:
+            return cached
+
+        features = [token]
+        weights = [self.token_weight]
+        padded = f"<{token}>"
+        lo, hi = self.ngram_range
+        for n in range(lo, hi + 1):
+            for i in range(len(padded) - n + 1):
+                features.append(padded[i:i + n])
+                weights.append(self.ngram_weight)
+
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode('utf-8')) for f in features),
+            dtype=np.int64, count=len(features)
+        )
+        buckets = (hashes % self.dim).astype(np.int64)
+        signs = np.where((hashes // self.dim) & 1, -1.0, 1.0)
+        values = (signs * np.asarray(weights)).astype(np.float32)
+
+        if len(self._feature_cache) >= self.max_cache_size:
+            self._feature_cache.clear()
+        self._feature_cache[token] = (buckets, values)
+        return buckets, values
+
+    def encode(self, texts, batch_size: int = 1024, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = True,
+               **kwargs) -> np.ndarray:
+        """批量编码文本，返回 L2 归一化的 float32 矩阵"""
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size=batch_size)[0]
+
+        texts = list(texts)
+        output = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            output[start:start + batch_size] = self._encode_batch(texts[start:start + batch_size])
+        return output
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        n = len(texts)
+        token_ids: Dict[str, int] = {}
+        doc_token_ids: List[int] = []
+        doc_rows: List[int] = []
+
+        for row, text in enumerate(texts):
+            for token in tokenize_code(text or ''):
+                tid = token_ids.setdefault(token, len(token_ids))
+                doc_token_ids.append(tid)
+                doc_rows.append(row)
+
+        if not doc_token_ids:
+            return np.zeros((n, self.dim), dtype=np.float32)
+
+        # 拼接本批次所有唯一 token 的特征，按 CSR 方式寻址
+        features = [self._token_features(token) for token in token_ids]
+        lengths = np.fromiter((len(b) for b, _ in features), dtype=np.int64, count=len(features))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        all_buckets = np.concatenate([b for b, _ in features])
+        all_values = np.concatenate([v for _, v in features])
+
+        # 向量化展开：每个 token 出现 -> 它的全部特征
+        tids = np.asarray(doc_token_ids, dtype=np.int64)
+        rows = np.asarray(doc_rows, dtype=np.int64)
+        counts = lengths[tids]
+        ends = np.cumsum(counts)
+        offsets = np.repeat(starts[tids] - (ends - counts), counts) + np.arange(ends[-1])
+
+        flat_index = np.repeat(rows, counts) * self.dim + all_buckets[offsets]
+        matrix = np.bincount(
+            flat_index, weights=all_values[offsets], minlength=n * self.dim
+        ).reshape(n, self.dim)
+
+        # 次线性词频 + L2 归一化
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
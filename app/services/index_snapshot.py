@@ -0,0 +1,158 @@
+# app/services/index_snapshot.py
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"URAGSNAP"
+SNAPSHOT_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+
+class SnapshotTexts(Sequence):
+    """快照中的块文本：按偏移量从内存映射的字节块中按需解码"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._blob[start:end].tobytes().decode('utf-8')
+
+
+class IndexSnapshot:
+    """读取后的快照：manifest + 内存映射的向量矩阵 + 按需解码的文本"""
+
+    def __init__(self, path: str, manifest: Dict, ids: List[str], metadatas: List[Dict],
+                 embeddings: np.ndarray, texts: SnapshotTexts, extras: Dict):
+        self.path = path
+        self.manifest = manifest
+        self.ids = ids
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+        self.texts = texts
+        self.extras = extras
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.manifest.get('embedding_model')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _pad(f):
+    remainder = f.tell() % _ALIGNMENT
+    if remainder:
+        f.write(b"\0" * (_ALIGNMENT - remainder))
+
+
+def write_snapshot(path: str, ids: List[str], embeddings: np.ndarray, texts: Sequence[str],
+                   metadatas: List[Dict], embedding_model: Optional[str] = None,
+                   extras: Optional[Dict] = None, info: Optional[Dict] = None) -> Dict:
+    """写出单文件快照，返回 manifest
+
+    文件布局：魔数(8) + manifest偏移(8) + manifest长度(8) + 按64字节对齐的数据段 + manifest(JSON)。
+    数据段：embeddings(float32, n x dim)、text_offsets(int64, n+1)、texts(utf-8)、
+    records(JSON: ids + metadatas)，以及 extras 中的每一项（JSON，如符号表）。
+    先写临时文件再原子替换。
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    sections = [
+        ('embeddings', embeddings.tobytes(), {'dtype': 'float32', 'shape': list(embeddings.shape)}),
+        ('text_offsets', offsets.tobytes(), {'dtype': 'int64', 'shape': [len(offsets)]}),
+        ('texts', b"".join(encoded), {'dtype': 'uint8', 'shape': [int(offsets[-1])]}),
+        ('records', json.dumps({'ids': list(ids), 'metadatas': metadatas},
+                               ensure_ascii=False).encode('utf-8'), {'dtype': 'json'}),
+    ]
+    for name, value in (extras or {}).items():
+        sections.append((f"extra:{name}", json.dumps(value, ensure_ascii=False).encode('utf-8'),
+                         {'dtype': 'json'}))
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'created_at': time.time(),
+        'embedding_model': embedding_model,
+        'embedding_dim': int(embeddings.shape[1]) if embeddings.ndim == 2 and embeddings.size else 0,
+        'count': len(ids),
+        **(info or {}),
+        'sections': {}
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(np.zeros(2, dtype=np.uint64).tobytes())  # manifest 偏移与长度，最后回填
+        for name, data, spec in sections:
+            _pad(f)
+            manifest['sections'][name] = dict(spec, offset=f.tell(), length=len(data))
+            f.write(data)
+        manifest_offset = f.tell()
+        manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+        f.write(manifest_bytes)
+        f.seek(len(SNAPSHOT_MAGIC))
+        f.write(np.asarray([manifest_offset, len(manifest_bytes)], dtype=np.uint64).tobytes())
+    os.replace(tmp_path, path)
+    logger.info(f"💾 快照已导出: {path} ({len(ids)} 个块, {os.path.getsize(path) / 1024 / 1024:.1f}MB)")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict:
+    """只读取快照的 manifest"""
+    with open(path, 'rb') as f:
+        if f.read(8) != SNAPSHOT_MAGIC:
+            raise ValueError(f"不是有效的索引快照: {path}")
+        manifest_offset, manifest_length = (int(v) for v in np.frombuffer(f.read(16), dtype=np.uint64))
+        f.seek(manifest_offset)
+        manifest = json.loads(f.read(manifest_length).decode('utf-8'))
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"快照格式版本 {manifest.get('format_version')} 与当前版本 {SNAPSHOT_FORMAT_VERSION} 不兼容"
+        )
+    return manifest
+
+
+def read_snapshot(path: str) -> IndexSnapshot:
+    """以内存映射方式打开快照：向量和文本不复制进内存，只解析 ids / 元数据"""
+    manifest = read_manifest(path)
+    sections = manifest['sections']
+    raw = np.memmap(path, dtype=np.uint8, mode='r')
+
+    def section(name: str) -> np.ndarray:
+        spec = sections[name]
+        return raw[spec['offset']:spec['offset'] + spec['length']]
+
+    def json_section(name: str):
+        return json.loads(section(name).tobytes().decode('utf-8'))
+
+    spec = sections['embeddings']
+    embeddings = np.ndarray(
+        shape=tuple(spec['shape']), dtype=np.float32,
+        buffer=raw, offset=spec['offset']
+    ) if spec['length'] else np.zeros((0, 0), dtype=np.float32)
+    offsets = section('text_offsets').view(np.int64)
+    texts = SnapshotTexts(section('texts'), offsets)
+    records = json_section('records')
+    extras = {
+        name.split(':', 1)[1]: json_section(name)
+        for name in sections if name.startswith('extra:')
+    }
+    return IndexSnapshot(path, manifest, records['ids'], records['metadatas'],
+                         embeddings, texts, extras)
@@ -0,0 +1,228 @@
+# app/services/llm_client.py
+import asyncio
+import contextlib
+import json
+import random
+import time
+import weakref
+from typing import AsyncIterator, Dict, List, Optional
+import logging
+
+import aiohttp
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """大模型调用失败（重试耗尽或不可重试的错误）"""
+
+
+class AsyncLLMClient:
+    """长连接、带连接池的异步大模型客户端（OpenAI 兼容的 /chat/completions 接口）
+
+    - 每个事件循环一个 aiohttp.ClientSession，复用TCP / TLS连接；
+    - 每次调用有总超时和连接超时；
+    - 信号量限制同时进行的请求数；
+    - 429 / 5xx / 连接错误 / 超时按指数退避 + 全抖动重试，优先遵守 Retry-After；
+    - stream_chat 按 SSE 逐个产出增量文本，统计首个 token 的延迟（TTFT）。
+    base_url 可配置，测试时指向本地桩服务器（benchmarks/llm_stub_server.py）。
+    """
+
+    RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 model: Optional[str] = None, timeout: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, max_retries: Optional[int] = None):
+        self.api_key = api_key
+        self.base_url = (base_url or settings.RAG_LLM_BASE_URL).rstrip('/')
+        self.model = model or settings.RAG_LLM_MODEL
+        self.timeout = settings.RAG_LLM_TIMEOUT if timeout is None else timeout
+        self.max_concurrency = max(1, max_concurrency or settings.RAG_LLM_MAX_CONCURRENCY)
+        self.max_retries = settings.RAG_LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = \
+            weakref.WeakKeyDictionary()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_seconds = 0.0
+        self.streams = 0
+        self.total_ttft_seconds = 0.0
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def _session(self) -> aiohttp.ClientSession:
+        """当前事件循环的会话（aiohttp 会话不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.RAG_LLM_POOL_SIZE,
+                keepalive_timeout=settings.RAG_LLM_KEEPALIVE
+            )
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            session = aiohttp.ClientSession(connector=connector, headers=headers)
+            self._sessions[loop] = session
+        return session
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """全抖动指数退避：[0, min(上限, 基数 * 2^attempt)] 内均匀取值"""
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.RAG_LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+        ceiling = min(settings.RAG_LLM_BACKOFF_MAX, settings.RAG_LLM_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    @contextlib.asynccontextmanager
+    async def _request(self, payload: Dict):
+        """占用一个并发名额，重试直到拿到 200 响应，产出尚未读取的响应"""
+        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=settings.RAG_LLM_CONNECT_TIMEOUT)
+        session = self._session()
+
+        async with self._semaphore():
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            start = time.perf_counter()
+            try:
+                response = await self._open(session, payload, timeout)
+                try:
+                    yield response
+                finally:
+                    response.release()
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.total_seconds += time.perf_counter() - start
+
+    async def _open(self, session: aiohttp.ClientSession, payload: Dict,
+                    timeout: aiohttp.ClientTimeout) -> aiohttp.ClientResponse:
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await session.post(self.endpoint, json=payload, timeout=timeout)
+                if response.status == 200:
+                    return response
+                body = (await response.text())[:200]
+                response.release()
+                if response.status not in self.RETRY_STATUSES:
+                    raise LLMError(f"HTTP {response.status}: {body}")
+                retry_after = response.headers.get("Retry-After")
+                error = LLMError(f"HTTP {response.status}: {body}")
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                error = LLMError(f"请求超时（{self.timeout}s）")
+            except aiohttp.ClientError as e:
+                error = LLMError(f"连接错误: {e}")
+
+            if attempt == self.max_retries:
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            self.retries += 1
+            logger.warning(f"⚠️ 大模型调用失败（{error}），{delay:.2f}s 后第 {attempt + 1} 次重试")
+            await asyncio.sleep(delay)
+
+    async def chat(self, messages: List[Dict], temperature: float = 0, **params) -> str:
+        """发送对话请求并返回回答文本"""
+        payload = {"model": self.model, "messages": messages, "temperature": temperature, **params}
+        async with self._request(payload) as response:
+            try:
+                result = await response.json(content_type=None)
+                return result["choices"][0]["message"]["content"]
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMError(f"请求超时（{self.timeout}s）")
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise LLMError(f"无法解析的响应: {e!r}")
+
+    async def stream_chat(self, messages: List[Dict], temperature: float = 0,
+                          **params) -> AsyncIterator[str]:
+        """流式对话：逐个产出增量文本（OpenAI SSE 格式：data: {...} ... data: [DONE]）
+
+        只在收到响应头之前重试；开始输出后出错直接抛出 LLMError。
+        """
+        payload = {"model": self.model, "messages": messages, "temperature": temperature,
+                   "stream": True, **params}
+        start = time.perf_counter()
+        first = True
+        async with self._request(payload) as response:
+            try:
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                        raise LLMError(f"无法解析的流式响应: {e!r}")
+                    if not delta:
+                        continue
+                    if first:
+                        first = False
+                        self.streams += 1
+                        self.total_ttft_seconds += time.perf_counter() - start
+                    yield delta
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMError(f"流式响应超时（{self.timeout}s）")
+            except aiohttp.ClientError as e:
+                raise LLMError(f"流式响应中断: {e}")
+
+    async def complete(self, prompt: str, **params) -> str:
+        """单轮提问"""
+        return await self.chat([{"role": "user", "content": prompt}], **params)
+
+    def stream(self, prompt: str, **params) -> AsyncIterator[str]:
+        """单轮提问（流式）"""
+        return self.stream_chat([{"role": "user", "content": prompt}], **params)
+
+    def stats(self) -> Dict:
+        return {
+            'base_url': self.base_url,
+            'model': self.model,
+            'calls': self.calls,
+            'failures': self.failures,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'max_concurrency': self.max_concurrency,
+            'avg_ms': round(self.total_seconds * 1000 / self.calls, 2) if self.calls else 0.0,
+            'streams': self.streams,
+            'avg_ttft_ms': round(self.total_ttft_seconds * 1000 / self.streams, 2) if self.streams else 0.0
+        }
+
+    async def close(self):
+        """关闭当前事件循环上的会话（应用退出时调用）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        session = self._sessions.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
@@ -0,0 +1,195 @@
+# app/services/metadata_index.py
+import operator
+import numpy as np
+from typing import List, Dict, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_RANGE_OPS = {
+    '$gt': operator.gt,
+    '$gte': operator.ge,
+    '$lt': operator.lt,
+    '$lte': operator.le,
+}
+
+
+def _popcount(bits: int) -> int:
+    try:
+        return bits.bit_count()
+    except AttributeError:  # Python < 3.10
+        return bin(bits).count('1')
+
+
+class MetadataBitmapIndex:
+    """文本块元数据的位图索引
+
+    每个 (字段, 取值) 对应一个以行号为位的位图（Python 大整数，位运算在C层完成）。
+    过滤条件先解析为行集合，再交给向量检索：集合很小时直接做预过滤精确检索，
+    否则仍交给向量数据库的 where 过滤。
+    """
+
+    INDEXED_FIELDS = ('file_type', 'chunk_type', 'block_type', 'class_name', 'complexity')
+
+    def __init__(self, fields: Sequence[str] = INDEXED_FIELDS):
+        self.fields = tuple(fields)
+        self.reset()
+
+    def reset(self):
+        self.ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._row_values: List[Tuple] = []
+        self._bitmaps: Dict[str, Dict[object, int]] = {field: {} for field in self.fields}
+        self._alive = 0
+
+    def __len__(self) -> int:
+        return _popcount(self._alive)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def add(self, ids: Sequence[str], metadatas: Sequence[Dict]):
+        """写入（upsert语义：已有行先清除旧取值的位）
+
+        同一批次内先按 (字段, 取值) 收集行号，再一次性合并进位图，
+        避免逐行对大整数做或运算。
+        """
+        pending: Dict[Tuple[str, object], List[int]] = {}
+        rows = []
+        for chunk_id, metadata in zip(ids, metadatas):
+            row = self._id_to_row.get(chunk_id)
+            if row is None:
+                row = len(self.ids)
+                self._id_to_row[chunk_id] = row
+                self.ids.append(chunk_id)
+                self._row_values.append(())
+            else:
+                self._clear_row(row)
+
+            values = tuple(metadata.get(field) for field in self.fields)
+            for field, value in zip(self.fields, values):
+                pending.setdefault((field, value), []).append(row)
+            self._row_values[row] = values
+            rows.append(row)
+
+        for (field, value), value_rows in pending.items():
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] = bitmaps.get(value, 0) | self._rows_to_bits(value_rows)
+        self._alive |= self._rows_to_bits(rows)
+
+    def remove(self, ids: Sequence[str]):
+        for chunk_id in ids:
+            row = self._id_to_row.get(chunk_id)
+            if row is not None:
+                self._clear_row(row)
+
+    def _clear_row(self, row: int):
+        bit = 1 << row
+        for field, value in zip(self.fields, self._row_values[row]):
+            bitmaps = self._bitmaps[field]
+            if value in bitmaps:
+                bitmaps[value] &= ~bit
+        self._row_values[row] = ()
+        self._alive &= ~bit
+
+    # ------------------------------------------------------------------
+    # 过滤条件解析
+    # ------------------------------------------------------------------
+    def resolve(self, where: Optional[Dict]) -> Optional[int]:
+        """把Chroma风格的where条件解析为行位图
+
+        条件涉及未建索引的字段或不支持的操作符时返回 None，由调用方回退到原有过滤路径。
+        """
+        if not where:
+            return self._alive
+        result = self._alive
+        for key, condition in where.items():
+            if key == '$and':
+                for sub in condition:
+                    bits = self.resolve(sub)
+                    if bits is None:
+                        return None
+                    result &= bits
+            elif key == '$or':
+                union = 0
+                for sub in condition:
+                    bits = self.resolve(sub)
+                    if bits is None:
+                        return None
+                    union |= bits
+                result &= union
+            else:
+                bits = self._resolve_field(key, condition)
+                if bits is None:
+                    return None
+                result &= bits
+        return result
+
+    def _resolve_field(self, field: str, condition) -> Optional[int]:
+        bitmaps = self._bitmaps.get(field)
+        if bitmaps is None:
+            return None
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+
+        result = self._alive
+        for op, value in condition.items():
+            if op == '$eq':
+                result &= bitmaps.get(value, 0)
+            elif op == '$ne':
+                result &= ~bitmaps.get(value, 0)
+            elif op in ('$in', '$nin'):
+                union = 0
+                for item in value:
+                    union |= bitmaps.get(item, 0)
+                result &= union if op == '$in' else ~union
+            elif op in _RANGE_OPS:
+                # 取值种类很少（如 complexity），对每个取值判断一次后合并位图
+                compare = _RANGE_OPS[op]
+                union = 0
+                for item, bits in bitmaps.items():
+                    if isinstance(item, (int, float)) and not isinstance(item, bool) and compare(item, value):
+                        union |= bits
+                result &= union
+            else:
+                return None
+        return result
+
+    # ------------------------------------------------------------------
+    # 位图转换
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _rows_to_bits(rows: Sequence[int]) -> int:
+        """行号列表 -> 位图"""
+        if not len(rows):
+            return 0
+        rows = np.asarray(rows, dtype=np.int64)
+        packed = np.zeros(int(rows.max()) // 8 + 1, dtype=np.uint8)
+        np.bitwise_or.at(packed, rows >> 3, (1 << (rows & 7)).astype(np.uint8))
+        return int.from_bytes(packed.tobytes(), 'little')
+
+    @staticmethod
+    def count(bits: int) -> int:
+        return _popcount(bits)
+
+    def mask(self, bits: int) -> np.ndarray:
+        """位图 -> 布尔行掩码"""
+        n = len(self.ids)
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        raw = np.frombuffer(bits.to_bytes((n + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder='little')[:n].astype(bool)
+
+    def rows(self, bits: int) -> np.ndarray:
+        """位图 -> 行号数组"""
+        return np.flatnonzero(self.mask(bits))
+
+    def ids_for(self, bits: int) -> List[str]:
+        """位图 -> 块ID列表"""
+        return [self.ids[row] for row in self.rows(bits)]
+
+    def stats(self) -> Dict:
+        return {
+            'rows': len(self),
+            'fields': {field: len(values) for field, values in self._bitmaps.items()}
+        }
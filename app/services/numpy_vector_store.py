@@ -0,0 +1,541 @@
+# app/services/numpy_vector_store.py
+import json
+import os
+import numpy as np
+from typing import List, Dict, Optional, Any
+import logging
+
+from .chunk_utils import unpack_chunk, clean_chunk_metadata
+from .metadata_index import MetadataBitmapIndex
+from .index_snapshot import IndexSnapshot, read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class NumpyVectorStore:
+    """进程内精确检索的向量存储
+
+    所有向量保存在一个连续的、已归一化的 float32 矩阵中，
+    top-k 检索只需一次矩阵乘法加 argpartition，不依赖任何数据库。
+    持久化为 .npy 文件，加载时以内存映射方式打开。
+    写入 / 删除只修改内存并标记为脏，由 flush()（构建或重建结束时）一次写盘，
+    连续的增量写入不会每次都重写整个矩阵。
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    RECORDS_FILE = "records.jsonl"
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, persist_directory: Optional[str] = None, embedder=None, query_cache=None):
+        """embedder: 提供 embed_query / embed_queries 的对象（如 UnityTextProcessor）
+        query_cache: 可选的 QueryCache，放在查询向量生成前面
+        """
+        self.persist_directory = persist_directory
+        self.embedder = embedder
+        self.query_cache = query_cache
+        self.collection_name = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._id_to_row: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._metadata_index: Optional[MetadataBitmapIndex] = None
+        # 当前集合记录的嵌入模型（写入清单，查询向量按它校验）
+        self.embedding_model: Optional[str] = None
+        # 内存中有尚未写盘的修改
+        self._dirty = False
+        # 集合内容每次变化时递增，供查询缓存判断失效
+        self.index_version = 0
+        if persist_directory:
+            os.makedirs(persist_directory, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # 集合管理
+    # ------------------------------------------------------------------
+    @property
+    def collection(self):
+        """与 ChromaVectorStore 保持一致：未打开集合时为 None"""
+        return self.collection_name
+
+    def _collection_dir(self, collection_name: str) -> Optional[str]:
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, collection_name)
+
+    def create_collection(self, collection_name: str = "unity_project", **index_params):
+        """创建或加载集合（HNSW 等近似索引参数对精确检索无意义，忽略）"""
+        self.collection_name = collection_name
+        self._reset()
+        collection_dir = self._collection_dir(collection_name)
+        current_model = getattr(self.embedder, 'embedding_model_name', None)
+        if collection_dir and os.path.exists(os.path.join(collection_dir, self.MANIFEST_FILE)):
+            self._load(collection_dir)
+            if current_model and self.embedding_model and self.embedding_model != current_model:
+                logger.warning(
+                    f"⚠️ 集合 {collection_name} 由 {self.embedding_model} 构建，"
+                    f"与当前嵌入模型 {current_model} 不一致，重建集合"
+                )
+                self._reset()
+                self._dirty = True
+            else:
+                logger.info(f"✅ 加载现有集合: {collection_name} ({len(self.ids)} 个向量)")
+        else:
+            logger.info(f"✅ 创建新集合: {collection_name}")
+        # 旧清单未记录模型时按当前嵌入模型处理
+        self.embedding_model = self.embedding_model or current_model
+        self.index_version += 1
+
+    def _reset(self):
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._id_to_row = {}
+        self._columns = {}
+        self._metadata_index = None
+        self.embedding_model = None
+        self._dirty = False
+
+    def delete_collection(self, collection_name: str):
+        """删除集合"""
+        collection_dir = self._collection_dir(collection_name)
+        if collection_dir and os.path.isdir(collection_dir):
+            for name in (self.EMBEDDINGS_FILE, self.RECORDS_FILE, self.MANIFEST_FILE):
+                path = os.path.join(collection_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            try:
+                os.rmdir(collection_dir)
+            except OSError:
+                pass
+        if self.collection_name == collection_name:
+            self.collection_name = None
+            self._reset()
+        self.index_version += 1
+        logger.info(f"🗑️ 删除集合: {collection_name}")
+
+    def list_collections(self) -> List[str]:
+        """列出所有集合"""
+        if not self.persist_directory:
+            return [self.collection_name] if self.collection_name else []
+        return sorted(
+            name for name in os.listdir(self.persist_directory)
+            if os.path.exists(os.path.join(self.persist_directory, name, self.MANIFEST_FILE))
+        )
+
+    def get_by_ids(self, ids: List[str]) -> List[Dict]:
+        """按ID批量取回文档（保持传入顺序，不存在的ID被跳过）"""
+        return [
+            {'id': chunk_id, 'content': self.documents[row], 'metadata': self.metadatas[row]}
+            for chunk_id in ids
+            for row in [self._id_to_row.get(chunk_id)]
+            if row is not None
+        ]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """按ID批量取回已存储的（归一化）向量，不存在的ID被跳过"""
+        rows = {chunk_id: self._id_to_row.get(chunk_id) for chunk_id in ids}
+        return {
+            chunk_id: np.asarray(self.embeddings[row], dtype=np.float32)
+            for chunk_id, row in rows.items()
+            if row is not None
+        }
+
+    def get_collection_info(self) -> Dict:
+        """获取集合信息"""
+        if not self.collection_name:
+            return {}
+        return {
+            'document_count': len(self.ids),
+            'name': self.collection_name,
+            'persist_directory': self.persist_directory,
+            'dimension': int(self.embeddings.shape[1]) if self.embeddings.size else 0,
+            'embedding_model': self.embedding_model
+        }
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _materialize_documents(self):
+        """从快照加载的文本是按需解码的只读序列，写入前转为列表"""
+        if not isinstance(self.documents, list):
+            self.documents = list(self.documents)
+
+    def add_documents(self, chunks, embeddings, batch_size: Optional[int] = None) -> List[str]:
+        """写入文档块（upsert语义：相同ID覆盖原有行）
+
+        整批一次追加到内存矩阵，不分批；batch_size 只为与其他后端的接口一致而保留。
+        修改在 flush() 时写盘。
+        """
+        embeddings = np.asarray(embeddings)
+        self._materialize_documents()
+        new_rows, new_ids, new_docs, new_metas = [], [], [], []
+        updates = {}
+        pending = {}
+
+        for i, chunk in enumerate(chunks):
+            text, metadata, chunk_id = unpack_chunk(chunk)
+            if not text:
+                continue
+            metadata = clean_chunk_metadata(metadata)
+            if chunk_id in self._id_to_row:
+                updates[self._id_to_row[chunk_id]] = (i, text, metadata)
+            elif chunk_id in pending:
+                # 同一批次内的重复ID：后者覆盖前者
+                position = pending[chunk_id]
+                new_rows[position], new_docs[position], new_metas[position] = i, text, metadata
+            else:
+                pending[chunk_id] = len(new_ids)
+                new_rows.append(i)
+                new_ids.append(chunk_id)
+                new_docs.append(text)
+                new_metas.append(metadata)
+
+        if self.embeddings.size and updates:
+            # 内存映射加载的矩阵是只读的，先转为内存副本
+            if not self.embeddings.flags.writeable:
+                self.embeddings = np.array(self.embeddings)
+            rows = list(updates.keys())
+            self.embeddings[rows] = self._normalize(embeddings[[updates[r][0] for r in rows]])
+            for row, (_, text, metadata) in updates.items():
+                self.documents[row] = text
+                self.metadatas[row] = metadata
+
+        if new_ids:
+            block = self._normalize(embeddings[new_rows])
+            if self.embeddings.size:
+                self.embeddings = np.ascontiguousarray(np.vstack([self.embeddings, block]))
+            else:
+                self.embeddings = np.ascontiguousarray(block)
+            for chunk_id in new_ids:
+                self._id_to_row[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+            self.documents.extend(new_docs)
+            self.metadatas.extend(new_metas)
+
+        self._columns = {}
+        self._metadata_index = None
+        self.index_version += 1
+        self._dirty = True
+        logger.info(f"✅ 成功写入 {len(new_ids) + len(updates)} 个文档到内存向量存储")
+        return [self.ids[row] for row in updates] + new_ids
+
+    def delete(self, ids: List[str]) -> int:
+        """按ID删除"""
+        rows = sorted(self._id_to_row[i] for i in ids if i in self._id_to_row)
+        if not rows:
+            return 0
+        self._materialize_documents()
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self.embeddings = np.ascontiguousarray(self.embeddings[keep])
+        keep_rows = np.flatnonzero(keep)
+        self.ids = [self.ids[r] for r in keep_rows]
+        self.documents = [self.documents[r] for r in keep_rows]
+        self.metadatas = [self.metadatas[r] for r in keep_rows]
+        self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._columns = {}
+        self._metadata_index = None
+        self.index_version += 1
+        self._dirty = True
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def flush(self):
+        """有未写盘的修改时保存到磁盘"""
+        if self._dirty:
+            self.persist()
+
+    def persist(self):
+        """保存到磁盘（先写临时文件再原子替换）"""
+        collection_dir = self._collection_dir(self.collection_name or "")
+        if not collection_dir or not self.collection_name:
+            return
+        os.makedirs(collection_dir, exist_ok=True)
+
+        embeddings_path = os.path.join(collection_dir, self.EMBEDDINGS_FILE)
+        with open(embeddings_path + ".tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+
+        records_path = os.path.join(collection_dir, self.RECORDS_FILE)
+        with open(records_path + ".tmp", 'w', encoding='utf-8') as f:
+            for chunk_id, text, metadata in zip(self.ids, self.documents, self.metadatas):
+                f.write(json.dumps({'id': chunk_id, 'content': text, 'metadata': metadata},
+                                   ensure_ascii=False) + "\n")
+
+        manifest_path = os.path.join(collection_dir, self.MANIFEST_FILE)
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                'name': self.collection_name,
+                'count': len(self.ids),
+                'dimension': int(self.embeddings.shape[1]) if self.embeddings.size else 0,
+                'embedding_model': self.embedding_model
+            }, f)
+
+        # 内存映射中的旧文件在Windows上无法被替换，先释放
+        if isinstance(self.embeddings, np.memmap):
+            self.embeddings = np.array(self.embeddings)
+        for path in (embeddings_path, records_path, manifest_path):
+            os.replace(path + ".tmp", path)
+        self._dirty = False
+        logger.info(f"💾 集合已写盘: {self.collection_name} ({len(self.ids)} 个向量)")
+
+    def _load(self, collection_dir: str):
+        """加载集合：向量矩阵以内存映射方式打开"""
+        with open(os.path.join(collection_dir, self.MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.embedding_model = json.load(f).get('embedding_model')
+        self.embeddings = np.load(os.path.join(collection_dir, self.EMBEDDINGS_FILE), mmap_mode='r')
+        with open(os.path.join(collection_dir, self.RECORDS_FILE), 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                self._id_to_row[record['id']] = len(self.ids)
+                self.ids.append(record['id'])
+                self.documents.append(record['content'])
+                self.metadatas.append(record['metadata'])
+
+    def export_snapshot(self, path: str, extras: Optional[Dict] = None,
+                        info: Optional[Dict] = None) -> Dict:
+        """把当前集合导出为单文件快照"""
+        return write_snapshot(
+            path, self.ids, self.embeddings, self.documents, self.metadatas,
+            embedding_model=self.embedding_model,
+            extras=extras,
+            info=dict(info or {}, collection=self.collection_name)
+        )
+
+    def load_snapshot(self, path: str, collection_name: Optional[str] = None) -> IndexSnapshot:
+        """直接以快照作为集合：向量内存映射、文本按需解码，不重新写盘"""
+        snapshot = read_snapshot(path)
+        expected = getattr(self.embedder, 'embedding_model_name', None)
+        if expected and snapshot.embedding_model and snapshot.embedding_model != expected:
+            raise ValueError(f"快照由 {snapshot.embedding_model} 构建，与当前嵌入模型 {expected} 不一致")
+
+        self.collection_name = collection_name or snapshot.manifest.get('collection') or "unity_project"
+        self._reset()
+        embeddings = snapshot.embeddings
+        sample = embeddings[:min(len(embeddings), 64)]
+        if len(sample) and not np.allclose(np.linalg.norm(sample, axis=1), 1.0, atol=1e-3):
+            embeddings = self._normalize(embeddings)
+        self.embeddings = embeddings
+        self.ids = list(snapshot.ids)
+        self.documents = snapshot.texts
+        self.metadatas = snapshot.metadatas
+        self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.embedding_model = snapshot.embedding_model or expected
+        self.index_version += 1
+        logger.info(f"✅ 从快照加载集合: {self.collection_name} ({len(self.ids)} 个向量)")
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # 过滤
+    # ------------------------------------------------------------------
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            column = np.empty(len(self.metadatas), dtype=object)
+            column[:] = [metadata.get(field) for metadata in self.metadatas]
+            self._columns[field] = column
+        return column
+
+    def _bitmap_index(self) -> MetadataBitmapIndex:
+        """元数据位图索引（写入后失效，下次过滤时重建）"""
+        if self._metadata_index is None:
+            index = MetadataBitmapIndex()
+            index.add(self.ids, self.metadatas)
+            self._metadata_index = index
+        return self._metadata_index
+
+    def _filter_mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """把Chroma风格的where条件转换为行掩码
+
+        先尝试用位图索引解析，涉及未建索引字段时逐列比较。
+        """
+        if not where:
+            return None
+        index = self._bitmap_index()
+        bits = index.resolve(where)
+        if bits is not None:
+            return index.mask(bits)
+        return self._column_mask(where)
+
+    def _column_mask(self, where: Dict) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for sub in condition:
+                    mask &= self._column_mask(sub)
+            elif key == '$or':
+                sub_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in condition:
+                    sub_mask |= self._column_mask(sub)
+                mask &= sub_mask
+            else:
+                mask &= self._field_mask(key, condition)
+        return mask
+
+    def _field_mask(self, field: str, condition: Any) -> np.ndarray:
+        column = self._column(field)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+
+        mask = np.ones(len(column), dtype=bool)
+        for op, value in condition.items():
+            if op == '$eq':
+                mask &= column == value
+            elif op == '$ne':
+                mask &= column != value
+            elif op in ('$in', '$nin'):
+                hit = np.zeros(len(column), dtype=bool)
+                for item in value:
+                    hit |= column == item
+                mask &= hit if op == '$in' else ~hit
+            elif op in ('$gt', '$gte', '$lt', '$lte'):
+                numeric = np.array([v if isinstance(v, (int, float)) else np.nan for v in column],
+                                   dtype=np.float64)
+                with np.errstate(invalid='ignore'):
+                    if op == '$gt':
+                        mask &= numeric > value
+                    elif op == '$gte':
+                        mask &= numeric >= value
+                    elif op == '$lt':
+                        mask &= numeric < value
+                    else:
+                        mask &= numeric <= value
+            else:
+                raise ValueError(f"不支持的过滤操作符: {op}")
+        return mask
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+    def _format(self, row: int, score: float) -> Dict:
+        return {
+            'id': self.ids[row],
+            'content': self.documents[row],
+            'metadata': self.metadatas[row],
+            'distance': 1.0 - score,
+            'score': score
+        }
+
+    def _check_query_vector(self, embeddings: np.ndarray, model_name: Optional[str] = None):
+        """拒绝与集合维度或嵌入模型不匹配的查询向量"""
+        if self.embeddings.size and embeddings.shape[-1] != self.embeddings.shape[1]:
+            raise ValueError(
+                f"查询向量维度 {embeddings.shape[-1]} 与集合维度 {self.embeddings.shape[1]} 不匹配"
+            )
+        if model_name and self.embedding_model and model_name != self.embedding_model:
+            raise ValueError(f"查询向量模型 {model_name} 与集合模型 {self.embedding_model} 不匹配")
+
+    def search_many_by_embedding(self, embeddings: np.ndarray, n_results: int = 5,
+                                 where_filter: Optional[Dict] = None,
+                                 model_name: Optional[str] = None) -> List[List[Dict]]:
+        """批量精确检索：一次矩阵乘法 + argpartition"""
+        if not self.ids:
+            return [[] for _ in range(len(embeddings))]
+
+        queries = self._normalize(np.atleast_2d(embeddings))
+        self._check_query_vector(queries, model_name)
+
+        # 预过滤：只对满足条件的行做矩阵乘法
+        mask = self._filter_mask(where_filter)
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return [[] for _ in range(len(queries))]
+            scores = queries @ self.embeddings[candidates].T
+        else:
+            candidates = None
+            scores = queries @ self.embeddings.T
+
+        k = min(n_results, scores.shape[1])
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if candidates is not None:
+            top = candidates[top]
+
+        return [
+            [self._format(int(row), float(score)) for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(top, top_scores)
+        ]
+
+    def search_by_embedding(self, embedding: np.ndarray, n_results: int = 5,
+                            where_filter: Optional[Dict] = None,
+                            model_name: Optional[str] = None) -> List[Dict]:
+        """通过嵌入向量搜索"""
+        return self.search_many_by_embedding(
+            np.asarray(embedding)[None, :], n_results, where_filter, model_name
+        )[0]
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """批量生成查询向量（经过查询缓存）"""
+        if self.embedder is None:
+            raise RuntimeError("NumpyVectorStore 未配置 embedder，无法按文本检索")
+        if self.query_cache is not None:
+            return self.query_cache.get_embeddings(queries, self.embedder.embed_queries, self.index_version)
+        return self.embedder.embed_queries(queries)
+
+    def search(self, query: str, n_results: int = 5,
+               where_filter: Optional[Dict] = None) -> List[Dict]:
+        """搜索相关文档（需要提供 embedder）"""
+        return self.search_many([query], n_results, where_filter)[0]
+
+    def search_many(self, queries: List[str], n_results: int = 5,
+                    where_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量搜索：所有问题一次编码、一次矩阵乘法"""
+        if not queries:
+            return []
+        return self.search_many_by_embedding(
+            self._embed_queries(list(queries)), n_results, where_filter,
+            getattr(self.embedder, 'embedding_model_name', None)
+        )
+
+
+class SimpleVectorStore(NumpyVectorStore):
+    """旧的内存向量存储名称（原为关键词匹配实现），保留原有用法以兼容
+
+    无参构造即可使用（不落盘的内存集合）；add_documents 整体替换已有内容；
+    配置了 embedder 时 search 走精确向量检索，否则与原实现一样按关键词匹配打分。
+    不依赖 chromadb。
+    """
+
+    def __init__(self, persist_directory: Optional[str] = None, embedder=None, query_cache=None):
+        super().__init__(persist_directory=persist_directory, embedder=embedder, query_cache=query_cache)
+        self.create_collection("simple")
+
+    def add_documents(self, chunks, embeddings, batch_size: Optional[int] = None) -> List[str]:
+        """添加文档到内存存储（替换已有内容）"""
+        self._reset()
+        return super().add_documents(chunks, embeddings, batch_size)
+
+    def search(self, query: str, n_results: int = 5,
+               where_filter: Optional[Dict] = None) -> List[Dict]:
+        if self.embedder is not None:
+            return super().search(query, n_results, where_filter)
+        words = query.lower().split()
+        if not words:
+            return []
+        mask = self._filter_mask(where_filter)
+        results = []
+        for row, doc in enumerate(self.documents):
+            if mask is not None and not mask[row]:
+                continue
+            text = doc.lower()
+            score = sum(word in text for word in words)
+            if score > 0:
+                results.append(self._format(row, min(score / len(words), 1.0)))
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:n_results]
@@ -0,0 +1,208 @@
+# app/services/query_cache.py
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TTLLRUCache:
+    """带TTL的有界LRU缓存（线程安全），记录命中率和节省的耗时"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # key -> (写入时间, 计算耗时, 值)
+        self._data: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                created_at, cost, value = entry
+                if self.ttl_seconds and time.monotonic() - created_at > self.ttl_seconds:
+                    del self._data[key]
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += cost
+                    return True, value
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any, cost_seconds: float = 0.0):
+        with self._lock:
+            self._data[key] = (time.monotonic(), cost_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       should_cache: Callable[[Any], bool] = None) -> Any:
+        found, value = self.get(key)
+        if found:
+            return value
+        start = time.perf_counter()
+        value = compute()
+        if should_cache is None or should_cache(value):
+            self.set(key, value, time.perf_counter() - start)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'saved_ms': round(self.saved_seconds * 1000, 2)
+        }
+
+
+class QueryCache:
+    """查询缓存：问题文本 -> 查询向量，(向量, 过滤条件, 结果数, 索引版本) -> 检索结果
+
+    索引版本变化（集合被重建或写入）时两级缓存都会自动清空。
+    """
+
+    def __init__(self, max_embeddings: int = 1024, max_results: int = 512,
+                 ttl_seconds: float = 3600):
+        self.embedding_cache = TTLLRUCache(max_embeddings, ttl_seconds)
+        self.result_cache = TTLLRUCache(max_results, ttl_seconds)
+        self._index_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """规范化问题文本：全角转半角、合并空白
+
+        不转小写：嵌入模型（哈希嵌入）与符号快速路径都区分大小写，
+        PlayerController 与 playercontroller 不能共用一个查询向量。
+        """
+        text = unicodedata.normalize('NFKC', question)
+        return ' '.join(text.split())
+
+    @staticmethod
+    def embedding_key(embedding: np.ndarray) -> str:
+        vector = np.ascontiguousarray(embedding, dtype=np.float32)
+        return hashlib.blake2b(vector.tobytes(), digest_size=16).hexdigest()
+
+    def sync(self, index_version: int):
+        """索引版本变化时清空缓存"""
+        with self._lock:
+            if index_version != self._index_version:
+                if self._index_version is not None:
+                    logger.info(f"♻️ 索引版本变化 {self._index_version} -> {index_version}，清空查询缓存")
+                self.invalidate()
+                self._index_version = index_version
+
+    def invalidate(self):
+        self.embedding_cache.clear()
+        self.result_cache.clear()
+
+    def get_embedding(self, question: str, compute: Callable[[str], np.ndarray],
+                      index_version: int) -> np.ndarray:
+        self.sync(index_version)
+        key = self.normalize_question(question)
+        return self.embedding_cache.get_or_compute(key, lambda: compute(question))
+
+    def get_embeddings(self, questions: List[str], compute_many: Callable[[List[str]], np.ndarray],
+                       index_version: int) -> np.ndarray:
+        """批量版 get_embedding：未命中（去重后）的问题合并为一次 compute_many 调用"""
+        self.sync(index_version)
+        keys = [self.normalize_question(question) for question in questions]
+        vectors: Dict[str, np.ndarray] = {}
+        pending: Dict[str, str] = {}
+        for key, question in zip(keys, questions):
+            if key in vectors or key in pending:
+                continue
+            found, vector = self.embedding_cache.get(key)
+            if found:
+                vectors[key] = vector
+            else:
+                pending[key] = question
+
+        if pending:
+            start = time.perf_counter()
+            computed = compute_many(list(pending.values()))
+            cost = (time.perf_counter() - start) / len(pending)
+            for key, vector in zip(pending, computed):
+                self.embedding_cache.set(key, vector, cost)
+                vectors[key] = vector
+        return np.stack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+    def _result_key(self, embedding: np.ndarray, where_filter: Optional[Dict],
+                    n_results: int, index_version: int, strategy: str = 'hybrid',
+                    question: Optional[str] = None) -> Tuple:
+        """混合检索的BM25 / 符号排序还取决于问题文本，向量相同的不同问题不能共用结果"""
+        return (
+            self.embedding_key(embedding),
+            json.dumps(where_filter, sort_keys=True, ensure_ascii=False),
+            n_results,
+            index_version,
+            strategy,
+            self.normalize_question(question) if strategy == 'hybrid' and question is not None else None
+        )
+
+    def get_results_many(self, embeddings: np.ndarray, where_filter: Optional[Dict], n_results: int,
+                         index_version: int,
+                         compute_many: Callable[[List[int]], List[List[Dict]]],
+                         strategy: str = 'hybrid',
+                         questions: Optional[List[str]] = None) -> List[List[Dict]]:
+        """检索结果缓存：相同查询向量只检索一次，compute_many 接收未命中查询的下标
+
+        strategy（hybrid / vector）区分同一查询在不同检索策略下的结果；
+        hybrid 策略下传入 questions，问题文本也是缓存键的一部分。
+        """
+        self.sync(index_version)
+        questions = questions if questions is not None else [None] * len(embeddings)
+        keys = [self._result_key(embedding, where_filter, n_results, index_version, strategy, question)
+                for embedding, question in zip(embeddings, questions)]
+        results: Dict[Tuple, List[Dict]] = {}
+        pending: Dict[Tuple, int] = {}
+        for i, key in enumerate(keys):
+            if key in results or key in pending:
+                continue
+            found, value = self.result_cache.get(key)
+            if found:
+                results[key] = value
+            else:
+                pending[key] = i
+
+        if pending:
+            start = time.perf_counter()
+            computed = compute_many(list(pending.values()))
+            cost = (time.perf_counter() - start) / len(pending)
+            for key, value in zip(pending, computed):
+                # 空结果通常意味着检索失败，不缓存
+                if value:
+                    self.result_cache.set(key, value, cost)
+                results[key] = value
+        return [[dict(result) for result in results[key]] for key in keys]
+
+    def stats(self) -> Dict:
+        return {
+            'index_version': self._index_version,
+            'embedding': self.embedding_cache.stats(),
+            'results': self.result_cache.stats()
+        }
@@ -0,0 +1,246 @@
+# app/services/query_router.py
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 检索范围 -> 文件类型过滤（all 表示不过滤）
+SCOPES: Dict[str, Optional[List[str]]] = {
+    'all': None,
+    'code': ['code'],
+    'scene_prefab': ['scene', 'prefab'],
+    'shader': ['shader', 'shader_include', 'shader_code', 'material'],
+    'project': ['config', 'packages', 'project_setting'],
+}
+
+# 关键词规则：命中即倾向该范围（中英文、文件扩展名）
+SCOPE_RULES = {
+    'code': re.compile(
+        r'\.cs\b|脚本|代码|函数|方法|变量|字段|算法|协程|\bscript|\bmethod|\bfunction|\bclass\b|\bcode\b|coroutine',
+        re.IGNORECASE
+    ),
+    'scene_prefab': re.compile(
+        r'\.unity\b|\.prefab\b|场景|预制|层级|挂了|挂载|检视面板|\bscene|\bprefab|hierarchy|inspector',
+        re.IGNORECASE
+    ),
+    'shader': re.compile(
+        r'\.shader\b|\.hlsl\b|\.cginc\b|着色器|材质|渲染队列|\bshader|\bhlsl\b|\bmaterial|render ?queue',
+        re.IGNORECASE
+    ),
+    'project': re.compile(
+        r'manifest|依赖包|unity ?包|编辑器版本|unity ?版本|项目设置|projectsettings|player ?settings|\bpackages?\b',
+        re.IGNORECASE
+    ),
+}
+
+# 线性模型的训练样例：每个范围十来个中英文问题，首次路由时用当前嵌入模型编码后训练
+ROUTER_EXAMPLES = {
+    'code': [
+        "玩家点击屏幕后执行了哪些逻辑？", "这个类的Update里做了什么？", "分数是在哪里计算的？",
+        "碰撞检测是怎么实现的？", "哪个脚本负责生成敌人？", "如何优化这段代码的性能？",
+        "单例是怎么实现的？", "输入事件是怎么处理的？", "关卡切换的逻辑在哪里？",
+        "How is the player movement implemented?", "Where is the score updated?",
+        "Which script handles touch input?", "How does the game decide when the level is over?",
+        "How are enemies spawned from the object pool?",
+    ],
+    'scene_prefab': [
+        "主场景里有哪些游戏对象？", "这个预制体上挂了哪些组件？", "菜单场景的UI是怎么布置的？",
+        "相机在场景中的位置是多少？", "按钮对象挂的是哪个脚本？", "预制体的碰撞体设置是什么？",
+        "Which objects are in the main scene?", "What components are attached to the prefab?",
+        "How is the canvas laid out in the menu scene?", "Which prefab is used for the bullet?",
+        "Where is the camera placed in the level scene?", "Which prefab sets up the enemy rig?",
+    ],
+    'shader': [
+        "这个着色器是怎么实现描边的？", "材质用的是哪个shader？", "透明效果的渲染队列是怎么设置的？",
+        "顶点着色器里做了什么变换？", "片元着色器如何计算光照？", "溶解效果的shader参数有哪些？",
+        "How does the outline shader work?", "Which shader does this material use?",
+        "How is transparency handled in the shader?", "What does the vertex function of the shader do?",
+        "Which render queue does the water shader use?", "How is lighting computed in the fragment shader?",
+    ],
+    'project': [
+        "项目依赖了哪些Unity包？", "项目使用的Unity编辑器版本是多少？", "项目设置里的分辨率是多少？",
+        "packages 清单里有哪些依赖？", "构建目标平台是什么？", "项目开启了哪些Player设置？",
+        "Which Unity packages does the project depend on?", "What Unity editor version is the project on?",
+        "Which render pipeline package is installed?", "What are the player settings for the build?",
+        "Which version of the input system package is used?", "What does the package manifest contain?",
+    ],
+}
+MODEL_SCOPES = tuple(ROUTER_EXAMPLES)
+
+# 问题中像代码的片段：驼峰 / 下划线 / 点号调用 / 方法调用 / 文件名；有这类片段时关键词检索（BM25）有帮助
+_CODE_TOKEN_RE = re.compile(
+    r'[a-z]+[A-Z][A-Za-z0-9]*|[A-Z][a-z0-9]+[A-Z][A-Za-z0-9]*|\w+_\w+|\w+\.\w+|\w+\(\)'
+)
+_ASCII_WORD_RE = re.compile(r'[A-Za-z]{3,}')
+
+
+class QueryRouter:
+    """查询路由：为没有指定文件类型的问题选择检索范围（文件类型过滤）和检索策略
+
+    范围：
+      1. 规则：问题中出现关键词 / 扩展名（场景、预制体、shader、manifest ……）或点名的C#符号；
+         点名符号时只会选 code 或不过滤，不会被其他范围的关键词过滤掉；
+      2. 规则没有命中或命中多个范围时，用查询向量上的线性模型（多项逻辑回归）判断，
+         模型在首次使用时由内置样例训练，训练样例用当前嵌入模型编码，模型与嵌入模型一致；
+      3. 置信度低于 min_confidence 时不过滤（all），宁可不缩小范围也不误删正确答案。
+    策略：
+      symbol : 问题点名已知符号，走符号表
+      hybrid : 向量 + BM25
+      vector : 纯自然语言（没有代码片段和英文词）的问题只走向量检索；需开启 RAG_ROUTER_VECTOR_STRATEGY，
+               hashing 嵌入下 BM25 的中文二元词对这类问题仍有帮助，默认不启用
+    路由决策写入日志，并统计各范围 / 策略 / 来源的次数与耗时。
+    """
+
+    def __init__(self, embed: Callable[[List[str]], np.ndarray],
+                 min_confidence: Optional[float] = None):
+        self.embed = embed
+        self.min_confidence = settings.RAG_ROUTER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self._lock = threading.Lock()
+        self._weights: Optional[np.ndarray] = None
+        self._bias: Optional[np.ndarray] = None
+        self.routed = 0
+        self.fallbacks = 0
+        self.total_seconds = 0.0
+        self.counts: Dict[str, int] = {}
+
+    @staticmethod
+    def where_filter(scope: str) -> Optional[Dict]:
+        file_types = SCOPES.get(scope)
+        return {"file_type": {"$in": file_types}} if file_types else None
+
+    # ------------------------------------------------------------------
+    # 线性模型
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def _ensure_model(self):
+        """首次使用时训练（L2 正则的多项逻辑回归，全批量梯度下降，几十个样例只需几毫秒）"""
+        if self._weights is not None:
+            return
+        with self._lock:
+            if self._weights is not None:
+                return
+            texts = [text for scope in MODEL_SCOPES for text in ROUTER_EXAMPLES[scope]]
+            labels = np.array([i for i, scope in enumerate(MODEL_SCOPES) for _ in ROUTER_EXAMPLES[scope]])
+            x = self._normalize(self.embed(texts))
+            y = np.eye(len(MODEL_SCOPES), dtype=np.float32)[labels]
+            weights = np.zeros((x.shape[1], len(MODEL_SCOPES)), dtype=np.float32)
+            bias = np.zeros(len(MODEL_SCOPES), dtype=np.float32)
+            for _ in range(300):
+                probs = self._softmax(x @ weights + bias)
+                grad = (probs - y) / len(x)
+                weights -= 2.0 * (x.T @ grad + 1e-3 * weights)
+                bias -= 2.0 * grad.sum(axis=0)
+            self._bias = bias
+            self._weights = weights
+            logger.info(f"🧭 查询路由模型训练完成: {len(texts)} 个样例, {len(MODEL_SCOPES)} 个范围")
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, embeddings: np.ndarray) -> np.ndarray:
+        """每个查询在 MODEL_SCOPES 上的概率"""
+        self._ensure_model()
+        return self._softmax(self._normalize(embeddings) @ self._weights + self._bias)
+
+    # ------------------------------------------------------------------
+    # 路由
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _strategy(question: str, symbols: Sequence[str]) -> str:
+        if symbols:
+            return 'symbol'
+        if not settings.RAG_ROUTER_VECTOR_STRATEGY or _CODE_TOKEN_RE.search(question) \
+                or _ASCII_WORD_RE.search(question):
+            return 'hybrid'
+        return 'vector'
+
+    def route_many(self, questions: List[str], embed_queries: Callable[[List[str]], np.ndarray],
+                   symbol_index=None) -> List[Dict]:
+        """返回每个问题的 {'scope', 'file_types', 'strategy', 'source', 'confidence', 'symbols'}
+
+        embed_queries 用于规则无法确定范围的问题（调用方传入带缓存的查询向量计算，检索阶段复用）。
+        """
+        start = time.perf_counter()
+        decisions = []
+        undecided = []
+        for i, question in enumerate(questions):
+            symbols = sorted(symbol_index.find_in_text(question, named_only=True)) \
+                if symbol_index is not None and len(symbol_index) else []
+            hits = [scope for scope, rule in SCOPE_RULES.items() if rule.search(question)]
+            if symbols:
+                # 点名的符号定义在代码里：其他范围的关键词同时出现时（"MainMenuScript 怎么切换场景"）不过滤，
+                # 否则过滤会把点名的类本身排除掉
+                hits = ['code'] if set(hits) <= {'code'} else []
+            decision = {
+                'scope': hits[0] if len(hits) == 1 else 'all',
+                'strategy': self._strategy(question, symbols),
+                'source': 'rule' if len(hits) == 1 or symbols else 'default',
+                'confidence': 1.0 if len(hits) == 1 or symbols else 0.0,
+                'symbols': symbols[:5],
+                'candidates': hits
+            }
+            if len(hits) != 1 and not symbols:
+                undecided.append(i)
+            decisions.append(decision)
+
+        if undecided:
+            probs = self.predict(embed_queries([questions[i] for i in undecided]))
+            for i, row in zip(undecided, probs):
+                decision = decisions[i]
+                # 命中多个范围的规则时只在这些范围之间选择
+                allowed = [MODEL_SCOPES.index(scope) for scope in decision['candidates']] or range(len(MODEL_SCOPES))
+                allowed = list(allowed)
+                scores = row[allowed] / row[allowed].sum()
+                best = int(np.argmax(scores))
+                confidence = float(scores[best])
+                if confidence >= self.min_confidence:
+                    decision.update(scope=MODEL_SCOPES[allowed[best]], source='model')
+                decision['confidence'] = round(confidence, 3)
+
+        for question, decision in zip(questions, decisions):
+            del decision['candidates']
+            decision['file_types'] = SCOPES[decision['scope']]
+            logger.info(f"🧭 查询路由: {question[:40]!r} -> {decision['scope']} / {decision['strategy']} "
+                        f"({decision['source']}, {decision['confidence']:.2f})")
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.routed += len(questions)
+            self.total_seconds += elapsed
+            for decision in decisions:
+                for key in (f"scope:{decision['scope']}", f"strategy:{decision['strategy']}",
+                            f"source:{decision['source']}"):
+                    self.counts[key] = self.counts.get(key, 0) + 1
+        return decisions
+
+    def record_fallback(self, n: int):
+        """过滤后结果太少、改为不过滤重新检索的次数"""
+        with self._lock:
+            self.fallbacks += n
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'routed': self.routed,
+                'fallbacks': self.fallbacks,
+                'avg_ms': round(self.total_seconds * 1000 / self.routed, 3) if self.routed else 0.0,
+                'min_confidence': self.min_confidence,
+                'model_ready': self._weights is not None,
+                **dict(sorted(self.counts.items()))
+            }
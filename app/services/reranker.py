@@ -0,0 +1,122 @@
+# app/services/reranker.py
+import hashlib
+import time
+from typing import List, Dict, Optional
+import logging
+
+from app.core.config import settings
+from .query_cache import QueryCache, TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """可选的交叉编码器重排阶段
+
+    第一阶段检索多取 K 个候选，用小型 CPU 交叉编码器对 (问题, 文本块) 重新打分，
+    只把前 N 个送进提示词。分数按 (问题哈希, 块ID) 缓存；超出延迟预算时
+    剩余候选不再打分，保持第一阶段顺序排在已打分候选之后。
+    """
+
+    def __init__(self, model_name: Optional[str] = None,
+                 budget_ms: Optional[float] = None,
+                 cache_size: Optional[int] = None,
+                 batch_size: int = 16):
+        self.model_name = model_name or settings.RAG_RERANK_MODEL
+        self.budget_ms = settings.RAG_RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        self.batch_size = batch_size
+        self.max_chars = settings.RAG_RERANK_MAX_CHARS
+        self.score_cache = TTLLRUCache(
+            max_size=cache_size or settings.RAG_RERANK_CACHE_SIZE,
+            ttl_seconds=settings.RAG_QUERY_CACHE_TTL
+        )
+        self.model = None
+        self._load_failed = False
+        self.calls = 0
+        self.scored_pairs = 0
+        self.budget_exceeded = 0
+        self.total_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self._load_model() is not None
+
+    def _load_model(self):
+        """懒加载交叉编码器（sentence-transformers 为可选依赖）"""
+        if self.model is None and not self._load_failed:
+            try:
+                from sentence_transformers import CrossEncoder
+                self.model = CrossEncoder(self.model_name, device='cpu')
+                logger.info(f"✅ 重排模型初始化成功: {self.model_name}")
+            except Exception as e:
+                self._load_failed = True
+                logger.error(f"❌ 重排模型初始化失败: {e}，跳过重排")
+        return self.model
+
+    @staticmethod
+    def _query_key(query: str) -> str:
+        normalized = QueryCache.normalize_question(query)
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+    def rerank(self, query: str, docs: List[Dict], top_n: int) -> List[Dict]:
+        """对候选重新打分并返回前 top_n 个（模型不可用时按原顺序截断）"""
+        if not docs:
+            return []
+        model = self._load_model()
+        if model is None:
+            return docs[:top_n]
+
+        start = time.perf_counter()
+        query_key = self._query_key(query)
+        scores: Dict[int, float] = {}
+        pending = []
+        for i, doc in enumerate(docs):
+            found, score = self.score_cache.get((query_key, doc['id']))
+            if found:
+                scores[i] = score
+            else:
+                pending.append(i)
+
+        # 按第一阶段排名分批打分，超出预算后停止
+        for offset in range(0, len(pending), self.batch_size):
+            if self.budget_ms and (time.perf_counter() - start) * 1000 > self.budget_ms:
+                self.budget_exceeded += 1
+                logger.warning(f"⚠️ 重排超出延迟预算 {self.budget_ms}ms，剩余 {len(pending) - offset} 个候选未打分")
+                break
+            batch = pending[offset:offset + self.batch_size]
+            batch_start = time.perf_counter()
+            batch_scores = model.predict(
+                [(query, docs[i]['content'][:self.max_chars]) for i in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            cost = (time.perf_counter() - batch_start) / len(batch)
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.score_cache.set((query_key, docs[i]['id']), float(score), cost)
+            self.scored_pairs += len(batch)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        ranked += [i for i in range(len(docs)) if i not in scores]
+        results = []
+        for i in ranked[:top_n]:
+            doc = dict(docs[i])
+            if i in scores:
+                doc['rerank_score'] = scores[i]
+            results.append(doc)
+
+        self.calls += 1
+        self.total_seconds += time.perf_counter() - start
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'available': self.model is not None,
+            'calls': self.calls,
+            'scored_pairs': self.scored_pairs,
+            'budget_ms': self.budget_ms,
+            'budget_exceeded': self.budget_exceeded,
+            'avg_ms': round(self.total_seconds * 1000 / self.calls, 2) if self.calls else 0.0,
+            'score_cache': self.score_cache.stats()
+        }
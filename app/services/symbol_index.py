@@ -0,0 +1,210 @@
+# app/services/symbol_index.py
+import bisect
+import difflib
+import json
+import os
+import re
+from typing import List, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 问题中可能是符号名的片段
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')
+# 明显是标识符的写法：驼峰（内部有大写）、带下划线、类型.成员
+_IDENTIFIER_SHAPE_RE = re.compile(r'^[A-Za-z0-9]*[a-z0-9][A-Z]|_')
+_QUALIFIED_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\.([A-Za-z_][A-Za-z0-9_]*)')
+TYPE_KINDS = ('class', 'struct', 'interface', 'enum')
+# 首字母大写即可视为点名的符号种类（字段、属性常与普通英文单词同名，如 time / type / color）
+NAMED_KINDS = TYPE_KINDS + ('method', 'unity_message')
+
+
+class SymbolIndex:
+    """C# 符号表：类型 / 方法 / 字段 / Unity消息 -> 块ID与行区间
+
+    在索引阶段由加载器的C#分析结果构建。精确查找是一次字典访问，
+    前缀查找基于排序列表二分，模糊查找使用 difflib。
+    """
+
+    def __init__(self, persist_path: Optional[str] = None):
+        self.persist_path = persist_path
+        self.entries: List[Dict] = []
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_exact_name: Dict[str, List[int]] = {}
+        self._sorted_names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ------------------------------------------------------------------
+    # 构建
+    # ------------------------------------------------------------------
+    def build(self, documents: List[Dict], chunks: List[Dict]):
+        """由文档的符号表与文本块区间构建索引"""
+        spans_by_file: Dict[str, List[Dict]] = {}
+        for chunk in chunks:
+            metadata = chunk.get('metadata', {})
+            if 'chunk_start' not in metadata or not chunk.get('id'):
+                continue
+            spans_by_file.setdefault(metadata.get('file_path'), []).append({
+                'id': chunk['id'],
+                'start': metadata['chunk_start'],
+                'end': metadata['chunk_end']
+            })
+
+        entries = []
+        for doc in documents:
+            symbols = doc.get('symbols')
+            if not symbols:
+                continue
+            metadata = doc['metadata']
+            file_path = metadata['file_path']
+            content = doc['content']
+
+            # 行号 -> 字符偏移
+            line_offsets = [0]
+            for line in content.split('\n'):
+                line_offsets.append(line_offsets[-1] + len(line) + 1)
+
+            spans = spans_by_file.get(file_path, [])
+            type_stack = []  # (类型名, 嵌套深度)
+            for symbol in symbols:
+                depth = symbol.get('depth', 0)
+                while type_stack and type_stack[-1][1] >= depth:
+                    type_stack.pop()
+                enclosing_type = type_stack[-1][0] if type_stack else None
+                if symbol['kind'] in TYPE_KINDS:
+                    type_stack.append((symbol['name'], depth))
+                offset = line_offsets[symbol['line'] - 1]
+                chunk_refs = []
+                for span in spans:
+                    if span['start'] <= offset < span['end']:
+                        chunk_refs.append({
+                            'chunk_id': span['id'],
+                            'start_line': content.count('\n', 0, span['start']) + 1,
+                            'end_line': content.count('\n', 0, span['end']) + 1
+                        })
+                entries.append({
+                    'name': symbol['name'],
+                    'kind': symbol['kind'],
+                    'file_path': file_path,
+                    'class_name': enclosing_type,
+                    'line': symbol['line'],
+                    'chunks': chunk_refs
+                })
+
+        self._set_entries(entries)
+        logger.info(f"✅ 符号索引构建完成: {len(entries)} 个符号")
+
+    def load_entries(self, entries: List[Dict]):
+        """从已有的符号条目（如索引快照中保存的）恢复索引"""
+        self._set_entries(entries)
+
+    def _set_entries(self, entries: List[Dict]):
+        self.entries = entries
+        self._by_name = {}
+        self._by_exact_name = {}
+        for i, entry in enumerate(entries):
+            self._by_name.setdefault(entry['name'].lower(), []).append(i)
+            self._by_exact_name.setdefault(entry['name'], []).append(i)
+        self._sorted_names = sorted(self._by_name)
+
+    # ------------------------------------------------------------------
+    # 查找
+    # ------------------------------------------------------------------
+    def lookup(self, name: str, kind: Optional[str] = None) -> List[Dict]:
+        """精确查找（不区分大小写）"""
+        hits = [self.entries[i] for i in self._by_name.get(name.lower(), [])]
+        if kind:
+            hits = [entry for entry in hits if entry['kind'] == kind]
+        return hits
+
+    def prefix(self, prefix: str, limit: int = 20) -> List[Dict]:
+        """前缀查找"""
+        prefix = prefix.lower()
+        hits = []
+        position = bisect.bisect_left(self._sorted_names, prefix)
+        while position < len(self._sorted_names) and self._sorted_names[position].startswith(prefix):
+            hits.extend(self.entries[i] for i in self._by_name[self._sorted_names[position]])
+            if len(hits) >= limit:
+                break
+            position += 1
+        return hits[:limit]
+
+    def fuzzy(self, name: str, limit: int = 20, cutoff: float = 0.75) -> List[Dict]:
+        """模糊查找（拼写相近的符号名）"""
+        matches = difflib.get_close_matches(name.lower(), self._sorted_names, n=limit, cutoff=cutoff)
+        hits = []
+        for match in matches:
+            hits.extend(self.entries[i] for i in self._by_name[match])
+        return hits[:limit]
+
+    def search(self, name: str, mode: str = 'exact', limit: int = 20) -> List[Dict]:
+        """统一查找入口：mode = exact / prefix / fuzzy"""
+        if mode == 'prefix':
+            return self.prefix(name, limit)
+        if mode == 'fuzzy':
+            return self.fuzzy(name, limit)
+        return self.lookup(name)[:limit]
+
+    def find_in_text(self, text: str, named_only: bool = False) -> Dict[str, List[Dict]]:
+        """找出文本中出现的符号名（区分大小写）
+
+        小写的字段 / 局部变量名常与普通英文单词相同（time、type、color ……），
+        named_only 时只保留确实在点名符号的命中：标识符形状的片段（驼峰、下划线、类型.成员），
+        或首字母大写的类型 / 方法名。
+        """
+        found = {}
+        for token in set(_IDENTIFIER_RE.findall(text)):
+            indexes = self._by_exact_name.get(token)
+            if indexes:
+                found[token] = [self.entries[i] for i in indexes]
+        if named_only and found:
+            qualified = {name for pair in _QUALIFIED_RE.findall(text) for name in pair}
+            found = {
+                token: entries for token, entries in found.items()
+                if token in qualified or _IDENTIFIER_SHAPE_RE.search(token)
+                or (token[0].isupper() and any(entry['kind'] in NAMED_KINDS for entry in entries))
+            }
+        return found
+
+    def rank_chunks(self, text: str, named_only: bool = False) -> List[str]:
+        """按命中的不同符号数对块排序
+
+        类型定义命中额外加权；成员所属的类型也在问题中出现时（如 "BubbleManager 的 Update"）再加权。
+        named_only 的含义同 find_in_text。
+        """
+        found = self.find_in_text(text, named_only)
+        scores: Dict[str, float] = {}
+        for name, entries in found.items():
+            counted = set()
+            for entry in entries:
+                weight = 1.5 if entry['kind'] in TYPE_KINDS else 1.0
+                if entry['class_name'] in found and entry['class_name'] != name:
+                    weight += 1.0
+                for ref in entry['chunks']:
+                    if ref['chunk_id'] in counted:
+                        continue
+                    counted.add(ref['chunk_id'])
+                    scores[ref['chunk_id']] = scores.get(ref['chunk_id'], 0.0) + weight
+        return sorted(scores, key=scores.get, reverse=True)
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def save(self):
+        if not self.persist_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.persist_path)), exist_ok=True)
+        tmp_path = self.persist_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.persist_path)
+
+    def load(self) -> bool:
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return False
+        with open(self.persist_path, 'r', encoding='utf-8') as f:
+            self._set_entries(json.load(f))
+        logger.info(f"✅ 加载符号索引: {self.persist_path} ({len(self.entries)} 个符号)")
+        return True
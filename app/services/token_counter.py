@@ -0,0 +1,32 @@
+# app/services/token_counter.py
+import math
+import re
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符大致一个字一个token
+_CJK_RE = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯＀-￯]')
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """tiktoken 为可选依赖，未安装时使用字符数估算"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.info("ℹ️ 未安装 tiktoken，token 数按字符估算")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数（用于提示词预算与节省统计）"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
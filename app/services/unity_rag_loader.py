@@ -5,6 +5,38 @@ import yaml
 from pathlib import Path
 from typing import List, Dict, Any, Set
 import hashlib
+import re
+
+# C# 符号识别
+_CSHARP_MODIFIERS = r'(?:(?:public|private|protected|internal|static|abstract|sealed|partial|virtual|override|readonly|const|async|extern|unsafe|new)\s+)'
+CSHARP_TYPE_RE = re.compile(
+    r'^\s*(?:\[[^\]]*\]\s*)*' + _CSHARP_MODIFIERS + r'*(class|struct|interface|enum)\s+([A-Za-z_]\w*)'
+)
+CSHARP_METHOD_RE = re.compile(
+    r'^\s*(?:\[[^\]]*\]\s*)*' + _CSHARP_MODIFIERS + r'*([\w<>\[\],\.]+)\s+([A-Za-z_]\w*)\s*(?:<[^>]*>)?\s*\('
+)
+CSHARP_FIELD_RE = re.compile(
+    r'^\s*(?:(?:\[[^\]]*\]\s*)+' + _CSHARP_MODIFIERS + r'*|' + _CSHARP_MODIFIERS + r'+)'
+    r'([\w<>\[\],\.]+)\s+([A-Za-z_]\w*)\s*(=|;|\{)'
+)
+CSHARP_KEYWORDS = {
+    'if', 'else', 'for', 'foreach', 'while', 'switch', 'case', 'return', 'new', 'using',
+    'catch', 'lock', 'yield', 'throw', 'await', 'class', 'struct', 'interface', 'enum',
+    'get', 'set', 'var', 'do', 'try', 'finally', 'namespace', 'delegate', 'event'
+}
+# 常用的 Unity 消息方法
+UNITY_MESSAGES = {
+    'Awake', 'Start', 'Update', 'FixedUpdate', 'LateUpdate', 'OnEnable', 'OnDisable',
+    'OnDestroy', 'OnGUI', 'OnValidate', 'Reset', 'OnApplicationPause', 'OnApplicationQuit',
+    'OnApplicationFocus', 'OnBecameVisible', 'OnBecameInvisible',
+    'OnCollisionEnter', 'OnCollisionStay', 'OnCollisionExit',
+    'OnCollisionEnter2D', 'OnCollisionStay2D', 'OnCollisionExit2D',
+    'OnTriggerEnter', 'OnTriggerStay', 'OnTriggerExit',
+    'OnTriggerEnter2D', 'OnTriggerStay2D', 'OnTriggerExit2D',
+    'OnMouseDown', 'OnMouseUp', 'OnMouseDrag', 'OnMouseEnter', 'OnMouseExit', 'OnMouseOver',
+    'OnDrawGizmos', 'OnDrawGizmosSelected', 'OnRenderObject', 'OnPreRender', 'OnPostRender',
+    'OnRenderImage', 'OnAnimatorMove', 'OnAnimatorIK', 'OnParticleCollision'
+}
 
 class UnityRAGLoader:
     def __init__(self, unity_project_path: str):
@@ -269,6 +301,31 @@ class UnityRAGLoader:
         
         return False
 
+    def project_fingerprint(self) -> Dict[str, Any]:
+        """项目指纹：所有会被加载的文件的 相对路径 + 大小 + 修改时间 的哈希
+        
+        只做stat不读内容，几千个文件也只需几十毫秒；跳过排除目录，
+        只统计Unity相关扩展名、.meta 和 ProjectSettings 下的文件。
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        file_count = 0
+        for root, dirs, files in os.walk(self.project_path):
+            dirs[:] = sorted(d for d in dirs if d not in self.exclude_dirs)
+            in_settings = Path(root).name == 'ProjectSettings'
+            for name in sorted(files):
+                suffix = os.path.splitext(name)[1].lower()
+                if not (in_settings or suffix == '.meta' or suffix in self.unity_extensions):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                relative = os.path.relpath(path, self.project_path).replace(os.sep, '/')
+                digest.update(f"{relative}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+                file_count += 1
+        return {'fingerprint': digest.hexdigest(), 'file_count': file_count}
+
     # 其他方法保持不变...
     def _preload_meta_files(self):
         """预加载.meta文件到缓存"""
@@ -352,6 +409,8 @@ class UnityRAGLoader:
                             'complexity': analysis.get('complexity', 'unknown')
                         }
                     )
+                    # 符号表不放入metadata（避免复制到每个文本块），供符号索引使用
+                    doc['symbols'] = analysis.get('symbols', [])
                     documents.append(doc)
                     
             except Exception as e:
@@ -399,9 +458,38 @@ class UnityRAGLoader:
             'methods': methods,
             'dependencies': dependencies,
             'usings': usings,
+            'symbols': self._extract_csharp_symbols(lines),
             'complexity': self._assess_complexity(len(methods), len(classes))
         }
     
+    def _extract_csharp_symbols(self, lines: List[str]) -> List[Dict]:
+        """提取C#符号（类型、方法、字段、属性、Unity消息）及其行号"""
+        symbols = []
+        depth = 0  # 行首的花括号嵌套深度，用于判断成员所属类型
+        for line_number, line in enumerate(lines, 1):
+            line_depth = depth
+            depth += line.count('{') - line.count('}')
+            
+            match = CSHARP_TYPE_RE.match(line)
+            if match:
+                symbols.append({'name': match.group(2), 'kind': match.group(1),
+                                'line': line_number, 'depth': line_depth})
+                continue
+            
+            match = CSHARP_METHOD_RE.match(line)
+            if match and match.group(1) not in CSHARP_KEYWORDS and match.group(2) not in CSHARP_KEYWORDS:
+                name = match.group(2)
+                kind = 'unity_message' if name in UNITY_MESSAGES else 'method'
+                symbols.append({'name': name, 'kind': kind, 'line': line_number, 'depth': line_depth})
+                continue
+            
+            match = CSHARP_FIELD_RE.match(line)
+            if match and match.group(1) not in CSHARP_KEYWORDS:
+                kind = 'property' if match.group(3) == '{' else 'field'
+                symbols.append({'name': match.group(2), 'kind': kind,
+                                'line': line_number, 'depth': line_depth})
+        return symbols
+    
     def _assess_complexity(self, method_count: int, class_count: int) -> str:
         """评估代码复杂度"""
         if method_count > 20 or class_count > 3:
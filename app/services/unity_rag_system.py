@@ -1,11 +1,27 @@
 # app/services/unity_rag_system.py
 
 
+from app.core.config import settings
 from app.services.unity_rag_loader import UnityRAGLoader
 from app.services.unity_text_processor import UnityTextProcessor
-from .vector_store import ChromaVectorStore
+from .vector_backend import create_vector_store
+from .query_cache import QueryCache
+from .bm25_index import BM25Index, reciprocal_rank_fusion
+from .symbol_index import SymbolIndex
+from .reranker import CrossEncoderReranker
+from .chunk_utils import metadata_matches
+from .index_snapshot import read_manifest
+from .async_executor import BoundedExecutor
+from .diversity import diversify
+from .llm_client import AsyncLLMClient, LLMError
+from .answer_cache import SemanticAnswerCache
+from .context_packer import ContextPacker
+from .query_router import QueryRouter
 import asyncio
+import json
+import time
 import traceback
+import weakref
 
 # 添加路径以确保可以找到模块
 import os
@@ -17,91 +33,398 @@ if current_dir not in sys.path:
 try:
     from .unity_rag_loader import UnityRAGLoader
     from .unity_text_processor import UnityTextProcessor
-    from .vector_store import ChromaVectorStore
 except ImportError as e:
     print(f"❌ 导入失败: {e}")
     # 备选方案：直接导入
     from unity_rag_loader import UnityRAGLoader
     from unity_text_processor import UnityTextProcessor
-    from vector_store import ChromaVectorStore
 
 import asyncio
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+LLM_FAILURE_PREFIX = "[LLM调用失败]"
 
 class UnityRAGSystem:
-    def __init__(self, unity_project_path: str):
+    # 提示词模板变化时递增，旧的缓存回答随之失效
+    PROMPT_VERSION = 2
+    # 索引在两个集合之间交替：后台重建写入当前未使用的集合，完成后整体切换
+    INDEX_COLLECTIONS = ("unity_project", "unity_project_b")
+    
+    def __init__(self, unity_project_path: str, persist_directory: Optional[str] = None):
         self.unity_project_path = unity_project_path
+        # 索引持久化目录；同一进程服务多个项目时每个项目各用一个目录
+        self.persist_directory = persist_directory or settings.RAG_PERSIST_DIRECTORY
         self.loader = UnityRAGLoader(unity_project_path)
         self.processor = UnityTextProcessor()
-        self.vector_store = ChromaVectorStore(persist_directory="./chroma_unity_db")
+        self.query_cache = QueryCache(
+            max_embeddings=settings.RAG_QUERY_CACHE_SIZE,
+            max_results=settings.RAG_RESULT_CACHE_SIZE,
+            ttl_seconds=settings.RAG_QUERY_CACHE_TTL
+        )
+        # 阻塞的检索 / 嵌入 / 索引调用都放到有界线程池执行，不占用事件循环
+        self.executor = BoundedExecutor(
+            max_workers=settings.RAG_EXECUTOR_WORKERS,
+            max_queue=settings.RAG_EXECUTOR_QUEUE,
+            name="unity-rag"
+        )
+        # 当前提供查询的索引：向量集合 + 与之并行维护的BM25倒排索引（精确标识符匹配）
+        # + C#符号表（问题中直接点名类/方法/字段时跳过向量检索）
+        self._swap_index(self._create_index_set(self.INDEX_COLLECTIONS[0]))
+        # 可选的交叉编码器重排：多取K个候选，只把前N个送入提示词
+        self.reranker = CrossEncoderReranker() if settings.RAG_RERANK_ENABLED else None
+        # 提示词上下文按 token 预算打包：合并重叠块、去重、压缩缩进
+        self.context_packer = ContextPacker(language_of=self._get_code_language)
+        # 查询路由：未指定文件类型的问题自动选择检索范围（代码 / 场景预制体 / shader ……）与检索策略
+        self.router = QueryRouter(self.processor.embed_queries) if settings.RAG_ROUTER_ENABLED else None
+        # 索引就绪标记：完整构建成功后写入，记录构建时的项目指纹、嵌入模型与分割器版本
+        self.index_state_path = os.path.join(
+            self.vector_store.persist_directory, "index_state_unity_project.json"
+        )
         self.is_initialized = False
+        self.index_generation = 0
+        # 单飞：并发的初始化 / 重建请求共享同一个任务（按事件循环区分）
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = \
+            weakref.WeakKeyDictionary()
         self.llm_api_key = os.getenv('OPENAI_API_KEY') or os.getenv('LLM_API_KEY')
+        # 长连接的异步大模型客户端：连接池复用、超时、并发上限、抖动退避重试
+        self.llm_client = AsyncLLMClient(api_key=self.llm_api_key)
+        # 语义回答缓存：换个说法的同一问题、检索到相同的块时不再调用大模型
+        self.answer_cache = None
+        if settings.RAG_ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                settings.RAG_ANSWER_CACHE_PATH or os.path.join(
+                    self.vector_store.persist_directory, "answer_cache.sqlite3"
+                ),
+                max_entries=settings.RAG_ANSWER_CACHE_SIZE,
+                ttl_seconds=settings.RAG_ANSWER_CACHE_TTL,
+                threshold=settings.RAG_ANSWER_CACHE_THRESHOLD,
+                namespace=f"{self.processor.embedding_model_name}|{self.llm_client.model}|prompt-v{self.PROMPT_VERSION}"
+            )
+    
+    @property
+    def _use_simulated_llm(self) -> bool:
+        """未配置API Key且指向官方接口时使用本地模拟回答"""
+        return not self.llm_api_key and "api.openai.com" in self.llm_client.base_url
     
     async def _call_llm(self, prompt: str) -> str:
         """
         调用语言模型 (LLM) 获取回答。
-        优先使用 OpenAI API，如果失败使用本地模拟回答。
+        通过 OpenAI 兼容接口异步调用（RAG_LLM_BASE_URL），未配置时使用本地模拟回答。
         """
-        try:
-
-            from openai import OpenAI
-            client = OpenAI(api_key=self.llm_api_key)
-
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
-            answer = response.choices[0].message.content
-            return answer
-
-        except ImportError:
+        if self._use_simulated_llm:
             return f"[模拟回答] 问题: {prompt[:100]}..."
+        try:
+            return await self.llm_client.complete(prompt, temperature=0)
+        except LLMError as e:
+            print(f"❌ 大模型调用失败: {e}")
+            return f"{LLM_FAILURE_PREFIX} {e}"
         except Exception as e:
             traceback.print_exc()
-            return f"[LLM调用失败] {e}"
+            return f"{LLM_FAILURE_PREFIX} {e}"
 
+    def _create_index_set(self, collection_name: str) -> Dict:
+        """为指定集合创建一组索引对象；BM25 / 符号表的持久化文件按集合名区分"""
+        # 向量存储后端由配置选择（RAG_VECTOR_BACKEND: chroma / numpy）
+        vector_store = create_vector_store(
+            persist_directory=self.persist_directory,
+            embedder=self.processor,
+            query_cache=self.query_cache
+        )
+        return {
+            'collection': collection_name,
+            'vector_store': vector_store,
+            'bm25_index': BM25Index(
+                persist_path=os.path.join(vector_store.persist_directory, f"bm25_{collection_name}.npz")
+            ),
+            'symbol_index': SymbolIndex(
+                persist_path=os.path.join(vector_store.persist_directory, f"symbols_{collection_name}.json")
+            )
+        }
+    
+    def _current_index_set(self) -> Dict:
+        return {
+            'collection': self.collection_name,
+            'vector_store': self.vector_store,
+            'bm25_index': self.bm25_index,
+            'symbol_index': self.symbol_index
+        }
+    
+    def _swap_index(self, index_set: Dict):
+        """切换到 index_set 提供查询
+        
+        几个引用在事件循环上一次赋值完成（中间没有 await），协程不会看到新旧混合的状态；
+        新向量存储的版本号高于旧的，查询缓存随之清空。
+        """
+        previous = getattr(self, 'vector_store', None)
+        if previous is not None and index_set['vector_store'] is not previous:
+            index_set['vector_store'].index_version = max(
+                index_set['vector_store'].index_version, previous.index_version + 1
+            )
+        self.collection_name = index_set['collection']
+        self.vector_store = index_set['vector_store']
+        self.bm25_index = index_set['bm25_index']
+        self.symbol_index = index_set['symbol_index']
+    
+    def _single_flight(self, key: str, factory) -> asyncio.Task:
+        """同一事件循环上 key 相同的调用共享一个进行中的任务；任务结束后下次调用重新开始"""
+        loop = asyncio.get_running_loop()
+        flights = self._flights.setdefault(loop, {})
+        task = flights.get(key)
+        if task is None or task.done():
+            task = loop.create_task(factory())
+            # 异常已在任务内打印；后台任务可能没人等待，这里取走异常避免告警
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            flights[key] = task
+        return task
+    
     async def initialize(self):
-        """初始化Unity RAG系统"""
+        """初始化Unity RAG系统
+        
+        单飞：首批并发请求共享同一次初始化，而不是各自完整构建一遍索引；
+        等待方被取消不会中断共享的初始化。
+        """
+        if self.is_initialized:
+            return
+        await asyncio.shield(self._single_flight('initialize', self._initialize))
+    
+    async def _initialize(self):
         if self.is_initialized:
             return
         
+        # 配置了索引快照时直接加载，跳过加载项目、分割和生成嵌入
+        snapshot_path = settings.RAG_SNAPSHOT_PATH
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                await self.executor.run(self.load_snapshot, snapshot_path)
+                return
+            except Exception as e:
+                print(f"⚠️ 加载索引快照失败，改为完整重建: {e}")
+        
+        # 项目未变化时直接打开已持久化的集合、BM25和符号表
+        signature = await self.executor.run(self._index_signature)
+        if settings.RAG_STARTUP_FAST_PATH:
+            index_set = await self.executor.run(self._open_persisted_index, signature)
+            if index_set is not None:
+                self._swap_index(index_set)
+                self.is_initialized = True
+                return
+        
         print("🚀 初始化Unity RAG系统...")
         
+        # 构建过程中中断时不能留下过期的就绪标记
+        await self.executor.run(self._clear_index_state)
+        index_set = self._current_index_set()
+        documents, chunks = await self._build_index(index_set)
+        await self._activate_index(index_set, signature, chunks)
+        
+        self.is_initialized = True
+        
+        # 打印统计信息
+        self._print_statistics(documents, chunks)
+    
+    async def _build_index(self, index_set: Dict):
+        """在 index_set 的集合中完整构建索引，返回 (documents, chunks)"""
+        vector_store = index_set['vector_store']
+        collection_name = index_set['collection']
+        
+        # 旧集合整体删除，避免残留已删除文件的块
+        if collection_name in await self.executor.run(vector_store.list_collections):
+            await self.executor.run(vector_store.delete_collection, collection_name)
+        
         # 1. 加载Unity项目
-        documents = self.loader.load_unity_project()
+        documents = await self.executor.run(self.loader.load_unity_project)
         
         # 2. 分割文档
-        chunks = self.processor.split_unity_documents(documents)
+        chunks = await self.executor.run(self.processor.split_unity_documents, documents)
         
         print("start process embeddings")
         # 3. 生成嵌入向量
-        embeddings = self.processor.generate_embeddings(chunks)
+        embeddings = await self.executor.run(self.processor.generate_embeddings, chunks)
         
         # 4. 保存到向量数据库
-        self.vector_store.create_collection("unity_project")
-        self.vector_store.add_documents(chunks, embeddings)
+        await self.executor.run(vector_store.create_collection, collection_name)
+        await self.executor.run(vector_store.add_documents, chunks, embeddings)
+        await self.executor.run(vector_store.flush)
         
-        self.is_initialized = True
+        # 5. 重建BM25倒排索引
+        await self.executor.run(self._rebuild_bm25, index_set['bm25_index'], chunks)
         
-        # 打印统计信息
+        # 6. 构建符号索引
+        await self.executor.run(self._rebuild_symbols, index_set['symbol_index'], documents, chunks)
+        return documents, chunks
+    
+    async def _activate_index(self, index_set: Dict, signature: Dict, chunks: List[Dict]):
+        """切换到新构建的索引，清理引用了已不存在的块的缓存回答，最后写入就绪标记"""
+        self._swap_index(index_set)
+        self.index_generation += 1
+        if self.answer_cache is not None:
+            await self.executor.run(self.answer_cache.retain_chunks, [chunk['id'] for chunk in chunks])
+        await self.executor.run(self._write_index_state, signature)
+    
+    @staticmethod
+    def _rebuild_bm25(bm25_index: BM25Index, chunks: List[Dict]):
+        bm25_index.reset()
+        bm25_index.add_documents(chunks)
+        bm25_index.save()
+    
+    @staticmethod
+    def _rebuild_symbols(symbol_index: SymbolIndex, documents: List[Dict], chunks: List[Dict]):
+        symbol_index.build(documents, chunks)
+        symbol_index.save()
+    
+    def _index_signature(self) -> Dict:
+        """决定已持久化索引能否复用的全部因素"""
+        fingerprint = self.loader.project_fingerprint()
+        return {
+            'project_fingerprint': fingerprint['fingerprint'],
+            'file_count': fingerprint['file_count'],
+            'embedding_model': self.processor.embedding_model_name,
+            'embedding_dim': int(self.processor.embedding_dim),
+            'chunker_version': self.processor.chunker_version,
+            'vector_backend': settings.RAG_VECTOR_BACKEND,
+            'hnsw_space': settings.RAG_HNSW_SPACE
+        }
+    
+    def _read_index_state(self) -> Optional[Dict]:
+        try:
+            with open(self.index_state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _write_index_state(self, signature: Dict):
+        """原子写入就绪标记"""
+        state = {
+            'signature': signature,
+            'collection': self.collection_name,
+            'document_count': self.vector_store.get_collection_info().get('document_count', 0),
+            'bm25_documents': len(self.bm25_index),
+            'symbols': len(self.symbol_index),
+            'built_at': time.time()
+        }
+        tmp_path = self.index_state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_state_path)
+    
+    def _clear_index_state(self):
+        if os.path.exists(self.index_state_path):
+            os.remove(self.index_state_path)
+    
+    def _open_persisted_index(self, signature: Dict) -> Optional[Dict]:
+        """启动快速路径：就绪标记与当前项目一致时只打开集合并加载BM25 / 符号表，返回可切换的索引
+        
+        任何一项不一致（项目文件、嵌入模型、分割器版本、后端、距离空间）或索引文件缺失时
+        返回 None，由调用方完整重建。
+        """
+        start = time.perf_counter()
+        state = self._read_index_state()
+        if state is None:
+            return None
+        recorded = state.get('signature', {})
+        changed = [key for key in signature if recorded.get(key) != signature[key]]
+        if changed:
+            print(f"🔁 索引已过期（{', '.join(changed)} 变化），重新构建")
+            return None
+        
+        # 上次切换到的集合（后台重建后可能是另一个）
+        collection_name = state.get('collection', self.INDEX_COLLECTIONS[0])
+        if collection_name not in self.INDEX_COLLECTIONS:
+            return None
+        if collection_name == self.collection_name:
+            index_set = self._current_index_set()
+        else:
+            index_set = self._create_index_set(collection_name)
+        index_set['vector_store'].create_collection(collection_name)
+        count = index_set['vector_store'].get_collection_info().get('document_count', 0)
+        if not count or count != state.get('document_count'):
+            print(f"⚠️ 集合文档数 {count} 与就绪标记记录的 {state.get('document_count')} 不一致，重新构建")
+            return None
+        if not index_set['bm25_index'].load() or not index_set['symbol_index'].load():
+            print("⚠️ BM25 / 符号索引文件缺失，重新构建")
+            return None
+        
+        print(f"⚡ 项目未变化，直接打开已有索引: {count} 个文本块, {len(index_set['symbol_index'])} 个符号 "
+              f"({(time.perf_counter() - start) * 1000:.0f}ms)")
+        return index_set
+    
+    @property
+    def rebuild_in_progress(self) -> bool:
+        """是否有进行中的重建（任一事件循环上）"""
+        return any(
+            not flights['rebuild'].done()
+            for flights in list(self._flights.values()) if 'rebuild' in flights
+        )
+    
+    async def reinitialize(self, background: bool = False) -> Optional[asyncio.Task]:
+        """重新构建索引
+        
+        尚未初始化时等同于 initialize()。已初始化时在另一个集合中构建新索引，期间查询继续由
+        旧索引提供，构建完成后整体切换；并发调用共享同一次重建。
+        background=True 时不等待，返回重建任务。
+        """
+        if not self.is_initialized:
+            await self.initialize()
+            return None
+        task = self._single_flight('rebuild', self._rebuild)
+        if background:
+            return task
+        await asyncio.shield(task)
+        return None
+    
+    async def _rebuild(self):
+        start = time.perf_counter()
+        staging_name = next(name for name in self.INDEX_COLLECTIONS if name != self.collection_name)
+        print(f"🔁 开始重建索引: {staging_name}（查询继续使用 {self.collection_name}）")
+        try:
+            index_set = await self.executor.run(self._create_index_set, staging_name)
+            signature = await self.executor.run(self._index_signature)
+            documents, chunks = await self._build_index(index_set)
+        except Exception as e:
+            print(f"❌ 重建索引失败，继续使用 {self.collection_name}: {e}")
+            raise
+        previous = self.collection_name
+        await self._activate_index(index_set, signature, chunks)
         self._print_statistics(documents, chunks)
+        print(f"🔄 索引已切换: {previous} -> {self.collection_name} "
+              f"({time.perf_counter() - start:.2f}s, 第 {self.index_generation} 代)")
     
-    # 在 UnityRAGSystem 类中添加
-    async def reinitialize(self):
-        """重新初始化系统，清除所有缓存"""
-        # 清除现有状态
-        self.is_initialized = False
-        self.documents = []
-        self.chunks = []
+    def export_snapshot(self, path: Optional[str] = None) -> Dict:
+        """导出单文件索引快照（向量、块文本、元数据、符号表、嵌入模型ID）"""
+        path = path or settings.RAG_SNAPSHOT_PATH or os.path.join(
+            self.vector_store.persist_directory, "unity_project.ragsnap"
+        )
+        manifest = self.vector_store.export_snapshot(
+            path,
+            extras={'symbols': self.symbol_index.entries},
+            info={'project_path': self.unity_project_path}
+        )
+        print(f"💾 索引快照已导出: {path} ({manifest['count']} 个文本块)")
+        return manifest
+    
+    def load_snapshot(self, path: str):
+        """从索引快照启动：向量直接载入，BM25由快照文本重建，符号表直接恢复"""
+        manifest = read_manifest(path)
+        if manifest.get('embedding_model') != self.processor.embedding_model_name:
+            raise ValueError(
+                f"快照由 {manifest.get('embedding_model')} 构建，"
+                f"与当前嵌入模型 {self.processor.embedding_model_name} 不一致"
+            )
+        
+        print(f"📦 加载索引快照: {path}")
+        snapshot = self.vector_store.load_snapshot(path, self.collection_name)
         
-        # 重新创建向量存储
-        if hasattr(self, 'vector_store') and self.vector_store:
-            self.vector_store = None
+        self.bm25_index.reset()
+        self.bm25_index.add_documents(
+            {'id': chunk_id, 'content': snapshot.texts[row]}
+            for row, chunk_id in enumerate(snapshot.ids)
+        )
+        self.symbol_index.load_entries(snapshot.extras.get('symbols', []))
+        if self.answer_cache is not None:
+            self.answer_cache.retain_chunks(snapshot.ids)
         
-        # 重新初始化
-        await self.initialize()
-        print('🔄 RAG系统已重新初始化')
+        self.is_initialized = True
+        print(f"✅ 索引快照加载完成: {len(snapshot)} 个文本块, {len(self.symbol_index)} 个符号")
     
     def _print_statistics(self, documents: List[Dict], chunks: List[Dict]):
         """打印统计信息"""
@@ -117,6 +440,41 @@ class UnityRAGSystem:
         for file_type, count in file_types.items():
             print(f"  - {file_type}: {count}")
     
+    def index_status(self) -> Dict:
+        """索引状态（就绪探针 / 索引接口使用）"""
+        info = self.vector_store.get_collection_info() if self.is_initialized else {}
+        return {
+            'project_path': self.unity_project_path,
+            'initialized': self.is_initialized,
+            'collection': self.collection_name,
+            'generation': self.index_generation,
+            'document_count': info.get('document_count', 0),
+            'symbols': len(self.symbol_index),
+            'rebuild_in_progress': self.rebuild_in_progress
+        }
+    
+    async def search(self, query: str, n_results: int = 10, file_types: List[str] = None) -> List[Dict]:
+        """只检索、不调用大模型：返回混合检索（向量 + BM25 + 符号表）的前 n_results 个块"""
+        if not self.is_initialized:
+            await self.initialize()
+        
+        where_filter = None
+        if file_types:
+            where_filter = {"file_type": {"$in": file_types}}
+        
+        docs = await self.executor.run(self._retrieve, query, n_results, where_filter)
+        return [
+            dict(source, id=doc['id'], content=doc['content'])
+            for source, doc in zip(self._format_sources(docs), docs)
+        ]
+    
+    async def close(self):
+        """释放大模型连接、线程池与回答缓存（应用退出时调用）"""
+        await self.llm_client.close()
+        self.executor.shutdown(wait=False)
+        if self.answer_cache is not None:
+            self.answer_cache.close()
+    
     async def ask_about_unity_project(self, question: str, file_types: List[str] = None) -> Dict:
         """关于Unity项目的问答"""
         if not self.is_initialized:
@@ -127,76 +485,428 @@ class UnityRAGSystem:
         if file_types:
             where_filter = {"file_type": {"$in": file_types}}
         
-        # 检索相关文档
-        relevant_docs = self.vector_store.search(
-            question, 
-            n_results=10,
-            where_filter=where_filter
+        # 检索相关文档（查询向量和检索结果均走缓存；在线程池中执行，不阻塞事件循环）
+        relevant_docs = (await self.executor.run(self._retrieve_context_many, [question], where_filter))[0]
+        
+        # 查回答缓存，未命中时构建提示词并调用大模型
+        lookup = (await self.executor.run(self._lookup_answers, [question], [relevant_docs]))[0]
+        return await self._answer_with_cache(question, relevant_docs, lookup)
+    
+    async def ask_many(self, questions: List[str], file_types: List[str] = None,
+                       max_concurrency: int = 4) -> List[Dict]:
+        """批量问答：检索阶段整批共享（一次编码、一次多查询），再并发调用大模型
+        
+        结果按输入顺序返回；max_concurrency 限制同时进行的大模型调用数。
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        if not questions:
+            return []
+        
+        where_filter = None
+        if file_types:
+            where_filter = {"file_type": {"$in": file_types}}
+        
+        docs_per_question = await self.retrieve_contexts(questions, where_filter)
+        print(f"🔍 批量检索完成: {len(questions)} 个问题")
+        
+        lookups = await self.lookup_answers(questions, docs_per_question)
+        
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def answer_one(question: str, relevant_docs: List[Dict], lookup) -> Dict:
+            async with semaphore:
+                return await self.answer_with_context(question, relevant_docs, lookup)
+        
+        return await asyncio.gather(*[
+            answer_one(question, docs, lookup)
+            for question, docs, lookup in zip(questions, docs_per_question, lookups)
+        ])
+    
+    async def retrieve_contexts(self, questions: List[str],
+                                where_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量检索送入提示词的上下文（路由、重排、MMR 与问答相同），结果与 questions 一一对应"""
+        if not self.is_initialized:
+            await self.initialize()
+        if not questions:
+            return []
+        return await self.executor.run(self._retrieve_context_many, questions, where_filter)
+    
+    async def lookup_answers(self, questions: List[str],
+                             docs_per_question: List[List[Dict]]) -> List[Tuple]:
+        """批量查回答缓存，返回每个问题的 (问题向量, 命中的条目)，供 answer_with_context 使用"""
+        return await self.executor.run(self._lookup_answers, questions, docs_per_question)
+    
+    async def answer_with_context(self, question: str, relevant_docs: List[Dict],
+                                  lookup: Optional[Tuple] = None) -> Dict:
+        """基于已检索的上下文回答：命中回答缓存时直接返回，否则调用大模型并写入缓存
+        
+        lookup 为 lookup_answers 的结果，省略时在这里查询。
+        """
+        if lookup is None:
+            lookup = (await self.lookup_answers([question], [relevant_docs]))[0]
+        return await self._answer_with_cache(question, relevant_docs, lookup)
+    
+    def _lookup_answers(self, questions: List[str],
+                        docs_per_question: List[List[Dict]]) -> List[Tuple]:
+        """批量查回答缓存，返回 (问题向量, 命中的条目)；没有检索结果的问题不参与缓存"""
+        if self.answer_cache is None:
+            return [(None, None) for _ in questions]
+        embeddings = self.query_cache.get_embeddings(
+            questions, self.processor.embed_queries, self.vector_store.index_version
         )
+        return [
+            (embedding, self.answer_cache.lookup(embedding, [doc['id'] for doc in docs])) if docs else (None, None)
+            for embedding, docs in zip(embeddings, docs_per_question)
+        ]
+    
+    def _answer_cacheable(self, answer: str) -> bool:
+        """模拟回答和调用失败的回答不写入缓存"""
+        return not self._use_simulated_llm and not answer.startswith(LLM_FAILURE_PREFIX)
+    
+    async def _store_answer(self, question: str, embedding, relevant_docs: List[Dict],
+                            answer: str, cost_ms: float):
+        if embedding is not None and self._answer_cacheable(answer):
+            await self.executor.run(
+                self.answer_cache.put, question, embedding,
+                [doc['id'] for doc in relevant_docs], answer, cost_ms
+            )
+    
+    async def _answer_with_cache(self, question: str, relevant_docs: List[Dict], lookup) -> Dict:
+        """命中回答缓存时直接返回，否则调用大模型并写入缓存"""
+        embedding, hit = lookup
+        if hit is not None:
+            return self._format_answer(question, hit['answer'], relevant_docs, cached=True)
         
-        # 构建提示词
         prompt = self._build_unity_prompt(question, relevant_docs)
-        
-        # 调用大模型
+        start = time.perf_counter()
         answer = await self._call_llm(prompt)
+        await self._store_answer(question, embedding, relevant_docs, answer,
+                                 (time.perf_counter() - start) * 1000)
+        return self._format_answer(question, answer, relevant_docs)
+    
+    async def ask_stream(self, question: str, file_types: List[str] = None) -> AsyncIterator[Dict]:
+        """流式问答：先产出检索到的来源，再逐个产出回答增量
+        
+        事件依次为：
+          {'type': 'sources', 'sources': [...], 'retrieval_ms': ...}
+          {'type': 'token', 'text': ...}（多次）
+          {'type': 'done', 'answer': 完整回答, 'cached', 'retrieval_ms', 'ttft_ms', 'total_ms'}
+        出错时产出 {'type': 'error', 'message': ...} 后结束。ttft_ms 从收到问题开始计时。
+        """
+        start = time.perf_counter()
+        if not self.is_initialized:
+            await self.initialize()
         
+        where_filter = None
+        if file_types:
+            where_filter = {"file_type": {"$in": file_types}}
+        
+        relevant_docs = (await self.executor.run(self._retrieve_context_many, [question], where_filter))[0]
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        yield {'type': 'sources', 'sources': self._format_sources(relevant_docs),
+               'retrieval_ms': round(retrieval_ms, 2)}
+        
+        embedding, hit = (await self.executor.run(self._lookup_answers, [question], [relevant_docs]))[0]
+        prompt = self._build_unity_prompt(question, relevant_docs)
+        parts = []
+        ttft_ms = None
+        llm_start = time.perf_counter()
+        try:
+            if hit is not None:
+                tokens = self._static_stream(hit['answer'])
+            elif self._use_simulated_llm:
+                tokens = self._static_stream(f"[模拟回答] 问题: {prompt[:100]}...")
+            else:
+                tokens = self.llm_client.stream(prompt, temperature=0)
+            async for text in tokens:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                parts.append(text)
+                yield {'type': 'token', 'text': text}
+        except Exception as e:
+            print(f"❌ 流式回答失败: {e}")
+            yield {'type': 'error', 'message': f"{LLM_FAILURE_PREFIX} {e}"}
+            return
+        
+        answer = "".join(parts)
+        if hit is None:
+            await self._store_answer(question, embedding, relevant_docs, answer,
+                                     (time.perf_counter() - llm_start) * 1000)
+        yield {
+            'type': 'done',
+            'answer': answer,
+            'cached': hit is not None,
+            'retrieval_ms': round(retrieval_ms, 2),
+            'ttft_ms': round(ttft_ms, 2) if ttft_ms is not None else None,
+            'total_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+    
+    async def _static_stream(self, text: str) -> AsyncIterator[str]:
+        """缓存命中或模拟回答：整段作为一个增量输出"""
+        yield text
+    
+    def _format_answer(self, question: str, answer: str, relevant_docs: List[Dict],
+                       cached: bool = False) -> Dict:
         return {
             'question': question,
             'answer': answer,
-            'relevant_sources': [
-                {
-                    'file': doc['metadata']['file_path'],
-                    'type': doc['metadata']['file_type'],
-                    'score': doc['score'],
-                    'context': doc['metadata'].get('block_type', '')
-                }
-                for doc in relevant_docs
-            ]
+            'relevant_sources': self._format_sources(relevant_docs),
+            'cached': cached
         }
     
-    def _build_unity_prompt(self, question: str, relevant_docs: List[Dict]) -> str:
-        """构建Unity专用提示词"""
-        
-        context_parts = []
-        class_info = ""
-        for i, doc in enumerate(relevant_docs):
-            metadata = doc['metadata']
-            context_parts.append(f"""
-            ## 来源 {i+1} [{metadata['file_type']}] (相关性: {doc['score']:.2f})
-            **文件**: {metadata['file_path']}
-            **类型**: {metadata['file_type']} / {metadata.get('block_type', 'N/A')}
-            {class_info}
-
-            ```{self._get_code_language(metadata['file_type'])}
-            {doc['content'][:600]}
-            """)
-
-        context_str = '\n'.join(context_parts)
+    def _format_sources(self, relevant_docs: List[Dict]) -> List[Dict]:
+        return [
+            {
+                'file': doc['metadata']['file_path'],
+                'type': doc['metadata']['file_type'],
+                'score': doc['score'],
+                'context': doc['metadata'].get('block_type', '')
+            }
+            for doc in relevant_docs
+        ]
+    
+    def _retrieve_context_many(self, questions: List[str], where_filter: Optional[Dict] = None,
+                               timings: Optional[Dict[str, float]] = None) -> List[List[Dict]]:
+        """检索送入提示词的上下文
         
-        prompt = f"""
-        Unity项目智能分析
-        项目上下文
-        {context_str}
-
-        用户问题
-        {question}
-
-        回答要求
-        你是一个资深的Unity开发专家，基于以上Unity项目代码和资源文件回答用户问题。
-
-        请重点关注：
-
-        Unity最佳实践 - 性能优化、内存管理
-
-        架构设计 - MonoBehaviour使用、组件通信
+        启用重排时多取K个候选再重排，只保留前N个（同时启用MMR时不少于MMR要选出的块数）；
+        启用MMR时从候选池中按 相关性 - 冗余度 选出最终的块，否则取前N个（未启用重排时为10个）。
+        传入 timings 时写入各阶段耗时（毫秒）：search / rerank / mmr。
+        """
+        mmr = settings.RAG_MMR_ENABLED
+        start = time.perf_counter()
+        if self.reranker is None:
+            pool_size = settings.RAG_MMR_CANDIDATES if mmr else 10
+            pools = self._retrieve_many(questions, n_results=pool_size, where_filter=where_filter)
+            stages = [('search', time.perf_counter())]
+        else:
+            candidates = self._retrieve_many(
+                questions, n_results=settings.RAG_RERANK_CANDIDATES, where_filter=where_filter
+            )
+            stages = [('search', time.perf_counter())]
+            keep = settings.RAG_RERANK_TOP_N
+            if mmr:
+                keep = max(keep, settings.RAG_MMR_TOP_N)
+            pools = [
+                self.reranker.rerank(question, docs, keep)
+                for question, docs in zip(questions, candidates)
+            ]
+            stages.append(('rerank', time.perf_counter()))
+        if mmr:
+            pools = self._diversify_many(pools)
+            stages.append(('mmr', time.perf_counter()))
+        if timings is not None:
+            for stage, end in stages:
+                timings[stage] = (end - start) * 1000
+                start = end
+        return pools
+    
+    def _diversify_many(self, pools: List[List[Dict]], top_n: Optional[int] = None,
+                        lambda_mult: Optional[float] = None) -> List[List[Dict]]:
+        """对每个问题的候选池做 MMR / 单文件上限选择，所有候选的向量一次取回"""
+        top_n = settings.RAG_MMR_TOP_N if top_n is None else top_n
+        lambda_mult = settings.RAG_MMR_LAMBDA if lambda_mult is None else lambda_mult
+        ids = list(dict.fromkeys(doc['id'] for docs in pools for doc in docs))
+        embeddings_by_id = self.vector_store.get_embeddings(ids) if ids else {}
+        return [
+            diversify(docs, embeddings_by_id, top_n, lambda_mult, settings.RAG_MMR_PER_FILE_CAP)
+            for docs in pools
+        ]
+    
+    def _retrieve(self, question: str, n_results: int = 10,
+                  where_filter: Optional[Dict] = None) -> List[Dict]:
+        """用项目自身的嵌入模型检索，带查询向量缓存和结果缓存"""
+        return self._retrieve_many([question], n_results, where_filter)[0]
+    
+    def _retrieve_many(self, questions: List[str], n_results: int = 10,
+                       where_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量检索，结果与 questions 一一对应
+        
+        调用方没有指定文件类型且启用了查询路由时，按路由决策分组检索；否则整批按同一条件检索。
+        """
+        if where_filter is None and self.router is not None:
+            return self._retrieve_routed(questions, n_results)
+        return self._retrieve_group(questions, n_results, where_filter)
+    
+    def _retrieve_routed(self, questions: List[str], n_results: int) -> List[List[Dict]]:
+        """按路由决策的 (范围, 策略) 分组检索；过滤后结果太少的问题改为不过滤的混合检索"""
+        index_version = self.vector_store.index_version
+        decisions = self.router.route_many(
+            questions,
+            lambda texts: self.query_cache.get_embeddings(texts, self.processor.embed_queries, index_version),
+            self.symbol_index
+        )
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for i, decision in enumerate(decisions):
+            strategy = 'vector' if decision['strategy'] == 'vector' else 'hybrid'
+            groups.setdefault((decision['scope'], strategy), []).append(i)
+        
+        results: List[List[Dict]] = [[] for _ in questions]
+        for (scope, strategy), rows in groups.items():
+            found = self._retrieve_group(
+                [questions[i] for i in rows], n_results, self.router.where_filter(scope), strategy
+            )
+            for i, docs in zip(rows, found):
+                results[i] = docs
+        
+        min_results = min(n_results, settings.RAG_ROUTER_MIN_RESULTS)
+        # 符号表命中的结果本来就少，不算过滤过窄
+        retry = [i for i, docs in enumerate(results)
+                 if len(docs) < min_results and not (docs and docs[0].get('match') == 'symbol')
+                 and (decisions[i]['file_types'] or decisions[i]['strategy'] == 'vector')]
+        if retry:
+            self.router.record_fallback(len(retry))
+            for i, docs in zip(retry, self._retrieve_group([questions[i] for i in retry], n_results, None)):
+                results[i] = docs
+        return results
+    
+    def _retrieve_group(self, questions: List[str], n_results: int,
+                        where_filter: Optional[Dict] = None, strategy: str = 'hybrid') -> List[List[Dict]]:
+        """按同一过滤条件与策略批量检索
+        
+        点名已知符号的问题走符号表快速路径；其余问题的查询向量一次编码，
+        相同的问题只检索一次，向量检索合并为一次多查询调用。
+        """
+        results = self._symbol_search_many(questions, n_results, where_filter)
+        remaining = [i for i, docs in enumerate(results) if not docs]
+        if not remaining:
+            return results
+        
+        index_version = self.vector_store.index_version
+        pending_questions = [questions[i] for i in remaining]
+        embeddings = self.query_cache.get_embeddings(
+            pending_questions, self.processor.embed_queries, index_version
+        )
+        searched = self.query_cache.get_results_many(
+            embeddings, where_filter, n_results, index_version,
+            lambda rows: self._hybrid_search_many(
+                [pending_questions[row] for row in rows], embeddings[rows], n_results, where_filter, strategy
+            ),
+            strategy,
+            pending_questions
+        )
+        for i, docs in zip(remaining, searched):
+            results[i] = docs
+        return results
+    
+    def _hybrid_search_many(self, questions: List[str], embeddings, n_results: int,
+                            where_filter: Optional[Dict] = None, strategy: str = 'hybrid') -> List[List[Dict]]:
+        """批量混合检索（向量 + BM25，倒数排名融合）：向量检索一次多查询调用，BM25补充的文档一次按ID取回（strategy='vector' 时只做向量检索）
+        
+        问题中出现、但不足以走快速路径的符号名（如与普通单词同名的字段 time / color）
+        作为第三路排序结果参与融合，而不是直接取代检索结果。
+        """
+        if strategy == 'vector' or not settings.RAG_HYBRID_ENABLED or not len(self.bm25_index):
+            return self.vector_store.search_many_by_embedding(
+                embeddings, n_results=n_results, where_filter=where_filter,
+                model_name=self.processor.embedding_model_name
+            )
+        
+        candidates = max(n_results, settings.RAG_HYBRID_CANDIDATES)
+        vector_hits_many = self.vector_store.search_many_by_embedding(
+            embeddings, n_results=candidates, where_filter=where_filter,
+            model_name=self.processor.embedding_model_name
+        )
+        bm25_hits_many = [self.bm25_index.search(question, n_results=candidates) for question in questions]
+        symbol_ids_many = [
+            self.symbol_index.rank_chunks(question)[:candidates] if settings.RAG_SYMBOL_FAST_PATH else []
+            for question in questions
+        ]
+        
+        known = {hit['id']: hit for hits in vector_hits_many for hit in hits}
+        missing = list(dict.fromkeys(
+            [hit['id'] for hits in bm25_hits_many for hit in hits if hit['id'] not in known]
+            + [chunk_id for chunk_ids in symbol_ids_many for chunk_id in chunk_ids if chunk_id not in known]
+        ))
+        known.update({doc['id']: doc for doc in self.vector_store.get_by_ids(missing)})
+        
+        def ranked_docs(scored_ids: List[Tuple[str, float]]) -> List[Dict]:
+            docs = []
+            for doc_id, score in scored_ids:
+                doc = known.get(doc_id)
+                if doc is None or not metadata_matches(doc['metadata'], where_filter):
+                    continue
+                doc = dict(doc)
+                doc['score'] = score
+                docs.append(doc)
+            return docs
+        
+        fused_many = []
+        for vector_hits, bm25_hits, symbol_ids in zip(vector_hits_many, bm25_hits_many, symbol_ids_many):
+            ranked_lists = [vector_hits, ranked_docs([(hit['id'], hit['score']) for hit in bm25_hits])]
+            if symbol_ids:
+                ranked_lists.append(ranked_docs([(chunk_id, 1.0) for chunk_id in symbol_ids]))
+            fused = reciprocal_rank_fusion(ranked_lists, k=settings.RAG_RRF_K)
+            fused_many.append(fused[:n_results])
+        return fused_many
+    
+    def _symbol_search_many(self, questions: List[str], n_results: int,
+                            where_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量符号表快速路径（没有命中的问题返回空列表）：所有问题命中的块一次按ID取回
+        
+        只有确实点名符号的问题（驼峰 / 下划线 / 类型.成员，或首字母大写的类型、方法名）才跳过向量与BM25检索。
+        """
+        if not settings.RAG_SYMBOL_FAST_PATH or not len(self.symbol_index):
+            return [[] for _ in questions]
+        
+        ranked = [self.symbol_index.rank_chunks(question, named_only=True)[:n_results * 3] for question in questions]
+        all_ids = list(dict.fromkeys(chunk_id for chunk_ids in ranked for chunk_id in chunk_ids))
+        if not all_ids:
+            return [[] for _ in questions]
+        by_id = {doc['id']: doc for doc in self.vector_store.get_by_ids(all_ids)}
+        
+        results = []
+        for chunk_ids in ranked:
+            docs = []
+            for chunk_id in chunk_ids:
+                doc = by_id.get(chunk_id)
+                if doc is not None and metadata_matches(doc['metadata'], where_filter):
+                    doc = dict(doc)
+                    doc['score'] = 1.0
+                    doc['match'] = 'symbol'
+                    docs.append(doc)
+            results.append(docs[:n_results])
+        return results
+    
+    def lookup_symbol(self, name: str, mode: str = 'exact', limit: int = 20) -> List[Dict]:
+        """查找C#符号：mode = exact / prefix / fuzzy"""
+        return self.symbol_index.search(name, mode=mode, limit=limit)
+    
+    def get_cache_stats(self) -> Dict:
+        """查询缓存统计：命中率、节省的耗时、线程池队列深度、大模型调用、上下文打包、回答缓存（启用重排 / 查询路由时附带其统计）"""
+        stats = self.query_cache.stats()
+        stats['executor'] = self.executor.stats()
+        stats['llm'] = self.llm_client.stats()
+        stats['context'] = self.context_packer.stats()
+        if self.answer_cache is not None:
+            stats['answers'] = self.answer_cache.stats()
+        if self.reranker is not None:
+            stats['rerank'] = self.reranker.stats()
+        if self.router is not None:
+            stats['router'] = self.router.stats()
+        return stats
+    
+    def _build_unity_prompt(self, question: str, relevant_docs: List[Dict]) -> str:
+        """构建Unity专用提示词（上下文由 ContextPacker 按 token 预算打包）"""
+        context = self.context_packer.pack(relevant_docs)
+        return f"""# Unity项目智能分析
 
-        资源管理 - 预制体、场景、材质的使用
+## 项目上下文
+{context['text'] or '（未检索到相关内容）'}
 
-        平台特性 - 移动端、PC端优化差异
+## 用户问题
+{question}
 
-        请提供具体、可操作的Unity开发建议。
-        """
-        return prompt
+## 回答要求
+你是一个资深的Unity开发专家，基于以上Unity项目代码和资源文件回答用户问题。
+请重点关注：
+- Unity最佳实践：性能优化、内存管理
+- 架构设计：MonoBehaviour使用、组件通信
+- 资源管理：预制体、场景、材质的使用
+- 平台特性：移动端、PC端优化差异
+请提供具体、可操作的Unity开发建议。
+"""
 
     def _get_code_language(self, file_type: str) -> str:
         """获取代码语言"""
@@ -1,26 +1,46 @@
 # app/services/unity_text_processor.py
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 
+from app.core.config import settings
+from .hashing_embedder import HashingEmbedder
+from .chunk_utils import compute_chunk_id
+
 logger = logging.getLogger(__name__)
 
 class UnityTextProcessor:
-    def __init__(self):
+    # 分割规则（分隔符、块大小、块ID算法）变化时递增，已有索引随之失效
+    CHUNKER_VERSION = 1
+    CODE_CHUNK_SIZE = 800
+    CODE_CHUNK_OVERLAP = 150
+    CONFIG_CHUNK_SIZE = 1000
+    CONFIG_CHUNK_OVERLAP = 100
+    
+    def __init__(self, embedding_backend: Optional[str] = None):
         # 初始化嵌入模型
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("✅ 嵌入模型初始化成功")
-        except Exception as e:
-            logger.error(f"❌ 嵌入模型初始化失败: {e}")
-            self.embedding_model = None
+        # sentence_transformer: 神经网络模型；hashing: 零依赖的特征哈希（CI、小型部署、冷启动）
+        self.embedding_backend = (embedding_backend or settings.RAG_EMBEDDING_BACKEND).lower()
+        self.embedding_model = None
+        self.embedding_model_name = None
+        
+        if self.embedding_backend == 'hashing':
+            self._use_hashing_backend()
+        else:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self.embedding_model = SentenceTransformer(settings.RAG_EMBEDDING_MODEL)
+                self.embedding_model_name = settings.RAG_EMBEDDING_MODEL
+                logger.info("✅ 嵌入模型初始化成功")
+            except Exception as e:
+                logger.error(f"❌ 嵌入模型初始化失败: {e}，改用哈希嵌入后端")
+                self._use_hashing_backend()
         
         # 针对Unity代码的智能分割器
         self.code_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=150,
+            chunk_size=self.CODE_CHUNK_SIZE,
+            chunk_overlap=self.CODE_CHUNK_OVERLAP,
             length_function=len,
             separators=[
                 '\nclass ', '\npublic class ', '\n[System.Serializable]',
@@ -32,8 +52,8 @@ class UnityTextProcessor:
         
         # 针对配置文件的通用分割器
         self.config_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100,
+            chunk_size=self.CONFIG_CHUNK_SIZE,
+            chunk_overlap=self.CONFIG_CHUNK_OVERLAP,
             length_function=len
         )
     
@@ -50,16 +70,19 @@ class UnityTextProcessor:
             
             try:
                 if file_type == 'code':
-                    code_chunks = self._split_code_file(content, metadata)
-                    chunks.extend(code_chunks)
+                    doc_chunks = self._split_code_file(content, metadata)
                 elif file_type in ['scene', 'prefab']:
-                    yaml_chunks = self._split_yaml_file(content, metadata)
-                    chunks.extend(yaml_chunks)
+                    doc_chunks = self._split_yaml_file(content, metadata)
                 else:
                     # 通用分割
                     text_chunks = self.config_splitter.split_text(content)
-                    for i, chunk in enumerate(text_chunks):
-                        chunks.append(self._create_chunk(chunk, metadata, i))
+                    doc_chunks = [
+                        self._create_chunk(chunk, metadata, i)
+                        for i, chunk in enumerate(text_chunks)
+                    ]
+                
+                self._assign_spans_and_ids(content, doc_chunks)
+                chunks.extend(doc_chunks)
                         
             except Exception as e:
                 print(f"⚠️ 分割文档失败 {metadata['file_path']}: {e}")
@@ -67,12 +90,40 @@ class UnityTextProcessor:
         print(f"✅ 文档分割完成: {len(chunks)} 个块")
         return chunks
     
+    def _assign_spans_and_ids(self, content: str, doc_chunks: List[Dict]):
+        """记录每个块在原文件中的字符区间，并生成内容寻址的稳定ID"""
+        cursor = 0
+        for chunk in doc_chunks:
+            text = chunk['content']
+            start = content.find(text, cursor)
+            if start < 0:
+                start = content.find(text)
+            if start >= 0:
+                chunk['metadata']['chunk_start'] = start
+                chunk['metadata']['chunk_end'] = start + len(text)
+                cursor = start + 1
+            chunk['id'] = compute_chunk_id(text, chunk['metadata'])
+    
+    def _use_hashing_backend(self):
+        """切换到哈希嵌入后端"""
+        self.embedding_backend = 'hashing'
+        self.embedding_model = HashingEmbedder(dim=settings.RAG_HASHING_DIM)
+        self.embedding_model_name = self.embedding_model.model_name
+        logger.info(f"✅ 使用哈希嵌入后端: {self.embedding_model_name}")
+    
+    @property
+    def chunker_version(self) -> str:
+        """分割器版本标识（版本号 + 块大小 / 重叠），写入索引状态"""
+        return (f"{self.CHUNKER_VERSION}:code{self.CODE_CHUNK_SIZE}/{self.CODE_CHUNK_OVERLAP}"
+                f":config{self.CONFIG_CHUNK_SIZE}/{self.CONFIG_CHUNK_OVERLAP}")
+    
+    @property
+    def embedding_dim(self) -> int:
+        """嵌入向量维度"""
+        return self.embedding_model.get_sentence_embedding_dimension()
+    
     def generate_embeddings(self, chunks: List[Dict]) -> np.ndarray:
         """生成文本块的嵌入向量"""
-        print("step1")
-        if self.embedding_model is None:
-            raise RuntimeError("嵌入模型未初始化，请安装: pip install sentence-transformers")
-        
         texts = [chunk['content'] for chunk in chunks]
         print(f"🧠 为 {len(texts)} 个文本块生成嵌入向量...")
         
@@ -87,11 +138,24 @@ class UnityTextProcessor:
             return embeddings
             
         except Exception as e:
+            # 后端只在构造时选择一次：构建中途切换会让已记录模型名 / 维度的
+            # 索引签名、回答缓存和路由模型与新向量空间不一致，因此直接让构建失败
             logger.error(f"❌ 生成嵌入向量失败: {e}")
-            # 返回随机嵌入向量作为备选
-            print("⚠️ 使用随机嵌入向量作为备选")
-            return np.random.randn(len(texts), 384).astype('float32')
-    
+            raise
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """批量生成查询向量（与文档向量处于同一空间）"""
+        embeddings = self.embedding_model.encode(
+            list(queries),
+            batch_size=64,
+            convert_to_numpy=True
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """生成单个查询向量"""
+        return self.embed_queries([query])[0]
+
     def _split_code_file(self, content: str, metadata: Dict) -> List[Dict]:
         """分割代码文件"""
         chunks = []
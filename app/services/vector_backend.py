@@ -0,0 +1,98 @@
+# app/services/vector_backend.py
+from typing import Any, Dict, List, Optional, Protocol, runtime_checkable
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@runtime_checkable
+class VectorStoreBackend(Protocol):
+    """向量存储后端协议
+
+    UnityRAGSystem 只依赖这里列出的方法，ChromaVectorStore 与 NumpyVectorStore 都实现了它。
+    约定：
+      - add_documents 为 upsert 语义：相同块ID覆盖原有内容，返回写入的块ID；
+      - 写入 / 删除后调用 flush() 保证修改落盘（构建或重建结束时调用一次）；
+      - 检索结果为 {'id', 'content', 'metadata', 'distance', 'score'}，score 越大越相关；
+      - where_filter 使用 Chroma 风格的条件（$and / $or / $eq / $ne / $in / $nin / $gt ...）；
+      - 集合内容每次变化时 index_version 递增，供查询缓存判断失效。
+    """
+
+    index_version: int
+
+    @property
+    def collection(self) -> Any: ...
+
+    def create_collection(self, collection_name: str = "unity_project", **index_params): ...
+
+    def delete_collection(self, collection_name: str): ...
+
+    def list_collections(self) -> List[str]: ...
+
+    def add_documents(self, chunks, embeddings, batch_size: Optional[int] = None) -> List[str]: ...
+
+    def delete(self, ids: List[str]) -> int: ...
+
+    def flush(self): ...
+
+    def get_by_ids(self, ids: List[str]) -> List[Dict]: ...
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]: ...
+
+    def search(self, query: str, n_results: int = 5,
+               where_filter: Optional[Dict] = None) -> List[Dict]: ...
+
+    def search_many(self, queries: List[str], n_results: int = 5,
+                    where_filter: Optional[Dict] = None) -> List[List[Dict]]: ...
+
+    def search_by_embedding(self, embedding: np.ndarray, n_results: int = 5,
+                            where_filter: Optional[Dict] = None,
+                            model_name: Optional[str] = None) -> List[Dict]: ...
+
+    def search_many_by_embedding(self, embeddings: np.ndarray, n_results: int = 5,
+                                 where_filter: Optional[Dict] = None,
+                                 model_name: Optional[str] = None) -> List[List[Dict]]: ...
+
+    def get_collection_info(self) -> Dict: ...
+
+    def export_snapshot(self, path: str, extras: Optional[Dict] = None,
+                        info: Optional[Dict] = None) -> Dict: ...
+
+    def load_snapshot(self, path: str, collection_name: Optional[str] = None) -> Any: ...
+
+
+VECTOR_BACKENDS = ("chroma", "numpy")
+
+
+def create_vector_store(backend: Optional[str] = None, persist_directory: Optional[str] = None,
+                        embedder=None, query_cache=None) -> VectorStoreBackend:
+    """按配置（RAG_VECTOR_BACKEND）创建向量存储后端
+
+    chromadb 只在选择 chroma 后端时才导入，numpy 后端不需要安装它。
+    """
+    backend = (backend or settings.RAG_VECTOR_BACKEND).lower()
+    persist_directory = persist_directory or settings.RAG_PERSIST_DIRECTORY
+
+    if backend == "chroma":
+        from .vector_store import ChromaVectorStore
+        store = ChromaVectorStore(
+            persist_directory=persist_directory,
+            embedder=embedder,
+            query_cache=query_cache
+        )
+    elif backend == "numpy":
+        from .numpy_vector_store import NumpyVectorStore
+        store = NumpyVectorStore(
+            persist_directory=persist_directory,
+            embedder=embedder,
+            query_cache=query_cache
+        )
+    else:
+        raise ValueError(f"不支持的向量存储后端: {backend}，可选: {', '.join(VECTOR_BACKENDS)}")
+
+    logger.info(f"✅ 向量存储后端: {backend} ({persist_directory})")
+    return store
@@ -4,14 +4,33 @@ from chromadb.config import Settings
 import numpy as np
 from typing import List, Dict, Optional, Any
 import os
+import threading
 import logging
 
+from app.core.config import settings
+from .chunk_utils import unpack_chunk, clean_chunk_metadata
+from . import numpy_vector_store
+from .metadata_index import MetadataBitmapIndex
+from .query_cache import TTLLRUCache
+from .index_snapshot import IndexSnapshot, read_snapshot, write_snapshot
+
 logger = logging.getLogger(__name__)
 
 class ChromaVectorStore:
-    def __init__(self, persist_directory: str = "./chroma_db"):
-        """初始化Chroma向量数据库"""
+    SUPPORTED_SPACES = ("cosine", "ip", "l2")
+    # 只在建图时生效的 HNSW 参数及未记录时 Chroma 的默认值；变化后必须重建集合
+    HNSW_BUILD_DEFAULTS = {"hnsw:M": 16, "hnsw:construction_ef": 100}
+    
+    def __init__(self, persist_directory: str = "./chroma_db", embedder=None, query_cache=None):
+        """初始化Chroma向量数据库
+        
+        embedder: 提供 embed_query / embedding_model_name / embedding_dim 的对象（UnityTextProcessor），
+                  查询向量由它生成，不再使用Chroma自带的默认嵌入模型
+        query_cache: 可选的 QueryCache，放在查询向量生成前面
+        """
         self.persist_directory = persist_directory
+        self.embedder = embedder
+        self.query_cache = query_cache
         os.makedirs(persist_directory, exist_ok=True)
         
         try:
@@ -20,89 +39,329 @@ class ChromaVectorStore:
                 settings=Settings(anonymized_telemetry=False)
             )
             self.collection = None
+            # 当前集合记录的距离空间、嵌入模型与维度
+            self.space = None
+            self.embedding_model = None
+            self.embedding_dim = None
+            # 集合内容每次变化时递增，供查询缓存判断失效
+            self.index_version = 0
+            # 元数据位图索引：过滤条件先解析为行集合；命中行少时取出这些向量做精确检索
+            self.bitmap_filter = settings.RAG_BITMAP_FILTER
+            self.metadata_index = MetadataBitmapIndex()
+            self._metadata_index_ready = False
+            # 位图索引的构建与增量维护互斥：并发的过滤查询只构建一次，写入不会与构建交错
+            self._metadata_lock = threading.RLock()
+            self._candidate_cache = TTLLRUCache(
+                max_size=settings.RAG_PREFILTER_CACHE_SIZE,
+                ttl_seconds=settings.RAG_QUERY_CACHE_TTL
+            )
             logger.info(f"✅ Chroma客户端初始化成功: {persist_directory}")
         except Exception as e:
             logger.error(f"❌ Chroma初始化失败: {e}")
             raise
     
-    def create_collection(self, collection_name: str = "unity_project"):
-        """创建或获取集合"""
+    def _embedder_signature(self) -> Dict:
+        """嵌入模型标识，写入集合元数据"""
+        if self.embedder is None:
+            return {}
+        return {
+            "embedding_model": self.embedder.embedding_model_name,
+            "embedding_dim": int(self.embedder.embedding_dim)
+        }
+    
+    def create_collection(self, collection_name: str = "unity_project",
+                          space: Optional[str] = None,
+                          hnsw_m: Optional[int] = None,
+                          construction_ef: Optional[int] = None,
+                          search_ef: Optional[int] = None):
+        """创建或获取集合
+        
+        space / hnsw_m / construction_ef / search_ef 默认取自配置，写入集合元数据。
+        集合元数据同时记录嵌入模型与维度；已有集合的模型、距离空间或建图参数（M / construction_ef）
+        与当前配置不一致时删除重建（调用方发现集合为空会完整重建索引）；
+        只有 search_ef 不同时直接修改已有集合，不必重建。
+        """
+        space = (space or settings.RAG_HNSW_SPACE).lower()
+        if space not in self.SUPPORTED_SPACES:
+            raise ValueError(f"不支持的距离空间: {space}，可选: {', '.join(self.SUPPORTED_SPACES)}")
+        hnsw_metadata = {
+            "hnsw:space": space,
+            "hnsw:M": int(hnsw_m or settings.RAG_HNSW_M),
+            "hnsw:construction_ef": int(construction_ef or settings.RAG_HNSW_CONSTRUCTION_EF),
+            "hnsw:search_ef": int(search_ef or settings.RAG_HNSW_SEARCH_EF)
+        }
+        signature = self._embedder_signature()
         try:
-            # 尝试获取现有集合
-            self.collection = self.client.get_collection(collection_name)
+            # 尝试获取现有集合（不挂载Chroma默认嵌入函数）
+            self.collection = self.client.get_collection(collection_name, embedding_function=None)
+            recorded = self.collection.metadata or {}
+            model_changed = signature and recorded.get("embedding_model") and (
+                recorded.get("embedding_model") != signature["embedding_model"]
+                or recorded.get("embedding_dim") != signature["embedding_dim"]
+            )
+            # 未记录距离空间的旧集合使用Chroma默认的l2
+            space_changed = recorded.get("hnsw:space", "l2") != space
+            build_changed = {
+                key: (recorded.get(key, default), hnsw_metadata[key])
+                for key, default in self.HNSW_BUILD_DEFAULTS.items()
+                if recorded.get(key, default) != hnsw_metadata[key]
+            }
+            if model_changed or space_changed or build_changed:
+                logger.warning(
+                    f"⚠️ 集合 {collection_name} 由 {recorded.get('embedding_model')}"
+                    f"({recorded.get('embedding_dim')}维, {recorded.get('hnsw:space', 'l2')}) 构建，"
+                    f"与当前配置不一致{f'（{build_changed}）' if build_changed else ''}，重建集合"
+                )
+                self.client.delete_collection(collection_name)
+                raise LookupError(collection_name)
+            if recorded.get("hnsw:search_ef") != hnsw_metadata["hnsw:search_ef"]:
+                self._update_search_ef(collection_name, recorded, hnsw_metadata["hnsw:search_ef"])
             logger.info(f"✅ 加载现有集合: {collection_name}")
         except Exception:
             # 创建新集合
+            metadata = {"description": "Unity project code and documentation"}
+            metadata.update(hnsw_metadata)
+            metadata.update(signature)
             self.collection = self.client.create_collection(
                 name=collection_name,
-                metadata={"description": "Unity project code and documentation"}
+                metadata=metadata,
+                embedding_function=None
+            )
+            logger.info(f"✅ 创建新集合: {collection_name} ({hnsw_metadata})")
+        
+        recorded = self.collection.metadata or {}
+        self.space = recorded.get("hnsw:space", "l2")
+        self.embedding_model = recorded.get("embedding_model") or signature.get("embedding_model")
+        self.embedding_dim = recorded.get("embedding_dim") or signature.get("embedding_dim")
+        self._reset_metadata_index()
+        self.index_version += 1
+    
+    def _update_search_ef(self, collection_name: str, recorded: Dict, search_ef: int):
+        """把新的 search_ef 写入已有集合（modify 会整体替换元数据，保留其余字段）"""
+        try:
+            self.collection.modify(metadata={**recorded, "hnsw:search_ef": search_ef})
+            self.collection = self.client.get_collection(collection_name, embedding_function=None)
+            logger.info(f"✅ 集合 {collection_name} 的 search_ef: {recorded.get('hnsw:search_ef')} -> {search_ef}")
+        except Exception as e:
+            logger.warning(f"⚠️ 无法修改集合 {collection_name} 的 search_ef（仍为 "
+                           f"{recorded.get('hnsw:search_ef')}）: {e}")
+    
+    def _reset_metadata_index(self):
+        """集合切换或删除后清空位图索引，下次过滤查询时从集合重建"""
+        with self._metadata_lock:
+            self.metadata_index = MetadataBitmapIndex()
+            self._metadata_index_ready = False
+        self._candidate_cache.clear()
+    
+    def _ensure_metadata_index(self) -> MetadataBitmapIndex:
+        """按页读取集合全部元数据构建位图索引（每个集合只做一次，之后随写入增量维护）
+
+        在锁内构建到新对象，完成后才替换 self.metadata_index，其他线程不会读到构建了一半的索引。
+        """
+        if not self._metadata_index_ready:
+            with self._metadata_lock:
+                if not self._metadata_index_ready:
+                    index = MetadataBitmapIndex()
+                    page_size = self._max_batch_size()
+                    offset = 0
+                    while True:
+                        page = self.collection.get(include=['metadatas'], limit=page_size, offset=offset)
+                        if not page['ids']:
+                            break
+                        index.add(page['ids'], page['metadatas'])
+                        offset += len(page['ids'])
+                    self.metadata_index = index
+                    self._metadata_index_ready = True
+                    logger.info(f"✅ 元数据位图索引构建完成: {len(index)} 行")
+        return self.metadata_index
+    
+    def _distance_to_score(self, distance: float) -> float:
+        """按距离空间把Chroma返回的距离换算为相似度分数
+        
+        cosine: distance = 1 - cos；ip: distance = 1 - dot；
+        l2: Chroma返回平方欧氏距离，嵌入向量已归一化时 cos = 1 - d / 2
+        """
+        if self.space == "l2":
+            return 1.0 - distance / 2.0
+        return 1.0 - distance
+    
+    def _check_query_vector(self, embedding: np.ndarray, model_name: Optional[str] = None):
+        """拒绝与集合模型或维度不匹配的查询向量"""
+        if self.embedding_dim and embedding.shape[-1] != self.embedding_dim:
+            raise ValueError(
+                f"查询向量维度 {embedding.shape[-1]} 与集合维度 {self.embedding_dim} 不匹配"
+            )
+        if model_name and self.embedding_model and model_name != self.embedding_model:
+            raise ValueError(
+                f"查询向量模型 {model_name} 与集合模型 {self.embedding_model} 不匹配"
             )
-            logger.info(f"✅ 创建新集合: {collection_name}")
     
+    def _embed_query(self, query: str) -> np.ndarray:
+        """用项目自身的嵌入模型生成查询向量（经过查询缓存）"""
+        if self.embedder is None:
+            raise RuntimeError("ChromaVectorStore 未配置 embedder，无法按文本检索")
+        if self.query_cache is not None:
+            return self.query_cache.get_embedding(query, self.embedder.embed_query, self.index_version)
+        return self.embedder.embed_query(query)
     
-    def add_documents(self, chunks, embeddings):
-        """添加文档块到向量数据库"""
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """批量生成查询向量：缓存未命中的问题合并为一次编码"""
+        if self.embedder is None:
+            raise RuntimeError("ChromaVectorStore 未配置 embedder，无法按文本检索")
+        if self.query_cache is not None:
+            return self.query_cache.get_embeddings(queries, self.embedder.embed_queries, self.index_version)
+        return self.embedder.embed_queries(queries)
+    
+    def _max_batch_size(self, batch_size: Optional[int] = None) -> int:
+        """写入批大小，不超过Chroma允许的最大批量"""
+        batch_size = batch_size or settings.RAG_WRITE_BATCH_SIZE
+        limit = None
+        try:
+            if hasattr(self.client, 'get_max_batch_size'):
+                limit = self.client.get_max_batch_size()
+            else:
+                limit = getattr(self.client, 'max_batch_size', None)
+        except Exception:
+            limit = None
+        if limit and limit > 0:
+            batch_size = min(batch_size, limit)
+        return max(1, batch_size)
+    
+    def add_documents(self, chunks, embeddings, batch_size: Optional[int] = None) -> List[str]:
+        """分批写入文档块（upsert语义，重复运行幂等）
+        
+        块ID由 文件路径 + 块区间 + 内容哈希 生成；每批只转换自己那一段嵌入向量，
+        内存占用与批大小成正比而不是与整个项目成正比。返回写入的块ID列表。
+        """
+        batch_size = self._max_batch_size(batch_size)
+        embeddings = np.asarray(embeddings)
+        written_ids = []
+        seen_ids = set()
+        batch_rows, batch_ids, batch_docs, batch_metas = [], [], [], []
+        
+        def flush():
+            if not batch_ids:
+                return
+            with self._metadata_lock:
+                self.collection.upsert(
+                    ids=batch_ids,
+                    embeddings=np.asarray(embeddings[batch_rows], dtype=np.float32).tolist(),
+                    documents=batch_docs,
+                    metadatas=batch_metas
+                )
+                if self._metadata_index_ready:
+                    self.metadata_index.add(batch_ids, batch_metas)
+            written_ids.extend(batch_ids)
+            batch_rows.clear()
+            batch_ids.clear()
+            batch_docs.clear()
+            batch_metas.clear()
+        
         try:
-            # 准备文档数据
-            documents = []
-            metadatas = []
-            ids = []
-            
             for i, chunk in enumerate(chunks):
-                # 方法1：如果 chunk 是字典
-                if isinstance(chunk, dict):
-                    text = chunk.get('text', '') or chunk.get('content', '')
-                    metadata = chunk.get('metadata', {})
-                # 方法2：如果 chunk 有 text 属性
-                elif hasattr(chunk, 'text'):
-                    text = chunk.text
-                    metadata = getattr(chunk, 'metadata', {})
-                else:
+                text, metadata, chunk_id = unpack_chunk(chunk)
+                if text is None:
                     logger.warning(f"⚠️ 无法处理的 chunk 类型: {type(chunk)}")
                     continue
-
                 if not text:
                     logger.warning(f"⚠️ 跳过空文本的 chunk {i}")
                     continue
-
-                #documents.append(chunk.text)
-                documents.append(text)
+                # 同一次调用内的重复块只写一次（Chroma不允许同批重复ID）
+                if chunk_id in seen_ids:
+                    continue
+                seen_ids.add(chunk_id)
                 
-                # 清理元数据，确保没有 None 值
-                cleaned_metadata = {}
-                #if (not isinstance(chunk, dict)) and hasattr(chunk, 'metadata'):
-                if metadata:#chunk.metadata:
-                    for key, value in metadata.items():#chunk.metadata.items():
-                        if value is not None:
-                            # 根据值的类型进行适当转换
-                            if isinstance(value, (str, int, float, bool)):
-                                cleaned_metadata[key] = value
-                            else:
-                                # 将其他类型转换为字符串
-                                cleaned_metadata[key] = str(value)
-                        else:
-                            # 对于 None 值，提供默认值或跳过
-                            cleaned_metadata[key] = ""  # 或者跳过这个字段
-                    
-                metadatas.append(cleaned_metadata)
-                ids.append(f"chunk_{i}")
-            
-            # 转换为嵌入向量列表
-            embeddings_list = embeddings.tolist()
-
-            self.collection.add(
-                embeddings=embeddings_list,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
+                batch_rows.append(i)
+                batch_ids.append(chunk_id)
+                batch_docs.append(text)
+                batch_metas.append(clean_chunk_metadata(metadata))
+                
+                if len(batch_ids) >= batch_size:
+                    flush()
+            flush()
             
-            logger.info(f"✅ 成功添加 {len(documents)} 个文档到向量数据库")
+            self._candidate_cache.clear()
+            self.index_version += 1
+            logger.info(f"✅ 成功写入 {len(written_ids)} 个文档到向量数据库 (批大小: {batch_size})")
+            return written_ids
             
         except Exception as e:
             logger.error(f"❌ 添加文档到向量数据库失败: {e}")
             raise
-
+    
+    def delete(self, ids: List[str]) -> int:
+        """按ID删除，返回实际删除的数量"""
+        if not self.collection or not ids:
+            return 0
+        try:
+            existing = self.collection.get(ids=list(ids), include=[])['ids']
+            if not existing:
+                return 0
+            with self._metadata_lock:
+                self.collection.delete(ids=existing)
+                if self._metadata_index_ready:
+                    self.metadata_index.remove(existing)
+            self._candidate_cache.clear()
+            self.index_version += 1
+            logger.info(f"🗑️ 删除 {len(existing)} 个文档")
+            return len(existing)
+        except Exception as e:
+            logger.error(f"❌ 删除文档失败: {e}")
+            raise
+    
+    def flush(self):
+        """Chroma 每次写入即持久化，无需额外操作（与其他后端的接口一致）"""
+    
+    def export_snapshot(self, path: str, extras: Optional[Dict] = None,
+                        info: Optional[Dict] = None) -> Dict:
+        """把当前集合（向量、文本、元数据）分页读出并导出为单文件快照"""
+        if not self.collection:
+            raise RuntimeError("没有打开的集合，无法导出快照")
+        ids, embeddings, documents, metadatas = [], [], [], []
+        page_size = self._max_batch_size()
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=['embeddings', 'documents', 'metadatas'], limit=page_size, offset=offset
+            )
+            if not page['ids']:
+                break
+            ids.extend(page['ids'])
+            embeddings.append(np.asarray(page['embeddings'], dtype=np.float32))
+            documents.extend(page['documents'])
+            metadatas.extend(page['metadatas'])
+            offset += len(page['ids'])
+        
+        matrix = np.vstack(embeddings) if embeddings else np.zeros((0, self.embedding_dim or 0), dtype=np.float32)
+        return write_snapshot(
+            path, ids, matrix, documents, metadatas,
+            embedding_model=self.embedding_model,
+            extras=extras,
+            info=dict(info or {}, collection=self.collection.name, space=self.space)
+        )
+    
+    def load_snapshot(self, path: str, collection_name: Optional[str] = None) -> IndexSnapshot:
+        """从快照重建集合：直接批量写入快照中的向量，不重新生成嵌入"""
+        snapshot = read_snapshot(path)
+        signature = self._embedder_signature()
+        if signature and snapshot.embedding_model and snapshot.embedding_model != signature["embedding_model"]:
+            raise ValueError(
+                f"快照由 {snapshot.embedding_model} 构建，与当前嵌入模型 {signature['embedding_model']} 不一致"
+            )
+        
+        collection_name = collection_name or snapshot.manifest.get('collection') or "unity_project"
+        # 清空旧集合，避免残留快照中已不存在的块
+        if collection_name in self.list_collections():
+            self.delete_collection(collection_name)
+        self.create_collection(collection_name)
+        chunks = [
+            {'id': chunk_id, 'content': snapshot.texts[row], 'metadata': snapshot.metadatas[row]}
+            for row, chunk_id in enumerate(snapshot.ids)
+        ]
+        self.add_documents(chunks, snapshot.embeddings)
+        logger.info(f"✅ 从快照导入集合: {collection_name} ({len(chunks)} 个向量)")
+        return snapshot
+    
     def _clean_metadata(self, metadata: Dict) -> Dict:
         """清理metadata，确保只包含ChromaDB支持的数据类型"""
         cleaned = {}
@@ -134,57 +393,184 @@ class ChromaVectorStore:
         if not self.collection:
             return []
         
+        embedding = self._embed_query(query)
+        formatted_results = self.search_by_embedding(
+            embedding,
+            n_results=n_results,
+            where_filter=where_filter,
+            model_name=self.embedder.embedding_model_name
+        )
+        logger.info(f"🔍 搜索完成: 查询='{query}', 结果数={len(formatted_results)}")
+        return formatted_results
+        
+    def search_many(self, queries: List[str], n_results: int = 5,
+                    where_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量搜索：所有问题一次编码、一次多查询调用，按输入顺序返回每个问题的结果"""
+        if not self.collection or not queries:
+            return [[] for _ in queries]
+        
+        embeddings = self._embed_queries(list(queries))
+        formatted_results = self.search_many_by_embedding(
+            embeddings,
+            n_results=n_results,
+            where_filter=where_filter,
+            model_name=self.embedder.embedding_model_name
+        )
+        logger.info(f"🔍 批量搜索完成: {len(queries)} 个查询")
+        return formatted_results
+    
+    def search_by_embedding(self, embedding: np.ndarray, n_results: int = 5,
+                            where_filter: Optional[Dict] = None,
+                            model_name: Optional[str] = None) -> List[Dict]:
+        """通过嵌入向量搜索
+        
+        model_name: 生成该向量的模型，与集合记录的模型不一致时拒绝查询
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return self.search_many_by_embedding(
+            embedding[None, :], n_results=n_results,
+            where_filter=where_filter, model_name=model_name
+        )[0]
+    
+    def search_many_by_embedding(self, embeddings: np.ndarray, n_results: int = 5,
+                                 where_filter: Optional[Dict] = None,
+                                 model_name: Optional[str] = None) -> List[List[Dict]]:
+        """批量向量搜索：一次 collection.query 调用处理所有查询向量"""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if not self.collection or not len(embeddings):
+            return [[] for _ in range(len(embeddings))]
+        
+        self._check_query_vector(embeddings, model_name)
+        
+        if where_filter and self.bitmap_filter:
+            prefiltered = self._prefiltered_search(embeddings, n_results, where_filter)
+            if prefiltered is not None:
+                return prefiltered
+        
         try:
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=embeddings.tolist(),
                 n_results=n_results,
                 where=where_filter
             )
             
             formatted_results = []
-            if results['documents'] and len(results['documents'][0]) > 0:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'distance': results['distances'][0][i] if results['distances'] else 0,
-                        'score': 1 - (results['distances'][0][i] if results['distances'] else 0)
-                    })
+            for q in range(len(embeddings)):
+                documents = results['documents'][q] if results['documents'] else []
+                formatted_results.append([
+                    {
+                        'id': results['ids'][q][i],
+                        'content': documents[i],
+                        'metadata': results['metadatas'][q][i],
+                        'distance': results['distances'][q][i],
+                        'score': self._distance_to_score(results['distances'][q][i])
+                    }
+                    for i in range(len(documents))
+                ])
             
-            logger.info(f"🔍 搜索完成: 查询='{query}', 结果数={len(formatted_results)}")
             return formatted_results
             
         except Exception as e:
-            logger.error(f"❌ 搜索失败: {e}")
-            return [] 
-        
-    def search_by_embedding(self, embedding: np.ndarray, n_results: int = 5) -> List[Dict]:
-        """通过嵌入向量搜索"""
-        if not self.collection:
-            return []
+            logger.error(f"❌ 向量搜索失败: {e}")
+            return [[] for _ in range(len(embeddings))]
+    
+    def _prefiltered_search(self, embeddings: np.ndarray, n_results: int,
+                            where_filter: Dict) -> Optional[List[List[Dict]]]:
+        """位图预过滤 + 精确检索
         
+        过滤条件无法由位图解析，或命中行数超过 RAG_PREFILTER_EXACT_MAX 时返回 None，
+        由调用方走Chroma的 where 过滤路径。
+        """
         try:
-            results = self.collection.query(
-                query_embeddings=[embedding.tolist()],
-                n_results=n_results
-            )
+            index = self._ensure_metadata_index()
+            bits = index.resolve(where_filter)
+            if bits is None:
+                return None
+            count = index.count(bits)
+            if count == 0:
+                return [[] for _ in range(len(embeddings))]
+            if count > settings.RAG_PREFILTER_EXACT_MAX:
+                return None
             
-            formatted_results = []
-            if results['documents'] and len(results['documents'][0]) > 0:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'distance': results['distances'][0][i],
-                        'score': 1 - results['distances'][0][i]
-                    })
+            ids, matrix, documents, metadatas = self._candidate_cache.get_or_compute(
+                (self.index_version, bits),
+                lambda: self._fetch_candidates(index.ids_for(bits))
+            )
+            if not ids:
+                return [[] for _ in range(len(embeddings))]
             
-            return formatted_results
+            # 与集合的距离空间保持一致的精确距离（查询数 x 候选数）
+            dots = embeddings @ matrix.T
+            if self.space == "l2":
+                distances = (
+                    (embeddings ** 2).sum(axis=1)[:, None]
+                    - 2.0 * dots
+                    + (matrix ** 2).sum(axis=1)[None, :]
+                )
+            elif self.space == "ip":
+                distances = 1.0 - dots
+            else:
+                norms = np.outer(np.linalg.norm(embeddings, axis=1), np.linalg.norm(matrix, axis=1))
+                distances = 1.0 - dots / np.maximum(norms, 1e-12)
             
+            k = min(n_results, len(ids))
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            top = np.take_along_axis(
+                top, np.argsort(np.take_along_axis(distances, top, axis=1), axis=1), axis=1
+            )
+            return [
+                [{
+                    'id': ids[row],
+                    'content': documents[row],
+                    'metadata': metadatas[row],
+                    'distance': float(distances[q, row]),
+                    'score': self._distance_to_score(float(distances[q, row]))
+                } for row in rows]
+                for q, rows in enumerate(top)
+            ]
         except Exception as e:
-            logger.error(f"❌ 向量搜索失败: {e}")
+            logger.warning(f"⚠️ 位图预过滤检索失败，回退到where过滤: {e}")
+            return None
+    
+    def _fetch_candidates(self, ids: List[str]):
+        """取回候选行的向量、文本与元数据（按Chroma返回顺序）"""
+        results = self.collection.get(ids=ids, include=['embeddings', 'documents', 'metadatas'])
+        matrix = np.asarray(results['embeddings'], dtype=np.float32)
+        return results['ids'], matrix, results['documents'], results['metadatas']
+    
+    def get_by_ids(self, ids: List[str]) -> List[Dict]:
+        """按ID批量取回文档（保持传入顺序，不存在的ID被跳过）"""
+        if not self.collection or not ids:
+            return []
+        
+        try:
+            results = self.collection.get(ids=list(ids), include=['documents', 'metadatas'])
+            by_id = {
+                doc_id: {'id': doc_id, 'content': document, 'metadata': metadata}
+                for doc_id, document, metadata in zip(
+                    results['ids'], results['documents'], results['metadatas']
+                )
+            }
+            return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+        except Exception as e:
+            logger.error(f"❌ 按ID获取文档失败: {e}")
             return []
     
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """按ID批量取回已存储的向量（不存在的ID被跳过）"""
+        if not self.collection or not ids:
+            return {}
+        
+        try:
+            results = self.collection.get(ids=list(dict.fromkeys(ids)), include=['embeddings'])
+            return {
+                doc_id: np.asarray(embedding, dtype=np.float32)
+                for doc_id, embedding in zip(results['ids'], results['embeddings'])
+            }
+        except Exception as e:
+            logger.error(f"❌ 按ID获取向量失败: {e}")
+            return {}
+    
     def get_collection_info(self) -> Dict:
         """获取集合信息"""
         if not self.collection:
@@ -195,7 +581,14 @@ class ChromaVectorStore:
             return {
                 'document_count': count,
                 'name': self.collection.name,
-                'persist_directory': self.persist_directory
+                'persist_directory': self.persist_directory,
+                'embedding_model': self.embedding_model,
+                'embedding_dim': self.embedding_dim,
+                'metadata_index': self.metadata_index.stats() if self._metadata_index_ready else None,
+                'hnsw': {
+                    key: value for key, value in (self.collection.metadata or {}).items()
+                    if key.startswith('hnsw:')
+                }
             }
         except Exception as e:
             logger.error(f"❌ 获取集合信息失败: {e}")
@@ -205,6 +598,10 @@ class ChromaVectorStore:
         """删除集合"""
         try:
             self.client.delete_collection(collection_name)
+            if self.collection is not None and self.collection.name == collection_name:
+                self.collection = None
+                self._reset_metadata_index()
+            self.index_version += 1
             logger.info(f"🗑️ 删除集合: {collection_name}")
         except Exception as e:
             logger.error(f"❌ 删除集合失败: {e}")
@@ -219,42 +616,5 @@ class ChromaVectorStore:
             return []
 
 
-# 简单的内存向量存储（备用方案）
-class SimpleVectorStore:
-    """简单的内存向量存储，用于测试或备选"""
-    
-    def __init__(self):
-        self.documents = []
-        self.embeddings = []
-        self.metadatas = []
-    
-    def add_documents(self, chunks: List[Dict], embeddings: np.ndarray):
-        """添加文档到内存存储"""
-        self.documents = [chunk['content'] for chunk in chunks]
-        self.metadatas = [chunk['metadata'] for chunk in chunks]
-        self.embeddings = embeddings.tolist()
-    
-    def search(self, query: str, n_results: int = 5, where_filter: Optional[Dict] = None) -> List[Dict]:
-        """简单搜索（基于关键词匹配）"""
-        # 这里实现简单的关键词匹配
-        # 实际使用时应该用真正的向量搜索
-        query_lower = query.lower()
-        results = []
-        
-        for i, doc in enumerate(self.documents):
-            score = 0
-            # 简单的关键词匹配评分
-            for word in query_lower.split():
-                if word in doc.lower():
-                    score += 1
-            
-            if score > 0:
-                results.append({
-                    'content': doc,
-                    'metadata': self.metadatas[i],
-                    'score': min(score / len(query.split()), 1.0)
-                })
-        
-        # 按分数排序
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:n_results]
\ No newline at end of file
+# 旧导入路径的兼容导出；不安装 chromadb 时请从 numpy_vector_store 导入
+SimpleVectorStore = numpy_vector_store.SimpleVectorStore
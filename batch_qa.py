@@ -0,0 +1,54 @@
+"""
+batch_qa.py
+----------------------------------------
+批量问答：读取问题文件（JSONL，每行 {"id", "question", "file_types"}；或每行一个问题的纯文本），
+结果逐条追加写入 JSONL（回答、来源、各阶段耗时）。中断后用同样的参数重跑，已完成的问题会被跳过。
+
+运行方式：
+  python batch_qa.py questions.jsonl answers.jsonl
+  python batch_qa.py questions.jsonl answers.jsonl --concurrency 16 --rate-limit 5
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.core.config import settings
+from app.services.batch_runner import BatchQARunner
+from app.services.unity_rag_system import UnityRAGSystem
+
+
+async def run(args) -> dict:
+    rag = UnityRAGSystem(args.project)
+    try:
+        runner = BatchQARunner(
+            rag,
+            max_concurrency=args.concurrency,
+            rate_limit=args.rate_limit,
+            batch_size=args.batch_size
+        )
+        return await runner.run(args.input, args.output, resume=not args.no_resume)
+    finally:
+        await rag.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unity项目批量问答")
+    parser.add_argument('input', help="问题文件（JSONL 或每行一个问题）")
+    parser.add_argument('output', help="结果文件（JSONL，追加写入）")
+    parser.add_argument('--project', default=settings.RAG_PROJECT_PATH)
+    parser.add_argument('--concurrency', type=int, default=settings.RAG_BATCH_CONCURRENCY,
+                        help="同时进行的大模型调用数")
+    parser.add_argument('--rate-limit', type=float, default=settings.RAG_BATCH_RATE_LIMIT,
+                        help="每秒最多发起的大模型调用数，0 表示不限")
+    parser.add_argument('--batch-size', type=int, default=settings.RAG_BATCH_SIZE,
+                        help="每批一起计算向量与检索的问题数")
+    parser.add_argument('--no-resume', action='store_true', help="忽略已有结果，从头开始（覆盖输出文件）")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+benchmarks/bench_answer_cache.py
+----------------------------------------
+语义回答缓存基准：大模型由进程内的 LLM 桩服务器模拟（固定延迟），依次
+  1. 冷启动：问一批问题，全部调用大模型并写入缓存；
+  2. 重复 + 改写：原问题再问一遍，再问一遍换了说法的版本，统计命中率与命中延迟；
+  3. 失效：把第一个问题引用的块标记为已变化，再问一次应当重新调用大模型。
+输出 命中率、避免的大模型调用数、命中 / 未命中的 p50 延迟。
+
+运行方式：
+  python benchmarks/bench_answer_cache.py --project unity_projects/ShootBubble --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+from common import project_root, percentiles, Timer
+from bench_rerank import DEFAULT_QUESTIONS
+from llm_stub_server import StubLLMServer
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+
+# 与 DEFAULT_QUESTIONS 一一对应的改写
+PARAPHRASES = [
+    "这个游戏的主要目标是什么",
+    "玩家点击气泡之后会发生什么？",
+    "Unity里控制发射泡泡的是哪个脚本？",
+    "这个游戏的代码有哪些地方需要优化？",
+    "气泡是怎样生成和销毁的？",
+    "分数在哪里计算？",
+]
+
+
+async def ask_all(rag: UnityRAGSystem, questions, hits_ms, misses_ms) -> list:
+    results = []
+    for question in questions:
+        with Timer() as t:
+            result = await rag.ask_about_unity_project(question)
+        (hits_ms if result['cached'] else misses_ms).append(t.ms)
+        results.append(result)
+    return results
+
+
+async def run(args, work_dir: str) -> dict:
+    server = StubLLMServer(latency_ms=args.latency_ms, tokens=args.tokens)
+    settings.RAG_LLM_BASE_URL = await server.start()
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, "db")
+    settings.RAG_SNAPSHOT_PATH = ""
+    settings.RAG_ANSWER_CACHE_ENABLED = True
+    settings.RAG_ANSWER_CACHE_PATH = os.path.join(work_dir, "answer_cache.sqlite3")
+    settings.RAG_ANSWER_CACHE_THRESHOLD = args.threshold
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+    rag = UnityRAGSystem(args.project)
+    await rag.initialize()
+    questions = DEFAULT_QUESTIONS[:args.questions]
+    paraphrases = PARAPHRASES[:args.questions]
+
+    cold_hits, cold_misses = [], []
+    await ask_all(rag, questions, cold_hits, cold_misses)
+
+    hits_ms, misses_ms = [], []
+    repeated = await ask_all(rag, questions, hits_ms, misses_ms)
+    rephrased = await ask_all(rag, paraphrases, hits_ms, misses_ms)
+
+    # 模拟第一个问题引用的块发生变化
+    changed = [doc['id'] for doc in (await rag.retrieve_contexts([questions[0]]))[0]]
+    invalidated = rag.answer_cache.invalidate_chunks(changed)
+    after_change = await rag.ask_about_unity_project(questions[0])
+
+    answer_stats = rag.answer_cache.stats()
+    await rag.llm_client.close()
+    await server.stop()
+
+    asked = len(questions) * 3 + 1
+    return {
+        'questions': len(questions),
+        'asked': asked,
+        'llm_latency_ms': args.latency_ms,
+        'threshold': args.threshold,
+        'repeat_hits': sum(result['cached'] for result in repeated),
+        'paraphrase_hits': sum(result['cached'] for result in rephrased),
+        'llm_requests': server.requests,
+        'llm_calls_avoided': asked - server.requests,
+        'hit_ms': percentiles(hits_ms, (50, 99)),
+        'miss_ms': percentiles(cold_misses + misses_ms, (50, 99)),
+        'invalidated_entries': invalidated,
+        'cached_after_chunk_change': after_change['cached'],
+        'answer_cache': answer_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语义回答缓存基准（本地 LLM 桩服务器）")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--questions', type=int, default=len(DEFAULT_QUESTIONS))
+    parser.add_argument('--latency-ms', type=float, default=800, help="大模型回答延迟")
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--threshold', type=float, default=settings.RAG_ANSWER_CACHE_THRESHOLD,
+                        help="问题向量的最低余弦相似度")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="answer_cache_bench_")
+    try:
+        summary = asyncio.run(run(args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+benchmarks/bench_backends.py
+----------------------------------------
+向量存储后端的一致性 + 性能套件：对每个后端（chroma / numpy）跑同一套流程
+  1. 一致性检查：upsert / delete / 过滤 / 批量检索 / get_by_ids / index_version 等协议约定
+  2. 性能：写入速率、单条查询 p50 / p99、批量查询吞吐、带过滤查询 p50 / p99、
+          常驻内存增量、recall@k（对比精确检索）
+每个后端在独立子进程中运行，内存统计互不干扰。
+
+运行方式：
+  python benchmarks/bench_backends.py --backends chroma,numpy --n 50000
+"""
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common import (synthetic_vectors, synthetic_chunks, exact_top_k, recall_at_k,
+                    percentiles, rss_mb, Timer)
+
+from app.services.chunk_utils import metadata_matches
+from app.services.query_cache import QueryCache
+from app.services.vector_backend import VectorStoreBackend, create_vector_store
+
+CONFORMANCE_FILTERS = [
+    {'file_type': 'code'},
+    {'file_type': {'$in': ['scene', 'prefab']}},
+    {'block_type': {'$ne': 'comment'}},
+    {'$and': [{'file_type': 'code'}, {'chunk_index': {'$gte': 4}}]},
+    {'$or': [{'class_name': 'Synthetic3'}, {'file_type': 'shader'}]},
+]
+
+
+# ----------------------------------------------------------------------
+# 一致性检查
+# ----------------------------------------------------------------------
+class CountingEmbedder:
+    """按文本确定性生成查询向量并统计调用次数，用于检查后端是否经过查询向量缓存"""
+
+    embedding_model_name = "conformance-counting"
+
+    def __init__(self, dim: int):
+        self.embedding_dim = dim
+        self.calls = 0
+
+    def embed_queries(self, queries):
+        self.calls += 1
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(q.encode('utf-8'))).standard_normal(self.embedding_dim)
+            for q in queries
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def embed_query(self, query):
+        return self.embed_queries([query])[0]
+
+
+def run_conformance(backend: str, dim: int = 32, n: int = 400):
+    persist_dir = tempfile.mkdtemp(prefix=f"conformance_{backend}_")
+    checks = []
+
+    def check(name, passed, detail=""):
+        checks.append({'check': name, 'passed': bool(passed), 'detail': detail})
+
+    try:
+        store = create_vector_store(backend, persist_directory=persist_dir)
+        check('protocol', isinstance(store, VectorStoreBackend))
+        store.create_collection("conformance")
+
+        vectors = synthetic_vectors(n, dim, seed=7)
+        chunks = synthetic_chunks(n, seed=7)
+        version = store.index_version
+        ids = store.add_documents(chunks, vectors)
+        check('add_returns_ids', ids == [c['id'] for c in chunks], f"{len(ids)} ids")
+        check('document_count', store.get_collection_info().get('document_count') == n)
+        check('index_version_on_add', store.index_version > version)
+
+        self_hits = [store.search_by_embedding(vectors[i], n_results=1) for i in range(0, n, 40)]
+        check('self_match', all(hits and hits[0]['id'] == f"syn-{i}"
+                                for i, hits in zip(range(0, n, 40), self_hits)))
+
+        results = store.search_by_embedding(vectors[0], n_results=10)
+        scores = [r['score'] for r in results]
+        check('scores_descending', scores == sorted(scores, reverse=True))
+        check('result_fields', all({'id', 'content', 'metadata', 'distance', 'score'} <= set(r)
+                                   for r in results))
+
+        for where in CONFORMANCE_FILTERS:
+            expected = {c['id'] for c in chunks if metadata_matches(c['metadata'], where)}
+            hits = store.search_by_embedding(vectors[1], n_results=20, where_filter=where)
+            check(f"filter {json.dumps(where)}",
+                  hits and all(h['id'] in expected for h in hits), f"{len(hits)} hits")
+
+        queries = vectors[:8]
+        batch = store.search_many_by_embedding(queries, n_results=5)
+        single = [store.search_by_embedding(q, n_results=5) for q in queries]
+        check('batch_equals_single', [[r['id'] for r in rs] for rs in batch]
+              == [[r['id'] for r in rs] for rs in single])
+
+        fetched = store.get_by_ids(['syn-5', 'missing', 'syn-2'])
+        check('get_by_ids_order', [d['id'] for d in fetched] == ['syn-5', 'syn-2'])
+        stored = store.get_embeddings(['syn-5', 'missing'])
+        check('get_embeddings', set(stored) == {'syn-5'} and float(
+            stored['syn-5'] @ vectors[5] / np.linalg.norm(stored['syn-5'])) > 0.999)
+
+        updated = dict(chunks[0], content="updated content", metadata=dict(chunks[0]['metadata'], file_type='shader'))
+        store.add_documents([updated], vectors[:1])
+        doc = store.get_by_ids(['syn-0'])
+        check('upsert_overwrites', store.get_collection_info().get('document_count') == n
+              and doc and doc[0]['content'] == "updated content"
+              and doc[0]['metadata']['file_type'] == 'shader')
+        check('upsert_reindexes_filter', any(
+            h['id'] == 'syn-0'
+            for h in store.search_by_embedding(vectors[0], n_results=3, where_filter={'file_type': 'shader'})
+        ))
+
+        version = store.index_version
+        removed = store.delete([f"syn-{i}" for i in range(10)] + ['missing'])
+        check('delete_count', removed == 10, f"removed={removed}")
+        check('delete_hides_results', all(
+            not hit['id'] in {f"syn-{i}" for i in range(10)}
+            for hit in store.search_by_embedding(vectors[3], n_results=20)
+        ))
+        check('index_version_on_delete', store.index_version > version)
+
+        store.flush()
+        reopened = create_vector_store(backend, persist_directory=persist_dir)
+        reopened.create_collection("conformance")
+        check('flush_persists', reopened.get_collection_info().get('document_count') == n - 10)
+
+        store.delete_collection("conformance")
+        check('delete_collection', "conformance" not in store.list_collections())
+
+        # 工厂传入的查询缓存对每个后端都生效：重复的问题不再调用嵌入模型
+        embedder = CountingEmbedder(dim)
+        cached = create_vector_store(backend, persist_directory=persist_dir,
+                                     embedder=embedder, query_cache=QueryCache())
+        cached.create_collection("conformance_cache")
+        cached.add_documents(chunks[:50], vectors[:50])
+        first = cached.search("PlayerController Update", n_results=5)
+        calls = embedder.calls
+        again = cached.search("PlayerController  Update ", n_results=5)
+        cached.search_many(["PlayerController Update"], n_results=5)
+        check('query_cache_reused', calls == 1 and embedder.calls == calls
+              and [r['id'] for r in first] == [r['id'] for r in again],
+              f"embedder calls={embedder.calls}")
+
+        # 集合记录构建时的嵌入模型：查询向量按记录的模型校验，换模型重新打开时重建
+        try:
+            cached.search_by_embedding(vectors[0], n_results=1, model_name="other-model")
+            check('rejects_other_model', False)
+        except ValueError:
+            check('rejects_other_model', True)
+        cached.flush()
+        other = CountingEmbedder(dim)
+        other.embedding_model_name = "conformance-other"
+        reopened = create_vector_store(backend, persist_directory=persist_dir, embedder=other)
+        reopened.create_collection("conformance_cache")
+        info = reopened.get_collection_info()
+        check('model_change_rebuilds', info.get('document_count') == 0
+              and info.get('embedding_model') == "conformance-other", json.dumps(info, default=str))
+        reopened.delete_collection("conformance_cache")
+    except Exception as e:
+        check('exception', False, repr(e))
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+    return checks
+
+
+# ----------------------------------------------------------------------
+# 性能
+# ----------------------------------------------------------------------
+def run_performance(backend: str, n: int, dim: int, n_queries: int, k: int, batch: int):
+    corpus = synthetic_vectors(n, dim, seed=0)
+    queries = synthetic_vectors(n_queries, dim, seed=1)
+    chunks = synthetic_chunks(n)
+    truth = exact_top_k(corpus, queries, k)
+    where = {'file_type': 'shader'}
+
+    persist_dir = tempfile.mkdtemp(prefix=f"perf_{backend}_")
+    try:
+        store = create_vector_store(backend, persist_directory=persist_dir)
+        store.create_collection("perf")
+        rss_before = rss_mb()
+        with Timer() as ingest:
+            store.add_documents(chunks, corpus)
+            store.flush()
+        rss_after = rss_mb()
+
+        latencies, retrieved = [], []
+        for query in queries:
+            with Timer() as t:
+                results = store.search_by_embedding(query, n_results=k)
+            latencies.append(t.ms)
+            retrieved.append([int(r['id'].split('-')[1]) for r in results])
+
+        with Timer() as batched:
+            for start in range(0, n_queries, batch):
+                store.search_many_by_embedding(queries[start:start + batch], n_results=k)
+
+        filtered = []
+        for query in queries:
+            with Timer() as t:
+                store.search_by_embedding(query, n_results=k, where_filter=where)
+            filtered.append(t.ms)
+
+        return {
+            'n': n,
+            'dim': dim,
+            'ingest_docs_per_s': round(n / max(ingest.ms / 1000, 1e-9), 1),
+            'query': percentiles(latencies, (50, 99)),
+            'batch_queries_per_s': round(n_queries / max(batched.ms / 1000, 1e-9), 1),
+            'filtered_query': percentiles(filtered, (50, 99)),
+            'rss_delta_mb': round(rss_after - rss_before, 1),
+            f'recall@{k}': round(recall_at_k(retrieved, truth.tolist(), k), 4)
+        }
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def run_backend(backend: str, args_dict: dict) -> dict:
+    report = {'backend': backend}
+    try:
+        report['conformance'] = run_conformance(backend)
+        report['performance'] = run_performance(
+            backend, args_dict['n'], args_dict['dim'], args_dict['queries'],
+            args_dict['k'], args_dict['batch']
+        )
+    except Exception as e:
+        report['error'] = repr(e)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储后端一致性与性能套件")
+    parser.add_argument('--backends', default='chroma,numpy')
+    parser.add_argument('--n', type=int, default=50000, help="语料向量数")
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=32, help="批量查询每批的查询数")
+    parser.add_argument('--no-isolate', action='store_true', help="在当前进程内运行（不隔离内存统计）")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    reports = []
+    for backend in args.backends.split(','):
+        print(f"🧪 后端: {backend}")
+        if args.no_isolate:
+            report = run_backend(backend, vars(args))
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                report = pool.submit(run_backend, backend, vars(args)).result()
+        reports.append(report)
+
+        failed = [c for c in report.get('conformance', []) if not c['passed']]
+        print(f"  一致性: {len(report.get('conformance', [])) - len(failed)} 通过, {len(failed)} 失败")
+        for c in failed:
+            print(f"  ❌ {c['check']} {c['detail']}")
+        if 'performance' in report:
+            print(f"  性能: {json.dumps(report['performance'], ensure_ascii=False)}")
+        if 'error' in report:
+            print(f"  ❌ {report['error']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': reports}, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+benchmarks/bench_batch_qa.py
+----------------------------------------
+批量问答基准：大模型由进程内的 LLM 桩服务器模拟（固定延迟），对同一组问题
+  1. 逐个调用 ask_about_unity_project（test_unity_rag.py 的做法）；
+  2. BatchQARunner：批量计算向量、相似问题共用检索、大模型调用有界并发；
+  3. 中断续跑：运行到一半时取消，再以同一输出文件重跑，检查每个问题恰好成功一次。
+输出 两种方式的吞吐、省掉的检索次数、单题耗时分位数与续跑检查结果。
+回答缓存关闭，只比较执行方式本身。
+
+运行方式：
+  python benchmarks/bench_batch_qa.py --project unity_projects/ShootBubble --questions 96 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+from common import project_root, Timer
+from bench_rerank import DEFAULT_QUESTIONS
+from bench_answer_cache import PARAPHRASES
+from llm_stub_server import StubLLMServer
+
+from app.core.config import settings
+from app.services.batch_runner import BatchQARunner
+from app.services.unity_rag_system import UnityRAGSystem
+
+
+def write_questions(path: str, n: int) -> list:
+    """原问题与改写循环使用，每行一个独立ID（重复的问题模拟批量审计里的相似提问）"""
+    pool = DEFAULT_QUESTIONS + PARAPHRASES
+    items = [{'id': f"q{i:04d}", 'question': pool[i % len(pool)]} for i in range(n)]
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+    return items
+
+
+def read_records(path: str) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def interrupted_run(rag: UnityRAGSystem, args, input_path: str, output_path: str) -> dict:
+    """写出约一半结果后取消，再续跑到结束"""
+    runner = BatchQARunner(rag, max_concurrency=args.concurrency, batch_size=args.batch_size)
+    task = asyncio.create_task(runner.run(input_path, output_path, resume=False))
+    while runner.progress['done'] + runner.progress['failed'] < args.questions // 2:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    written_before = len(read_records(output_path))
+
+    resumed = await BatchQARunner(rag, max_concurrency=args.concurrency, batch_size=args.batch_size).run(
+        input_path, output_path
+    )
+    ok_counts = Counter(record['id'] for record in read_records(output_path) if record['status'] == 'ok')
+    return {
+        'written_before_interrupt': written_before,
+        'skipped_on_resume': resumed['skipped'],
+        'processed_on_resume': resumed['processed'],
+        'all_answered': len(ok_counts) == args.questions,
+        'answered_twice': sum(1 for count in ok_counts.values() if count > 1)
+    }
+
+
+async def run(args, work_dir: str) -> dict:
+    server = StubLLMServer(latency_ms=args.latency_ms, tokens=args.tokens)
+    settings.RAG_LLM_BASE_URL = await server.start()
+    settings.RAG_LLM_MAX_CONCURRENCY = max(settings.RAG_LLM_MAX_CONCURRENCY, args.concurrency)
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, "db")
+    settings.RAG_SNAPSHOT_PATH = ""
+    settings.RAG_ANSWER_CACHE_ENABLED = False
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+    rag = UnityRAGSystem(args.project)
+    await rag.initialize()
+    input_path = os.path.join(work_dir, "questions.jsonl")
+    items = write_questions(input_path, args.questions)
+
+    sequential_questions = items[:args.sequential]
+    with Timer() as sequential:
+        for item in sequential_questions:
+            await rag.ask_about_unity_project(item['question'])
+    sequential_qps = len(sequential_questions) / (sequential.ms / 1000)
+
+    requests_before = server.requests
+    runner = BatchQARunner(rag, max_concurrency=args.concurrency, batch_size=args.batch_size)
+    batch = await runner.run(input_path, os.path.join(work_dir, "answers.jsonl"), resume=False)
+    batch_requests = server.requests - requests_before
+    max_in_flight = server.max_in_flight
+
+    resume = await interrupted_run(rag, args, input_path, os.path.join(work_dir, "resumed.jsonl"))
+    await rag.close()
+    await server.stop()
+
+    return {
+        'questions': args.questions,
+        'llm_latency_ms': args.latency_ms,
+        'concurrency': args.concurrency,
+        'batch_size': args.batch_size,
+        'sequential': {
+            'questions': len(sequential_questions),
+            'questions_per_s': round(sequential_qps, 2),
+            'estimated_total_s': round(args.questions / sequential_qps, 2)
+        },
+        'batch': batch,
+        'batch_llm_requests': batch_requests,
+        'speedup': round(batch['questions_per_s'] / sequential_qps, 2) if sequential_qps else 0.0,
+        'llm_max_in_flight': max_in_flight,
+        'resume': resume
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量问答基准（本地 LLM 桩服务器）")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--questions', type=int, default=96)
+    parser.add_argument('--sequential', type=int, default=12, help="逐个提问的基线只跑前N个问题，再按吞吐折算")
+    parser.add_argument('--concurrency', type=int, default=settings.RAG_BATCH_CONCURRENCY)
+    parser.add_argument('--batch-size', type=int, default=settings.RAG_BATCH_SIZE)
+    parser.add_argument('--latency-ms', type=float, default=400, help="大模型回答延迟")
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="batch_qa_bench_")
+    try:
+        summary = asyncio.run(run(args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
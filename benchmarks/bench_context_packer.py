@@ -0,0 +1,146 @@
+"""
+benchmarks/bench_context_packer.py
+----------------------------------------
+上下文打包基准：对同一批问题的同一组检索结果，分别构建
+  legacy : 原有提示词（每块截断到600字符、缩进模板、重叠部分重复发送）
+  packed : ContextPacker 按 --budget token 预算打包（合并重叠块、去重、压缩缩进）
+统计提示词 token 数、实际送入的内容字符数、保留的块 / 文件覆盖率、合并与丢弃的段数，以及打包耗时；
+并检查极小预算（--tiny-budget）下排名第一的块仍被保留。
+
+运行方式：
+  python benchmarks/bench_context_packer.py --project unity_projects/ShootBubble --budgets 800,1500,3000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+import numpy as np
+
+from common import project_root, percentiles, Timer
+from bench_rerank import load_questions
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+from app.services.context_packer import ContextPacker
+from app.services.token_counter import estimate_tokens
+
+
+def legacy_prompt(rag: UnityRAGSystem, question: str, docs) -> str:
+    """打包之前的提示词模板（保留用于对比）"""
+    context_parts = []
+    for i, doc in enumerate(docs):
+        metadata = doc['metadata']
+        context_parts.append(f"""
+            ## 来源 {i+1} [{metadata['file_type']}] (相关性: {doc['score']:.2f})
+            **文件**: {metadata['file_path']}
+            **类型**: {metadata['file_type']} / {metadata.get('block_type', 'N/A')}
+            
+
+            ```{rag._get_code_language(metadata['file_type'])}
+            {doc['content'][:600]}
+            """)
+    context_str = '\n'.join(context_parts)
+    return f"""
+        Unity项目智能分析
+        项目上下文
+        {context_str}
+
+        用户问题
+        {question}
+
+        回答要求
+        你是一个资深的Unity开发专家，基于以上Unity项目代码和资源文件回答用户问题。
+
+        请重点关注：
+
+        Unity最佳实践 - 性能优化、内存管理
+
+        架构设计 - MonoBehaviour使用、组件通信
+
+        资源管理 - 预制体、场景、材质的使用
+
+        平台特性 - 移动端、PC端优化差异
+
+        请提供具体、可操作的Unity开发建议。
+        """
+
+
+async def run(args):
+    rag = UnityRAGSystem(args.project)
+    await rag.initialize()
+    questions = load_questions(args.questions)
+    contexts = await rag.retrieve_contexts(questions)
+    budgets = [int(value) for value in args.budgets.split(',')]
+
+    legacy_tokens = [estimate_tokens(legacy_prompt(rag, q, docs)) for q, docs in zip(questions, contexts)]
+    # 原模板实际送入的代码 / 资源内容（每块前600字符，重叠部分重复计入）
+    legacy_chars = [sum(len(doc['content'][:600].strip()) for doc in docs) for docs in contexts]
+    summary = {
+        'questions': len(questions),
+        'avg_chunks': round(float(np.mean([len(docs) for docs in contexts])), 2),
+        'legacy': {
+            'avg_tokens': round(float(np.mean(legacy_tokens)), 1),
+            'avg_context_chars': round(float(np.mean(legacy_chars)), 1)
+        },
+        'packed': {}
+    }
+
+    for budget in budgets:
+        rag.context_packer = ContextPacker(token_budget=budget, language_of=rag._get_code_language)
+        tokens, chars, chunk_coverage, file_coverage, latencies = [], [], [], [], []
+        for question, docs in zip(questions, contexts):
+            with Timer() as t:
+                packed = rag.context_packer.pack(docs)
+            latencies.append(t.ms)
+            chars.append(packed['chars'])
+            tokens.append(estimate_tokens(rag._build_unity_prompt(question, docs)))
+            if docs:
+                kept = set(packed['ids'])
+                chunk_coverage.append(sum(doc['id'] in kept for doc in docs) / len(docs))
+                files = {doc['metadata']['file_path'] for doc in docs}
+                kept_files = {doc['metadata']['file_path'] for doc in docs if doc['id'] in kept}
+                file_coverage.append(len(kept_files) / len(files))
+        stats = rag.context_packer.stats()
+        summary['packed'][str(budget)] = {
+            'avg_tokens': round(float(np.mean(tokens)), 1),
+            'token_savings': round(1 - sum(tokens) / max(1, sum(legacy_tokens)), 4),
+            'avg_context_chars': round(float(np.mean(chars)), 1),
+            'chunk_coverage': round(float(np.mean(chunk_coverage)), 4) if chunk_coverage else 0.0,
+            'file_coverage': round(float(np.mean(file_coverage)), 4) if file_coverage else 0.0,
+            'merged_chunks': stats['merged_chunks'] // 2,
+            'dropped_segments': stats['dropped_segments'] // 2,
+            'truncated_segments': stats['truncated_segments'] // 2,
+            'pack_latency': percentiles(latencies, (50, 99))
+        }
+
+    # 极小预算（比标题 + 代码块框架还小）：排名第一的块仍应保留，且不被后面的小段挤掉
+    tiny = ContextPacker(token_budget=args.tiny_budget, language_of=rag._get_code_language)
+    top_kept = [docs[0]['id'] in tiny.pack(docs)['ids'] for docs in contexts if docs]
+    summary['tiny_budget'] = {
+        'budget': args.tiny_budget,
+        'top_chunk_kept': round(sum(top_kept) / len(top_kept), 4) if top_kept else None
+    }
+    if top_kept and not all(top_kept):
+        print(f"❌ 预算 {args.tiny_budget} 时有 {len(top_kept) - sum(top_kept)} 个问题丢掉了排名第一的块")
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词上下文打包基准")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--questions', help="问题文件（每行一个问题，或JSONL的question字段）")
+    parser.add_argument('--budgets', default=str(settings.RAG_CONTEXT_TOKEN_BUDGET), help="逗号分隔的 token 预算")
+    parser.add_argument('--tiny-budget', type=int, default=8, help="检查最相关的块始终保留时使用的极小预算")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
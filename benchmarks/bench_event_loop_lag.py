@@ -0,0 +1,120 @@
+"""
+benchmarks/bench_event_loop_lag.py
+----------------------------------------
+事件循环延迟基准：C 个协程并发检索时，探针协程每隔 interval 毫秒醒来一次，
+实际醒来时间与预期的差值即事件循环延迟（lag）。
+
+两种模式：
+  sync   协程里直接调用阻塞的 store.search_by_embedding（改造前的做法）
+  async  经由 BoundedExecutor.run 在线程池中执行（与 UnityRAGSystem 的调用方式相同）
+输出 lag p50 / p99 / max、检索吞吐，以及线程池的队列深度统计。
+
+运行方式：
+  python benchmarks/bench_event_loop_lag.py --n 50000 --concurrency 32 --requests 400
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+
+from common import synthetic_vectors, synthetic_chunks, percentiles
+
+from app.services.async_executor import BoundedExecutor
+from app.services.vector_backend import create_vector_store
+
+
+async def probe_lag(interval_ms: float, samples: list, stop: asyncio.Event):
+    """按固定间隔休眠，记录每次醒来比预期晚了多少毫秒"""
+    interval = interval_ms / 1000
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (time.perf_counter() - expected) * 1000))
+
+
+async def run_mode(mode: str, store, queries, concurrency: int, requests: int, k: int,
+                   workers: int, queue: int, interval_ms: float) -> dict:
+    executor = BoundedExecutor(max_workers=workers, max_queue=queue, name=f"bench-{mode}")
+    lag_samples = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(interval_ms, lag_samples, stop))
+    await asyncio.sleep(interval_ms / 1000 * 2)  # 先采集几次空载基线
+
+    counter = iter(range(requests))
+
+    async def client():
+        for i in counter:
+            query = queries[i % len(queries)]
+            if mode == "sync":
+                store.search_by_embedding(query, n_results=k)
+                await asyncio.sleep(0)  # 让出一次控制权，和真实的 await 链路一致
+            else:
+                await executor.run(store.search_by_embedding, query, k)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    executor_stats = executor.stats()
+    executor.shutdown()
+    return {
+        'mode': mode,
+        'requests': requests,
+        'concurrency': concurrency,
+        'queries_per_s': round(requests / max(elapsed, 1e-9), 1),
+        'lag_ms': {**percentiles(lag_samples, (50, 99)), 'max': round(max(lag_samples, default=0.0), 2)},
+        'lag_samples': len(lag_samples),
+        'executor': executor_stats if mode == "async" else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发检索下的事件循环延迟基准")
+    parser.add_argument('--backend', default='numpy')
+    parser.add_argument('--n', type=int, default=50000, help="语料向量数")
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=32, help="并发检索的协程数")
+    parser.add_argument('--requests', type=int, default=400, help="检索请求总数")
+    parser.add_argument('--workers', type=int, default=4, help="线程池大小")
+    parser.add_argument('--queue', type=int, default=64, help="线程池最大排队数")
+    parser.add_argument('--interval-ms', type=float, default=10.0, help="探针休眠间隔")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    persist_dir = tempfile.mkdtemp(prefix="lag_bench_")
+    try:
+        store = create_vector_store(args.backend, persist_directory=persist_dir)
+        store.create_collection("lag")
+        store.add_documents(synthetic_chunks(args.n), synthetic_vectors(args.n, args.dim, seed=0))
+        queries = synthetic_vectors(256, args.dim, seed=1)
+
+        results = []
+        for mode in ("sync", "async"):
+            result = asyncio.run(run_mode(
+                mode, store, queries, args.concurrency, args.requests, args.k,
+                args.workers, args.queue, args.interval_ms
+            ))
+            results.append(result)
+            print(f"⏱️ {mode:5s} 吞吐 {result['queries_per_s']}/s, "
+                  f"lag p50 {result['lag_ms']['p50']}ms / p99 {result['lag_ms']['p99']}ms / "
+                  f"max {result['lag_ms']['max']}ms")
+            if result['executor']:
+                print(f"   线程池: {json.dumps(result['executor'], ensure_ascii=False)}")
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'backend': args.backend, 'n': args.n, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+benchmarks/bench_hnsw_tuning.py
+----------------------------------------
+HNSW 参数调优基准：在合成大语料上扫描 space / M / construction_ef / search_ef，
+对比精确检索计算 recall@k，并统计单条查询的 p50 / p99 延迟。
+
+运行方式：
+  python benchmarks/bench_hnsw_tuning.py --n 50000 --m 8,16,32 --search-ef 16,64,128
+"""
+
+import argparse
+import itertools
+import json
+import shutil
+import tempfile
+
+from common import synthetic_vectors, synthetic_chunks, exact_top_k, recall_at_k, percentiles, Timer
+
+from app.services.vector_store import ChromaVectorStore
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(',') if v]
+
+
+def run_config(corpus, chunks, queries, truth, k, space, m, construction_ef, search_ef):
+    persist_dir = tempfile.mkdtemp(prefix="hnsw_bench_")
+    try:
+        store = ChromaVectorStore(persist_directory=persist_dir)
+        store.create_collection(
+            "bench", space=space, hnsw_m=m,
+            construction_ef=construction_ef, search_ef=search_ef
+        )
+        with Timer() as ingest:
+            store.add_documents(chunks, corpus)
+
+        latencies, retrieved = [], []
+        for query in queries:
+            with Timer() as t:
+                results = store.search_by_embedding(query, n_results=k)
+            latencies.append(t.ms)
+            retrieved.append([int(r['id'].split('-')[1]) for r in results])
+
+        return {
+            'space': space,
+            'M': m,
+            'construction_ef': construction_ef,
+            'search_ef': search_ef,
+            'ingest_s': round(ingest.ms / 1000, 2),
+            f'recall@{k}': round(recall_at_k(retrieved, truth.tolist(), k), 4),
+            **percentiles(latencies, (50, 99))
+        }
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW 参数调优基准")
+    parser.add_argument('--n', type=int, default=50000, help="语料向量数")
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--space', default='cosine', help="逗号分隔: cosine,ip,l2")
+    parser.add_argument('--m', type=_int_list, default=[8, 16, 32])
+    parser.add_argument('--construction-ef', type=_int_list, default=[100, 200])
+    parser.add_argument('--search-ef', type=_int_list, default=[16, 64, 128])
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    print(f"🧪 生成合成语料: {args.n} x {args.dim}")
+    corpus = synthetic_vectors(args.n, args.dim, seed=0)
+    queries = synthetic_vectors(args.queries, args.dim, seed=1)
+    chunks = synthetic_chunks(args.n)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    rows = []
+    for space, m, cef, sef in itertools.product(
+        args.space.split(','), args.m, args.construction_ef, args.search_ef
+    ):
+        row = run_config(corpus, chunks, queries, truth, args.k, space, m, cef, sef)
+        rows.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'n': args.n, 'dim': args.dim, 'k': args.k, 'results': rows}, f, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+benchmarks/bench_llm_client.py
+----------------------------------------
+大模型客户端基准：在进程内启动 LLM 桩服务器，对同一批请求比较
+  sequential : 逐个 await（原来同步客户端的效果）
+  concurrent : asyncio.gather 并发，由 AsyncLLMClient 的信号量限流
+统计总耗时、请求 p50 / p99、重试次数、桩服务器观察到的最大并发；
+--fail-rate / --rate-limit-rate 注入错误验证抖动退避重试，
+--timeout 小于 --latency-ms 时验证超时。
+
+运行方式：
+  python benchmarks/bench_llm_client.py --requests 32 --latency-ms 300 --concurrency 8 --fail-rate 0.1
+"""
+
+import argparse
+import asyncio
+import json
+
+from common import percentiles, Timer
+from llm_stub_server import StubLLMServer
+
+from app.core.config import settings
+from app.services.llm_client import AsyncLLMClient, LLMError
+
+
+async def timed_call(client: AsyncLLMClient, prompt: str, latencies: list):
+    with Timer() as t:
+        try:
+            await client.complete(prompt)
+            ok = True
+        except LLMError:
+            ok = False
+    latencies.append(t.ms)
+    return ok
+
+
+async def run_mode(mode: str, args) -> dict:
+    server = StubLLMServer(args.latency_ms, args.fail_rate, args.rate_limit_rate, seed=1)
+    base_url = await server.start()
+    client = AsyncLLMClient(api_key="stub", base_url=base_url, timeout=args.timeout,
+                            max_concurrency=args.concurrency)
+    prompts = [f"问题 {i}: 玩家点击气泡后会发生什么？" for i in range(args.requests)]
+    latencies = []
+    try:
+        with Timer() as total:
+            if mode == "sequential":
+                outcomes = [await timed_call(client, p, latencies) for p in prompts]
+            else:
+                outcomes = await asyncio.gather(*(timed_call(client, p, latencies) for p in prompts))
+    finally:
+        await client.close()
+        await server.stop()
+
+    return {
+        'mode': mode,
+        'requests': args.requests,
+        'succeeded': sum(outcomes),
+        'total_s': round(total.ms / 1000, 3),
+        'latency': percentiles(latencies, (50, 99)),
+        'client': client.stats(),
+        'server': server.stats()
+    }
+
+
+async def run(args):
+    results = [await run_mode(mode, args) for mode in ("sequential", "concurrent")]
+    for result in results:
+        print(f"🤖 {result['mode']:10s} 成功 {result['succeeded']}/{result['requests']}, "
+              f"总耗时 {result['total_s']}s, 重试 {result['client']['retries']}, "
+              f"服务端最大并发 {result['server']['max_in_flight']}")
+    summary = {
+        'latency_ms': args.latency_ms,
+        'concurrency': args.concurrency,
+        'speedup': round(results[0]['total_s'] / max(results[1]['total_s'], 1e-6), 1),
+        'results': results
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步大模型客户端基准（本地桩服务器）")
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--concurrency', type=int, default=settings.RAG_LLM_MAX_CONCURRENCY)
+    parser.add_argument('--timeout', type=float, default=settings.RAG_LLM_TIMEOUT)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
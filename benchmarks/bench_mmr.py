@@ -0,0 +1,119 @@
+"""
+benchmarks/bench_mmr.py
+----------------------------------------
+MMR 选择基准：同一批问题分别走
+  baseline : 直接取检索结果前 --baseline-n 个块（原有做法）
+  mmr      : 取 --pool 个候选，按 MMR / 单文件上限选出 --n 个
+统计提示词 token 数（节省比例）、覆盖的不同文件数、块之间的平均两两余弦相似度（冗余度），
+以及 MMR 选择本身的耗时。可用 --lambdas 同时比较多个多样性权重。
+
+运行方式：
+  python benchmarks/bench_mmr.py --project unity_projects/ShootBubble --pool 20 --n 6 --lambdas 0.5,0.7,1.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+import numpy as np
+
+from common import project_root, percentiles, Timer
+from bench_rerank import load_questions
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+from app.services.token_counter import estimate_tokens
+
+
+def redundancy(docs, embeddings_by_id) -> float:
+    """块之间的平均两两余弦相似度"""
+    vectors = [embeddings_by_id[doc['id']] for doc in docs if doc['id'] in embeddings_by_id]
+    if len(vectors) < 2:
+        return 0.0
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    similarity = matrix @ matrix.T
+    upper = similarity[np.triu_indices(len(vectors), k=1)]
+    return round(float(upper.mean()), 4)
+
+
+def describe(question, docs, rag, embeddings_by_id) -> dict:
+    return {
+        'tokens': estimate_tokens(rag._build_unity_prompt(question, docs)),
+        'chunks': len(docs),
+        'files': len({doc['metadata']['file_path'] for doc in docs}),
+        'redundancy': redundancy(docs, embeddings_by_id)
+    }
+
+
+async def run(args):
+    rag = UnityRAGSystem(args.project)
+    await rag.initialize()
+    questions = load_questions(args.questions)
+    lambdas = [float(value) for value in args.lambdas.split(',')]
+
+    baselines = rag._retrieve_many(questions, n_results=args.baseline_n)
+    pools = rag._retrieve_many(questions, n_results=args.pool)
+    ids = list(dict.fromkeys(doc['id'] for docs in baselines + pools for doc in docs))
+    embeddings_by_id = rag.vector_store.get_embeddings(ids)
+
+    rows = []
+    for question, docs in zip(questions, baselines):
+        rows.append({'question': question, 'baseline': describe(question, docs, rag, embeddings_by_id)})
+
+    summary = {
+        'questions': len(questions),
+        'baseline_n': args.baseline_n,
+        'pool': args.pool,
+        'n': args.n,
+        'per_file_cap': settings.RAG_MMR_PER_FILE_CAP,
+        'baseline': {
+            'avg_tokens': round(float(np.mean([r['baseline']['tokens'] for r in rows])), 1),
+            'avg_files': round(float(np.mean([r['baseline']['files'] for r in rows])), 2),
+            'avg_redundancy': round(float(np.mean([r['baseline']['redundancy'] for r in rows])), 4)
+        },
+        'mmr': {}
+    }
+    baseline_total = sum(r['baseline']['tokens'] for r in rows)
+    for lambda_mult in lambdas:
+        latencies = []
+        for row, question, pool in zip(rows, questions, pools):
+            with Timer() as t:
+                selected = rag._diversify_many([pool], top_n=args.n, lambda_mult=lambda_mult)[0]
+            latencies.append(t.ms)
+            row[f"mmr_{lambda_mult}"] = describe(question, selected, rag, embeddings_by_id)
+        variant = [row[f"mmr_{lambda_mult}"] for row in rows]
+        total = sum(v['tokens'] for v in variant)
+        summary['mmr'][str(lambda_mult)] = {
+            'avg_tokens': round(total / max(1, len(variant)), 1),
+            'token_savings': round(1 - total / max(1, baseline_total), 4),
+            'avg_files': round(float(np.mean([v['files'] for v in variant])), 2),
+            'avg_redundancy': round(float(np.mean([v['redundancy'] for v in variant])), 4),
+            'select_latency': percentiles(latencies, (50, 99))
+        }
+
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'results': rows}, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MMR 上下文选择基准")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--questions', help="问题文件（每行一个问题，或JSONL的question字段）")
+    parser.add_argument('--baseline-n', type=int, default=10)
+    parser.add_argument('--pool', type=int, default=settings.RAG_MMR_CANDIDATES, help="MMR 候选池大小")
+    parser.add_argument('--n', type=int, default=settings.RAG_MMR_TOP_N, help="MMR 选出的块数")
+    parser.add_argument('--lambdas', default=str(settings.RAG_MMR_LAMBDA), help="逗号分隔的多样性权重")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
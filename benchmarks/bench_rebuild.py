@@ -0,0 +1,113 @@
+"""
+benchmarks/bench_rebuild.py
+----------------------------------------
+单飞初始化与后台重建基准：
+  1. 冷启动时同时发起 --concurrency 个提问，统计实际执行的项目加载次数（应为1）与各请求耗时；
+  2. 后台重建索引期间持续提问，对比重建前后与重建期间的检索延迟，统计失败数，
+     以及切换前后各请求落在哪个集合上。
+大模型走本地模拟回答（不设置 API Key），只衡量检索与索引部分。
+
+运行方式：
+  python benchmarks/bench_rebuild.py --project unity_projects/ShootBubble --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+from common import project_root, percentiles, Timer
+from bench_rerank import DEFAULT_QUESTIONS
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+
+
+async def timed_ask(rag: UnityRAGSystem, question: str) -> float:
+    with Timer() as t:
+        await rag.ask_about_unity_project(question)
+    return t.ms
+
+
+async def run(args, work_dir: str) -> dict:
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, "db")
+    settings.RAG_SNAPSHOT_PATH = ""
+    settings.RAG_ANSWER_CACHE_ENABLED = False
+    rag = UnityRAGSystem(args.project)
+
+    loads = 0
+    load_project = rag.loader.load_unity_project
+
+    def counted_load():
+        nonlocal loads
+        loads += 1
+        return load_project()
+
+    rag.loader.load_unity_project = counted_load
+
+    questions = [DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)] for i in range(args.concurrency)]
+    cold = await asyncio.gather(*[timed_ask(rag, question) for question in questions])
+    cold_loads = loads
+
+    idle = [await timed_ask(rag, question) for question in DEFAULT_QUESTIONS]
+
+    task = await rag.reinitialize(background=True)
+    during, collections, errors = [], [], 0
+    i = 0
+    while not task.done():
+        try:
+            during.append(await timed_ask(rag, DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)]))
+            collections.append(rag.collection_name)
+        except Exception:
+            errors += 1
+        i += 1
+        await asyncio.sleep(args.interval_ms / 1000)
+    with Timer() as wait:
+        await task
+    after = [await timed_ask(rag, question) for question in DEFAULT_QUESTIONS]
+
+    return {
+        'concurrency': args.concurrency,
+        'cold_start': {'project_loads': cold_loads, 'latency_ms': percentiles(cold, (50, 99))},
+        'idle_ms': percentiles(idle, (50, 99)),
+        'during_rebuild': {
+            'queries': len(during),
+            'errors': errors,
+            'served_from': sorted(set(collections)),
+            'latency_ms': percentiles(during, (50, 99)),
+            'final_wait_ms': round(wait.ms, 3)
+        },
+        'after_rebuild_ms': percentiles(after, (50, 99)),
+        'collection': rag.collection_name,
+        'index_generation': rag.index_generation,
+        'project_loads': loads
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单飞初始化与后台重建基准")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--concurrency', type=int, default=8, help="冷启动时同时发起的提问数")
+    parser.add_argument('--interval-ms', type=float, default=20, help="重建期间两次提问的间隔")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    os.environ.pop('OPENAI_API_KEY', None)
+    os.environ.pop('LLM_API_KEY', None)
+    work_dir = tempfile.mkdtemp(prefix="rebuild_bench_")
+    try:
+        summary = asyncio.run(run(args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
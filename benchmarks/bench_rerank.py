@@ -0,0 +1,109 @@
+"""
+benchmarks/bench_rerank.py
+----------------------------------------
+重排阶段基准：同一批问题分别走
+  baseline : 直接取第一阶段前 --baseline-n 个块
+  rerank   : 第一阶段多取 K 个候选，交叉编码器重排后取前 N 个
+统计提示词 token 数（节省比例）和重排延迟 p50 / p99。
+
+需要安装 sentence-transformers；未安装时只输出 baseline 的 token 数。
+
+运行方式：
+  python benchmarks/bench_rerank.py --project unity_projects/ShootBubble --k 30 --n 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+from common import project_root, percentiles, Timer
+
+from app.services.unity_rag_system import UnityRAGSystem
+from app.services.reranker import CrossEncoderReranker
+from app.services.token_counter import estimate_tokens
+
+DEFAULT_QUESTIONS = [
+    "这个游戏的主要目标是什么？",
+    "玩家点击气泡后会发生什么？",
+    "Unity中控制发射泡泡的脚本是哪个？",
+    "这个游戏代码有什么地方需要优化？",
+    "气泡是如何生成和销毁的？",
+    "分数是在哪里计算的？",
+]
+
+
+def load_questions(path):
+    if not path:
+        return DEFAULT_QUESTIONS
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if lines and lines[0].startswith('{'):
+        return [json.loads(line)['question'] for line in lines]
+    return lines
+
+
+async def run(args):
+    rag = UnityRAGSystem(args.project)
+    await rag.initialize()
+    questions = load_questions(args.questions)
+    reranker = CrossEncoderReranker(budget_ms=args.budget_ms)
+    if not reranker.available:
+        print("⚠️ 重排模型不可用（需要 sentence-transformers），只统计 baseline")
+
+    rows, latencies = [], []
+    for question in questions:
+        baseline_docs = rag._retrieve(question, n_results=args.baseline_n)
+        row = {
+            'question': question,
+            'baseline_tokens': estimate_tokens(rag._build_unity_prompt(question, baseline_docs))
+        }
+        if reranker.available:
+            candidates = rag._retrieve(question, n_results=args.k)
+            with Timer() as t:
+                reranked = reranker.rerank(question, candidates, args.n)
+            latencies.append(t.ms)
+            row['rerank_tokens'] = estimate_tokens(rag._build_unity_prompt(question, reranked))
+            row['rerank_ms'] = round(t.ms, 2)
+            row['top_changed'] = bool(reranked and baseline_docs and reranked[0]['id'] != baseline_docs[0]['id'])
+        rows.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+
+    summary = {
+        'questions': len(rows),
+        'baseline_n': args.baseline_n,
+        'k': args.k,
+        'n': args.n,
+        'avg_baseline_tokens': round(sum(r['baseline_tokens'] for r in rows) / max(1, len(rows)), 1)
+    }
+    if latencies:
+        baseline_total = sum(r['baseline_tokens'] for r in rows)
+        rerank_total = sum(r['rerank_tokens'] for r in rows)
+        summary.update({
+            'avg_rerank_tokens': round(rerank_total / len(rows), 1),
+            'token_savings': round(1 - rerank_total / max(1, baseline_total), 4),
+            'rerank_latency': percentiles(latencies, (50, 99)),
+            'reranker': reranker.stats()
+        })
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'results': rows}, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="交叉编码器重排基准")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--questions', help="问题文件（每行一个问题，或JSONL的question字段）")
+    parser.add_argument('--baseline-n', type=int, default=10)
+    parser.add_argument('--k', type=int, default=30, help="第一阶段候选数")
+    parser.add_argument('--n', type=int, default=5, help="重排后保留数")
+    parser.add_argument('--budget-ms', type=float, default=None, help="重排延迟预算，默认取配置")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+benchmarks/bench_retrieval_quality.py
+----------------------------------------
+检索质量与延迟评测：在带标注的问题集上调用 UnityRAGSystem 的检索入口（路由 → 符号表 / 混合检索 → 重排 → MMR），
+  质量：recall@k、MRR、nDCG@k，目标是标注的文件与符号（类.方法），分两级统计
+        retrieval : 第一阶段检索结果的前 k 个
+        context   : 最终送入提示词的块（重排、MMR 之后）
+  延迟：embed / search / rerank / mmr / total 各阶段的 p50 / p95 / p99（每次计时前清空查询缓存），
+        以及经本地 LLM 桩服务器的端到端问答延迟（answer）。
+  路由：按 RAG_ROUTER_ENABLED 评测主流水线，并以相反的设置再跑一遍（router_ab），
+        对比开 / 关查询路由的质量与延迟，统计路由范围的准确率与误过滤率（标注的 scope）。
+数据集：
+  shootbubble : benchmarks/golden/shootbubble.jsonl，unity_projects/ShootBubble 的人工标注问题
+  synthetic   : synthetic_project.py 生成的大型项目与问题（同一 seed 结果可复现）
+不访问网络：大模型走桩服务器；--embedding-backend hashing 时嵌入也不需要下载模型。
+报告（--json）记录提交号与影响结果的配置，--compare 与另一份报告逐项对比。
+
+运行方式：
+  python benchmarks/bench_retrieval_quality.py --embedding-backend hashing --json report.json
+  python benchmarks/bench_retrieval_quality.py --compare baseline.json --max-drop 0.02
+  RAG_ROUTER_ENABLED=false python benchmarks/bench_retrieval_quality.py --no-llm
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from common import project_root, percentiles, target_metrics, mean_metrics, Timer
+from llm_stub_server import StubLLMServer
+from synthetic_project import write_synthetic_project
+
+from app.core.config import settings
+from app.services.query_router import QueryRouter
+from app.services.symbol_index import TYPE_KINDS
+from app.services.unity_rag_system import UnityRAGSystem
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'shootbubble.jsonl')
+KS = (1, 3, 5, 10)
+# 写入报告的配置：两份报告的这些配置不同时，指标差异不一定来自代码改动
+REPORT_SETTINGS = (
+    'RAG_EMBEDDING_BACKEND', 'RAG_EMBEDDING_MODEL', 'RAG_VECTOR_BACKEND', 'RAG_HNSW_SEARCH_EF',
+    'RAG_HYBRID_ENABLED', 'RAG_HYBRID_CANDIDATES', 'RAG_RRF_K', 'RAG_SYMBOL_FAST_PATH',
+    'RAG_ROUTER_ENABLED', 'RAG_ROUTER_MIN_CONFIDENCE', 'RAG_ROUTER_MIN_RESULTS', 'RAG_ROUTER_VECTOR_STRATEGY',
+    'RAG_RERANK_ENABLED', 'RAG_RERANK_MODEL', 'RAG_RERANK_CANDIDATES', 'RAG_RERANK_TOP_N',
+    'RAG_MMR_ENABLED', 'RAG_MMR_CANDIDATES', 'RAG_MMR_TOP_N', 'RAG_MMR_LAMBDA', 'RAG_MMR_PER_FILE_CAP'
+)
+QUALITY_KEYS = tuple(f"recall@{k}" for k in KS) + ('mrr',) + tuple(f"ndcg@{k}" for k in KS)
+
+
+def load_golden(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def symbol_chunks(rag: UnityRAGSystem, target: str) -> Set[str]:
+    """"类.成员" 或 "类型名" -> 定义所在的块ID"""
+    if '.' in target:
+        class_name, name = target.rsplit('.', 1)
+        entries = [e for e in rag.symbol_index.lookup(name) if e['name'] == name and e['class_name'] == class_name]
+    else:
+        entries = [e for e in rag.symbol_index.lookup(target) if e['name'] == target and e['kind'] in TYPE_KINDS]
+    return {ref['chunk_id'] for entry in entries for ref in entry['chunks']}
+
+
+def resolve_targets(rag: UnityRAGSystem, item: Dict) -> Tuple[List[str], Dict[str, Set[str]], List[str]]:
+    """返回 (期望的文件路径后缀, 符号 -> 块ID, 在索引中找不到的符号)"""
+    symbols, unresolved = {}, []
+    for target in item.get('symbols', []):
+        chunk_ids = symbol_chunks(rag, target)
+        if chunk_ids:
+            symbols[target] = chunk_ids
+        else:
+            unresolved.append(target)
+    return list(item.get('files', [])), symbols, unresolved
+
+
+def doc_hits(doc: Dict, files: List[str], symbols: Dict[str, Set[str]]) -> Set[str]:
+    """一个检索结果命中的目标"""
+    path = doc['metadata'].get('file_path', '').replace('\\', '/')
+    hits = {f"file:{suffix}" for suffix in files if path.endswith(suffix)}
+    hits.update(f"symbol:{target}" for target, chunk_ids in symbols.items() if doc['id'] in chunk_ids)
+    return hits
+
+
+def run_pipeline(rag: UnityRAGSystem, question: str, n_candidates: int,
+                 router: Optional[QueryRouter] = None) -> Tuple[List[Dict], List[Dict], Dict, Optional[Dict]]:
+    """经由 UnityRAGSystem 自身的检索入口评测，与线上走同一套路由 / 回退 / 检索策略
+
+    retrieval 为 _retrieve_many 的第一阶段结果，context 为 _retrieve_context_many 送入提示词的块；
+    router 为 None 时关闭查询路由。
+    计时：embed 为经查询缓存（已清空）计算查询向量的耗时；随后向量留在缓存中、结果缓存清空，
+    search / rerank / mmr 由 _retrieve_context_many 分阶段返回；total 为各阶段之和。
+    """
+    rag.router = router
+    timings = {}
+    fallbacks = router.fallbacks if router is not None else 0
+
+    rag.query_cache.invalidate()
+    with Timer() as t:
+        rag.query_cache.get_embeddings([question], rag.processor.embed_queries, rag.vector_store.index_version)
+    timings['embed'] = t.ms
+
+    rag.query_cache.result_cache.clear()
+    rag._retrieve_context_many([question], timings=timings)
+    timings['total'] = sum(timings.values())
+
+    # 质量指标用的第一阶段结果与送入提示词的块（不计时）
+    rag.query_cache.result_cache.clear()
+    docs = rag._retrieve_many([question], n_candidates)[0]
+    context = rag._retrieve_context_many([question])[0]
+
+    decision = None
+    if router is not None:
+        # 路由决策是确定的，重新计算一次用于报告；回退与否看检索期间的回退计数
+        decision = router.route_many([question], rag.processor.embed_queries, rag.symbol_index)[0]
+        decision['fallback'] = router.fallbacks > fallbacks
+    return docs, context, timings, decision
+
+
+def evaluate(rag: UnityRAGSystem, items: List[Dict], repeat: int,
+             router: Optional[QueryRouter] = None) -> Dict:
+    n_candidates = max(max(KS), settings.RAG_RERANK_CANDIDATES if rag.reranker is not None else 0,
+                       settings.RAG_MMR_CANDIDATES if settings.RAG_MMR_ENABLED else 10)
+    previous_router = rag.router
+    try:
+        run_pipeline(rag, items[0]['question'], n_candidates, router)  # 预热（含路由模型训练）
+
+        samples: Dict[str, List[float]] = {}
+        rows = []
+        for item in items:
+            files, symbols, unresolved = resolve_targets(rag, item)
+            n_targets = len(files) + len(symbols)
+            for _ in range(repeat):
+                docs, context, timings, decision = run_pipeline(rag, item['question'], n_candidates, router)
+                for stage, ms in timings.items():
+                    samples.setdefault(stage, []).append(ms)
+            row = {
+                'id': item['id'],
+                'question': item['question'],
+                'kind': item.get('kind'),
+                'targets': n_targets,
+                'unresolved': unresolved,
+                'top_files': [doc['metadata'].get('file_path') for doc in docs[:3]],
+                'symbol_path': bool(docs and docs[0].get('match') == 'symbol'),
+                'retrieval': target_metrics([doc_hits(doc, files, symbols) for doc in docs], n_targets, KS),
+                'context': target_metrics([doc_hits(doc, files, symbols) for doc in context], n_targets, KS)
+            }
+            if decision is not None:
+                row['route'] = {key: decision[key] for key in ('scope', 'strategy', 'source', 'confidence')}
+                row['route']['fallback'] = decision['fallback']
+                row['expected_scope'] = item.get('scope')
+            rows.append(row)
+    finally:
+        rag.router = previous_router
+
+    scored = [row for row in rows if row['targets']]
+    by_kind = {}
+    for kind in dict.fromkeys(row['kind'] for row in scored if row['kind']):
+        by_kind[kind] = mean_metrics([row['retrieval'] for row in scored if row['kind'] == kind])
+    result = {
+        'questions': len(rows),
+        'unresolved_targets': sorted({target for row in rows for target in row['unresolved']}),
+        'symbol_path_rate': round(sum(row['symbol_path'] for row in rows) / len(rows), 4),
+        'retrieval': mean_metrics([row['retrieval'] for row in scored]),
+        'context': mean_metrics([row['context'] for row in scored]),
+        'by_kind': by_kind,
+        'latency_ms': {stage: percentiles(values, (50, 95, 99)) for stage, values in samples.items()},
+        'results': rows
+    }
+    if router is not None:
+        result['routing'] = routing_summary(rows)
+    return result
+
+
+def routing_summary(rows: List[Dict]) -> Dict:
+    """路由决策统计：范围准确率（与标注的 scope 一致）、误过滤率（过滤掉了标注范围）、回退率"""
+    labelled = [row for row in rows if row.get('expected_scope')]
+    wrong_filter = [row for row in labelled
+                    if row['route']['scope'] not in ('all', row['expected_scope'])]
+    summary = {
+        'scope_accuracy': round(sum(row['route']['scope'] == row['expected_scope'] for row in labelled)
+                                / len(labelled), 4) if labelled else None,
+        'wrong_filter_rate': round(len(wrong_filter) / len(labelled), 4) if labelled else None,
+        'wrong_filter': [row['id'] for row in wrong_filter],
+        'fallback_rate': round(sum(row['route']['fallback'] for row in rows) / len(rows), 4)
+    }
+    for key in ('scope', 'strategy', 'source'):
+        counts: Dict[str, int] = {}
+        for row in rows:
+            counts[row['route'][key]] = counts.get(row['route'][key], 0) + 1
+        summary[key] = dict(sorted(counts.items()))
+    return summary
+
+
+def router_ab(routed: Dict, plain: Dict) -> Dict:
+    """开 / 关查询路由的对比：质量差值为 开 - 关，延迟差值单位为毫秒"""
+    deltas = {}
+    for level in ('retrieval', 'context'):
+        for key in QUALITY_KEYS:
+            if key in routed[level] and key in plain[level]:
+                deltas[f"{level}.{key}"] = round(routed[level][key] - plain[level][key], 4)
+    for point in ('p50', 'p95'):
+        deltas[f"latency.total.{point}"] = round(
+            routed['latency_ms']['total'][point] - plain['latency_ms']['total'][point], 3
+        )
+    by_kind = {
+        kind: {key: round(metrics[key] - plain['by_kind'][kind][key], 4) for key in ('recall@5', 'mrr')}
+        for kind, metrics in routed['by_kind'].items() if kind in plain['by_kind']
+    }
+    return {
+        'routing': routed['routing'],
+        'on': {'retrieval': routed['retrieval'], 'latency_total_ms': routed['latency_ms']['total']},
+        'off': {'retrieval': plain['retrieval'], 'latency_total_ms': plain['latency_ms']['total']},
+        'delta': deltas,
+        **({'delta_by_kind': by_kind} if by_kind else {})
+    }
+
+
+async def answer_latency(rag: UnityRAGSystem, items: List[Dict]) -> Dict:
+    """经桩服务器的端到端问答延迟（回答缓存关闭）"""
+    latencies = []
+    for item in items:
+        with Timer() as t:
+            await rag.ask_about_unity_project(item['question'])
+        latencies.append(t.ms)
+    return percentiles(latencies, (50, 95, 99))
+
+
+async def run_dataset(name: str, project_path: str, items: List[Dict], args, work_dir: str) -> Dict:
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, f"db_{name}")
+    rag = UnityRAGSystem(project_path)
+    with Timer() as build:
+        await rag.initialize()
+    result = {
+        'project': os.path.relpath(project_path, project_root) if name != 'synthetic' else f"synthetic x {args.synthetic_files} (seed {args.seed})",
+        'index': {
+            'build_s': round(build.ms / 1000, 3),
+            'chunks': rag.vector_store.get_collection_info().get('document_count', 0),
+            'symbols': len(rag.symbol_index)
+        }
+    }
+    # 主结果按当前配置（RAG_ROUTER_ENABLED）评测，另一种设置的结果只用于 router_ab 对比
+    router = rag.router or QueryRouter(rag.processor.embed_queries)
+    main_router = router if settings.RAG_ROUTER_ENABLED else None
+    result.update(await rag.executor.run(evaluate, rag, items, args.repeat, main_router))
+    if args.router_ab:
+        other = await rag.executor.run(evaluate, rag, items, args.repeat, None if main_router else router)
+        routed, plain = (result, other) if main_router else (other, result)
+        result['router_ab'] = router_ab(routed, plain)
+    if args.llm:
+        result['latency_ms']['answer'] = await answer_latency(rag, items)
+    await rag.close()
+    return result
+
+
+def git_revision() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=project_root,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit or None, 'dirty': bool(dirty)}
+
+
+def compare(report: Dict, baseline: Dict, max_drop: float) -> Dict:
+    """与基线报告逐项对比；质量指标下降超过 max_drop 的记入 regressions"""
+    comparison = {'baseline_commit': baseline.get('meta', {}).get('commit'), 'datasets': {}, 'regressions': []}
+    for name, current in report['datasets'].items():
+        previous = baseline.get('datasets', {}).get(name)
+        if previous is None:
+            continue
+        if previous.get('project') != current['project'] or previous.get('questions') != current['questions']:
+            # 项目或问题集不同，指标没有可比性
+            comparison.setdefault('not_comparable', []).append(name)
+            continue
+        deltas = {}
+        for level in ('retrieval', 'context'):
+            for key in QUALITY_KEYS:
+                if key not in current[level] or key not in previous.get(level, {}):
+                    continue
+                delta = round(current[level][key] - previous[level][key], 4)
+                deltas[f"{level}.{key}"] = delta
+                if level == 'retrieval' and -delta > max_drop:
+                    comparison['regressions'].append(f"{name} {level}.{key}: {previous[level][key]} -> {current[level][key]}")
+        for stage, values in current['latency_ms'].items():
+            before = previous.get('latency_ms', {}).get(stage)
+            if before:
+                for point in ('p50', 'p95'):
+                    deltas[f"latency.{stage}.{point}"] = round(values[point] - before[point], 3)
+        comparison['datasets'][name] = deltas
+    changed = {key: (baseline.get('meta', {}).get('settings', {}).get(key), value)
+               for key, value in report['meta']['settings'].items()
+               if baseline.get('meta', {}).get('settings', {}).get(key) != value}
+    if changed:
+        comparison['settings_changed'] = changed
+    return comparison
+
+
+async def run(args, work_dir: str) -> Dict:
+    if args.embedding_backend:
+        settings.RAG_EMBEDDING_BACKEND = args.embedding_backend
+    if args.backend:
+        settings.RAG_VECTOR_BACKEND = args.backend
+    settings.RAG_SNAPSHOT_PATH = ""
+    settings.RAG_ANSWER_CACHE_ENABLED = False
+
+    server = None
+    if args.llm:
+        server = StubLLMServer(latency_ms=args.llm_latency_ms, tokens=20)
+        settings.RAG_LLM_BASE_URL = await server.start()
+        os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+    datasets = {}
+    try:
+        if 'shootbubble' in args.datasets:
+            print("🔍 评测 shootbubble ...")
+            datasets['shootbubble'] = await run_dataset(
+                'shootbubble', args.project, load_golden(args.golden), args, work_dir
+            )
+        if 'synthetic' in args.datasets:
+            synthetic_root = os.path.join(work_dir, 'synthetic_project')
+            items = write_synthetic_project(synthetic_root, args.synthetic_files, args.synthetic_questions, args.seed)
+            print(f"🔍 评测 synthetic（{args.synthetic_files} 个脚本）...")
+            datasets['synthetic'] = await run_dataset('synthetic', synthetic_root, items, args, work_dir)
+    finally:
+        if server is not None:
+            await server.stop()
+
+    return {
+        'meta': {
+            **git_revision(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'ks': list(KS),
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'settings': {key: getattr(settings, key) for key in REPORT_SETTINGS}
+        },
+        'datasets': datasets
+    }
+
+
+def summarize(report: Dict) -> Dict:
+    """控制台输出：去掉逐问题结果"""
+    return {
+        'meta': report['meta'],
+        'datasets': {
+            name: {key: value for key, value in dataset.items() if key != 'results'}
+            for name, dataset in report['datasets'].items()
+        },
+        **({'comparison': report['comparison']} if 'comparison' in report else {})
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索质量与延迟评测（黄金问题集 + 合成大项目）")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--golden', default=GOLDEN_PATH, help="标注问题集（JSONL：question / files / symbols）")
+    parser.add_argument('--datasets', default='shootbubble,synthetic', help="逗号分隔：shootbubble,synthetic")
+    parser.add_argument('--synthetic-files', type=int, default=400)
+    parser.add_argument('--synthetic-questions', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="每个问题的计时次数")
+    parser.add_argument('--embedding-backend', choices=['sentence_transformer', 'hashing'], default=None)
+    parser.add_argument('--backend', choices=['chroma', 'numpy'], default=None, help="向量存储后端")
+    parser.add_argument('--no-llm', dest='llm', action='store_false', help="不测端到端问答延迟")
+    parser.add_argument('--no-router-ab', dest='router_ab', action='store_false',
+                        help="不做开 / 关查询路由的对比评测")
+    parser.add_argument('--llm-latency-ms', type=float, default=0, help="桩服务器的回答延迟")
+    parser.add_argument('--compare', help="基线报告（之前 --json 的输出）")
+    parser.add_argument('--max-drop', type=float, default=None,
+                        help="与基线相比检索指标下降超过该值时以非零状态退出")
+    parser.add_argument('--json', help="完整报告（含逐问题结果）输出到JSON文件")
+    args = parser.parse_args()
+    args.datasets = {name.strip() for name in args.datasets.split(',') if name.strip()}
+
+    work_dir = tempfile.mkdtemp(prefix="retrieval_eval_")
+    try:
+        report = asyncio.run(run(args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare(report, baseline, args.max_drop if args.max_drop is not None else 0.0)
+
+    print(json.dumps(summarize(report), ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+    if args.max_drop is not None and report.get('comparison', {}).get('regressions'):
+        print("❌ 检索质量下降超过阈值:")
+        for line in report['comparison']['regressions']:
+            print(f"  - {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+benchmarks/bench_snapshot.py
+----------------------------------------
+索引快照基准：对比 完整重建（加载项目 -> 分割 -> 生成嵌入 -> 写入向量库 -> BM25 / 符号表）
+与 从快照启动（内存映射加载 -> BM25重建 -> 符号表恢复）的耗时，以及启动后首个查询的延迟。
+
+两种语料：
+  --project PATH   真实 Unity 项目，走 UnityRAGSystem 完整流程（默认 unity_projects/ShootBubble）
+  --synthetic N    N 个合成文本块，只比较 向量生成+写入 与 快照加载
+
+运行方式：
+  python benchmarks/bench_snapshot.py --project unity_projects/ShootBubble
+  python benchmarks/bench_snapshot.py --synthetic 50000 --backend numpy
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+from common import project_root, synthetic_chunks, rss_mb, Timer
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+from app.services.unity_text_processor import UnityTextProcessor
+from app.services.vector_backend import create_vector_store
+
+QUESTION = "玩家点击气泡后会发生什么？"
+
+
+async def bench_project(project_path: str, work_dir: str) -> dict:
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, "rebuild_db")
+    settings.RAG_SNAPSHOT_PATH = ""
+    snapshot_path = os.path.join(work_dir, "unity_project.ragsnap")
+
+    with Timer() as rebuild:
+        rag = UnityRAGSystem(project_path)
+        await rag.initialize()
+    with Timer() as export:
+        manifest = rag.export_snapshot(snapshot_path)
+
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, "replica_db")
+    rss_before = rss_mb()
+    with Timer() as load:
+        replica = UnityRAGSystem(project_path)
+        replica.load_snapshot(snapshot_path)
+    with Timer() as first_query:
+        docs = replica._retrieve(QUESTION, n_results=10)
+
+    return {
+        'corpus': project_path,
+        'chunks': manifest['count'],
+        'snapshot_mb': round(os.path.getsize(snapshot_path) / 1024 / 1024, 2),
+        'rebuild_s': round(rebuild.ms / 1000, 3),
+        'export_s': round(export.ms / 1000, 3),
+        'snapshot_load_s': round(load.ms / 1000, 3),
+        'first_query_ms': round(first_query.ms, 2),
+        'first_query_hits': len(docs),
+        'replica_rss_delta_mb': round(rss_mb() - rss_before, 1),
+        'note': "rebuild_s 与 snapshot_load_s 都包含嵌入模型加载（查询仍需要它）"
+    }
+
+
+def bench_synthetic(n: int, backend: str, work_dir: str) -> dict:
+    chunks = synthetic_chunks(n)
+    processor = UnityTextProcessor()
+
+    with Timer() as rebuild:
+        embeddings = processor.generate_embeddings(chunks)
+        store = create_vector_store(backend, os.path.join(work_dir, "rebuild_db"), embedder=processor)
+        store.create_collection("unity_project")
+        store.add_documents(chunks, embeddings)
+        store.flush()
+
+    snapshot_path = os.path.join(work_dir, "synthetic.ragsnap")
+    with Timer() as export:
+        store.export_snapshot(snapshot_path)
+
+    rss_before = rss_mb()
+    with Timer() as load:
+        replica = create_vector_store(backend, os.path.join(work_dir, "replica_db"), embedder=processor)
+        replica.load_snapshot(snapshot_path, "unity_project")
+    with Timer() as first_query:
+        docs = replica.search("synthetic chunk 42 Method42", n_results=10)
+
+    return {
+        'corpus': f"synthetic x {n}",
+        'backend': backend,
+        'embedding_model': processor.embedding_model_name,
+        'chunks': n,
+        'snapshot_mb': round(os.path.getsize(snapshot_path) / 1024 / 1024, 2),
+        'rebuild_s': round(rebuild.ms / 1000, 3),
+        'export_s': round(export.ms / 1000, 3),
+        'snapshot_load_s': round(load.ms / 1000, 3),
+        'first_query_ms': round(first_query.ms, 2),
+        'first_query_hits': len(docs),
+        'replica_rss_delta_mb': round(rss_mb() - rss_before, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引快照 加载 vs 重建 基准")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--synthetic', type=int, default=0, help="使用 N 个合成文本块代替真实项目")
+    parser.add_argument('--backend', default=None, help="向量存储后端，默认取 RAG_VECTOR_BACKEND")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    args = parser.parse_args()
+
+    if args.backend:
+        settings.RAG_VECTOR_BACKEND = args.backend
+    work_dir = tempfile.mkdtemp(prefix="snapshot_bench_")
+    try:
+        if args.synthetic:
+            result = bench_synthetic(args.synthetic, settings.RAG_VECTOR_BACKEND, work_dir)
+        else:
+            result = asyncio.run(bench_project(args.project, work_dir))
+        result['vector_backend'] = settings.RAG_VECTOR_BACKEND
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+benchmarks/bench_startup.py
+----------------------------------------
+启动快速路径基准：同一持久化目录下连续三次冷启动 UnityRAGSystem.initialize()
+  rebuild   : 空目录，完整构建索引并写入就绪标记
+  fast_path : 项目未变化，只打开已持久化的集合 / BM25 / 符号表
+  touched   : 修改一个文件的时间戳后启动，指纹变化触发完整重建
+每次都新建 UnityRAGSystem，嵌入模型加载计入 model_load_s，不计入启动耗时。
+
+运行方式：
+  python benchmarks/bench_startup.py --project unity_projects/ShootBubble --backend chroma
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from common import project_root, Timer
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+
+
+async def cold_start(project_path: str) -> dict:
+    with Timer() as construct:
+        rag = UnityRAGSystem(project_path)
+    with Timer() as init:
+        await rag.initialize()
+    with Timer() as first_query:
+        docs = rag._retrieve("玩家点击气泡后会发生什么？", n_results=10)
+    return {
+        'model_load_s': round(construct.ms / 1000, 3),
+        'initialize_s': round(init.ms / 1000, 3),
+        'first_query_ms': round(first_query.ms, 2),
+        'first_query_hits': len(docs),
+        'chunks': rag.vector_store.get_collection_info().get('document_count', 0)
+    }
+
+
+def touch_one_file(project_path: str) -> str:
+    for root, _, files in os.walk(project_path):
+        for name in files:
+            if name.endswith('.cs'):
+                path = os.path.join(root, name)
+                os.utime(path, None)
+                return path
+    raise FileNotFoundError("项目中没有 .cs 文件")
+
+
+async def run(args):
+    work_dir = tempfile.mkdtemp(prefix="startup_bench_")
+    project_copy = os.path.join(work_dir, "project")
+    shutil.copytree(args.project, project_copy)
+    settings.RAG_PERSIST_DIRECTORY = os.path.join(work_dir, "db")
+    settings.RAG_SNAPSHOT_PATH = ""
+    if args.backend:
+        settings.RAG_VECTOR_BACKEND = args.backend
+
+    results = {'project': args.project, 'vector_backend': settings.RAG_VECTOR_BACKEND}
+    try:
+        results['rebuild'] = await cold_start(project_copy)
+        results['fast_path'] = await cold_start(project_copy)
+        time.sleep(0.01)
+        results['touched_file'] = os.path.relpath(touch_one_file(project_copy), project_copy)
+        results['touched'] = await cold_start(project_copy)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results['speedup'] = round(
+        results['rebuild']['initialize_s'] / max(results['fast_path']['initialize_s'], 1e-6), 1
+    )
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动快速路径基准")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--backend', default=None, help="向量存储后端，默认取 RAG_VECTOR_BACKEND")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+benchmarks/bench_streaming.py
+----------------------------------------
+流式问答基准：对同一批问题分别走
+  blocking  : ask_about_unity_project，等完整回答（用户看到第一个字的时间 = 总时间）
+  streaming : ask_stream，分别统计 来源到达时间、首个token时间（TTFT）与总时间
+大模型由进程内的 LLM 桩服务器模拟：--latency-ms 为首个增量前的延迟，之后每 --token-ms 一个增量。
+
+运行方式：
+  python benchmarks/bench_streaming.py --project unity_projects/ShootBubble --latency-ms 400 --tokens 80 --token-ms 25
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from common import project_root, percentiles, Timer
+from bench_rerank import DEFAULT_QUESTIONS
+from llm_stub_server import StubLLMServer
+
+from app.core.config import settings
+from app.services.unity_rag_system import UnityRAGSystem
+
+
+async def run(args):
+    server = StubLLMServer(latency_ms=args.latency_ms, tokens=args.tokens, token_ms=args.token_ms)
+    settings.RAG_LLM_BASE_URL = await server.start()
+    # 两轮问同一批问题，关闭回答缓存，否则流式一轮全部命中缓存
+    settings.RAG_ANSWER_CACHE_ENABLED = False
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    rag = UnityRAGSystem(args.project)
+    await rag.initialize()
+    questions = DEFAULT_QUESTIONS[:args.questions]
+
+    blocking = []
+    for question in questions:
+        with Timer() as t:
+            await rag.ask_about_unity_project(question)
+        blocking.append(t.ms)
+
+    sources_ms, ttft_ms, total_ms = [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        async for event in rag.ask_stream(question):
+            if event['type'] == 'sources':
+                sources_ms.append((time.perf_counter() - start) * 1000)
+            elif event['type'] == 'done':
+                ttft_ms.append(event['ttft_ms'])
+                total_ms.append(event['total_ms'])
+            elif event['type'] == 'error':
+                raise RuntimeError(event['message'])
+
+    await rag.llm_client.close()
+    await server.stop()
+
+    summary = {
+        'questions': len(questions),
+        'llm_latency_ms': args.latency_ms,
+        'tokens': args.tokens,
+        'token_ms': args.token_ms,
+        'blocking': {'first_visible_ms': percentiles(blocking, (50, 99)), 'total_ms': percentiles(blocking, (50, 99))},
+        'streaming': {
+            'sources_ms': percentiles(sources_ms, (50, 99)),
+            'ttft_ms': percentiles(ttft_ms, (50, 99)),
+            'total_ms': percentiles(total_ms, (50, 99))
+        },
+        'llm': rag.llm_client.stats()
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式问答 TTFT 基准（本地 LLM 桩服务器）")
+    parser.add_argument('--project', default=os.path.join(project_root, 'unity_projects', 'ShootBubble'))
+    parser.add_argument('--questions', type=int, default=len(DEFAULT_QUESTIONS))
+    parser.add_argument('--latency-ms', type=float, default=400, help="首个增量前的延迟")
+    parser.add_argument('--tokens', type=int, default=80, help="每个回答的增量个数")
+    parser.add_argument('--token-ms', type=float, default=25, help="增量之间的间隔")
+    parser.add_argument('--json', help="结果输出到JSON文件")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+benchmarks/common.py
+----------------------------------------
+基准测试脚本共用的工具：合成语料、计时、分位数统计
+"""
+
+import os
+import sys
+import time
+from typing import Dict, List, Sequence, Set
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+FILE_TYPES = ['code', 'scene', 'prefab', 'shader', 'config', 'document']
+BLOCK_TYPES = ['class_definition', 'method_definition', 'field_definition', 'code_block', 'comment']
+
+
+def synthetic_vectors(n: int, dim: int, n_clusters: int = 64, noise: float = 0.35,
+                      seed: int = 0) -> np.ndarray:
+    """生成带聚类结构的归一化向量（比纯随机向量更接近真实嵌入分布）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = centers[labels] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def synthetic_chunks(n: int, seed: int = 0) -> List[Dict]:
+    """生成带元数据的合成文本块"""
+    rng = np.random.default_rng(seed)
+    file_types = rng.choice(FILE_TYPES, size=n, p=[0.4, 0.15, 0.15, 0.05, 0.15, 0.1])
+    block_types = rng.choice(BLOCK_TYPES, size=n)
+    chunks = []
+    for i in range(n):
+        file_index = i // 8
+        chunks.append({
+            'id': f"syn-{i}",
+            'content': f"// synthetic chunk {i}\npublic class Synthetic{file_index} : MonoBehaviour {{ void Method{i}() {{ }} }}",
+            'metadata': {
+                'file_path': f"Assets/Synthetic/File{file_index}.cs",
+                'file_type': str(file_types[i]),
+                'chunk_type': 'code_block' if file_types[i] == 'code' else 'text_block',
+                'block_type': str(block_types[i]),
+                'class_name': f"Synthetic{file_index % 500}",
+                'complexity': ['low', 'medium', 'high'][i % 3],
+                'chunk_index': i % 8
+            }
+        })
+    return chunks
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """精确检索的真值（行号）"""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(retrieved: Sequence[Sequence], truth: Sequence[Sequence], k: int) -> float:
+    """平均 recall@k"""
+    if not truth:
+        return 0.0
+    total = 0.0
+    for got, expected in zip(retrieved, truth):
+        expected = set(list(expected)[:k])
+        total += len(expected & set(list(got)[:k])) / max(1, len(expected))
+    return total / len(truth)
+
+
+def target_metrics(ranked_hits: Sequence[Set[str]], n_targets: int,
+                   ks: Sequence[int] = (1, 3, 5, 10)) -> Dict[str, float]:
+    """按标注的目标（期望命中的文件 / 符号）计算单个问题的 recall@k、倒数排名（RR）与 nDCG@k
+
+    ranked_hits[i] 是第 i 个检索结果命中的目标集合；增益为该结果新命中的目标数，
+    同一文件的多个块不会重复加分。一个块可能同时命中文件和符号目标，nDCG 截断到 1。
+    """
+    metrics: Dict[str, float] = {}
+    if n_targets <= 0:
+        return metrics
+    covered: Set[str] = set()
+    gains = []
+    first_hit = None
+    for rank, hits in enumerate(ranked_hits):
+        new = set(hits) - covered
+        covered |= new
+        gains.append(float(len(new)))
+        if hits and first_hit is None:
+            first_hit = rank
+    for k in ks:
+        reached = set().union(*ranked_hits[:k])
+        dcg = sum(gain / np.log2(rank + 2) for rank, gain in enumerate(gains[:k]))
+        ideal = sum(1.0 / np.log2(rank + 2) for rank in range(min(k, n_targets)))
+        metrics[f"recall@{k}"] = len(reached) / n_targets
+        metrics[f"ndcg@{k}"] = min(1.0, float(dcg / ideal)) if ideal else 0.0
+    metrics['mrr'] = 1.0 / (first_hit + 1) if first_hit is not None else 0.0
+    return metrics
+
+
+def mean_metrics(rows: Sequence[Dict[str, float]]) -> Dict[str, float]:
+    """逐问题指标取平均"""
+    keys = list(dict.fromkeys(key for row in rows for key in row))
+    return {key: round(float(np.mean([row.get(key, 0.0) for row in rows])), 4) for key in keys}
+
+
+def percentiles(samples_ms: Sequence[float], points=(50, 95, 99)) -> Dict[str, float]:
+    """耗时分位数（毫秒）"""
+    if not samples_ms:
+        return {f"p{p}": 0.0 for p in points}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in points}
+
+
+def rss_mb() -> float:
+    """当前进程常驻内存（MB）；Linux 读 /proc，其他平台用 psutil（可选）"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return 0.0
+
+
+class Timer:
+    """with Timer() as t: ...; t.ms"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self.start) * 1000
@@ -0,0 +1,141 @@
+"""
+benchmarks/llm_stub_server.py
+----------------------------------------
+本地 OpenAI 兼容桩服务器：POST /v1/chat/completions 在固定延迟后返回回答，
+可按比例注入 503 / 429 错误，用于测试 AsyncLLMClient 的并发、超时和重试，不需要真实API。
+请求带 stream=true 时按 SSE 逐个输出 --tokens 个增量，首个增量在 --latency-ms 后到达，
+之后每隔 --token-ms 一个；非流式请求等全部生成完（latency + tokens * token_ms）才返回。
+
+运行方式：
+  python benchmarks/llm_stub_server.py --port 8808 --latency-ms 500 --fail-rate 0.1
+  python benchmarks/llm_stub_server.py --latency-ms 300 --tokens 60 --token-ms 20
+  RAG_LLM_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=stub python ...
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+
+class StubLLMServer:
+    def __init__(self, latency_ms: float = 200, fail_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: int = 0, tokens: int = 40, token_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.fail_rate = fail_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.runner = None
+        self.port = None
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+        roll = self.random.random()
+        if roll < self.fail_rate:
+            self.errors += 1
+            return web.json_response({'error': 'stub overloaded'}, status=503)
+        if roll < self.fail_rate + self.rate_limit_rate:
+            self.errors += 1
+            return web.json_response({'error': 'stub rate limited'}, status=429, headers={'Retry-After': '0.05'})
+
+        question = payload['messages'][-1]['content']
+        pieces = self._answer_tokens(question)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if payload.get('stream'):
+                return await self._stream(request, payload, pieces)
+            await asyncio.sleep((self.latency_ms + self.token_ms * len(pieces)) / 1000)
+        finally:
+            self.in_flight -= 1
+        return web.json_response({
+            'id': f"stub-{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': "".join(pieces)},
+                'finish_reason': 'stop'
+            }]
+        })
+
+    def _answer_tokens(self, question: str) -> list:
+        head = f"[stub] {len(question)} chars received."
+        return [head] + [f" token{i}" for i in range(1, self.tokens)]
+
+    async def _stream(self, request: web.Request, payload: dict, pieces: list) -> web.StreamResponse:
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        await asyncio.sleep(self.latency_ms / 1000)
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            chunk = {
+                'id': f"stub-{self.requests}",
+                'object': 'chat.completion.chunk',
+                'model': payload.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """启动服务器，返回 base_url（port=0 时自动分配端口）"""
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}/v1"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'errors': self.errors, 'max_in_flight': self.max_in_flight}
+
+
+async def serve(args):
+    server = StubLLMServer(args.latency_ms, args.fail_rate, args.rate_limit_rate,
+                           tokens=args.tokens, token_ms=args.token_ms)
+    base_url = await server.start(args.host, args.port)
+    print(f"🧪 LLM桩服务器已启动: {base_url}（延迟 {args.latency_ms}ms, 503比例 {args.fail_rate}）")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地 LLM 桩服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8808)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="返回503的比例")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="返回429的比例")
+    parser.add_argument('--tokens', type=int, default=40, help="每个回答的增量个数")
+    parser.add_argument('--token-ms', type=float, default=0.0, help="增量之间的间隔")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
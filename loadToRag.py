@@ -19,11 +19,12 @@ import asyncio
 # #     # 方法2：在已有事件循环中运行
 # #     rag_system = asyncio.get_event_loop().run_until_complete(init_rag_system())
 
+from app.core.config import settings
 from app.services.unity_rag_system import UnityRAGSystem
 import asyncio
 
 async def init_rag_system():
-    rag = UnityRAGSystem('/content/unity-ai-generator/unity_projects/ShootBubble/')
+    rag = UnityRAGSystem(settings.RAG_PROJECT_PATH)
     await rag.initialize()
     print('✅ Unity RAG系统就绪')
     return rag
@@ -2,8 +2,7 @@
 test_unity_rag.py
 ----------------------------------------
 用于测试 UnityRAGSystem 初始化与问答功能
-路径假设为：
-/content/unity-ai-generator/app/services/unity_rag_system.py
+项目路径取 RAG_PROJECT_PATH（默认 unity_projects/ShootBubble，可用环境变量覆盖）
 
 运行方式：
   python test_unity_rag.py
@@ -14,12 +13,13 @@ test_unity_rag.py
 import asyncio
 import nest_asyncio
 import traceback
+from app.core.config import settings
 from app.services.unity_rag_system import UnityRAGSystem
 
 # 允许在 Jupyter / Colab 环境中重复使用事件循环
 nest_asyncio.apply()
 
-PROJECT_PATH = "/content/unity-ai-generator/unity_projects/ShootBubble/"
+PROJECT_PATH = settings.RAG_PROJECT_PATH
 
 async def test_rag_system():
     print("🟢 开始初始化 UnityRAGSystem ...")
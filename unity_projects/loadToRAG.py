@@ -1,12 +1,13 @@
+from app.core.config import settings
 from app.services.unity_rag_system import UnityRAGSystem
 import asyncio
 
 async def init_rag_system():
-    rag = UnityRAGSystem('/content/unity-ai-generator/unity_projects/ShootBubble/')
+    rag = UnityRAGSystem(settings.RAG_PROJECT_PATH)
     await rag.initialize()
     #rag.reinitialize()
     print('✅ Unity RAG系统就绪')
-    rag_system = asyncio.get_event_loop().run_until_complete(init_rag_system())
+    return rag
 
 
 try:
@@ -2,12 +2,14 @@ import gradio as gr
 import asyncio
 import nest_asyncio
 import traceback
+from app.core.config import settings
 from app.services.unity_rag_system import UnityRAGSystem
 
 # 允许在 Jupyter / Colab 环境中重复使用事件循环
 nest_asyncio.apply()
 
-PROJECT_PATH = "/content/unity-ai-generator/unity_projects/ShootBubble/"
+# 默认项目与 API 共用配置（环境变量 RAG_PROJECT_PATH 可覆盖）
+PROJECT_PATH = settings.RAG_PROJECT_PATH
 
 class UnityRAGWebUI:
     def __init__(self):
@@ -37,31 +39,51 @@ class UnityRAGWebUI:
             return self.initialization_status, error_msg
     
     async def ask_question(self, question, history):
-        """处理用户提问"""
+        """处理用户提问（流式：先显示检索到的来源，再逐步显示回答）"""
         if not self.is_initialized or self.rag_system is None:
-            return "请先初始化系统！", history
+            yield "请先初始化系统！", history
+            return
         
         if not question.strip():
-            return "请输入问题！", history
+            yield "请输入问题！", history
+            return
         
+        # 添加到历史记录
+        history.append([question, "🔍 正在检索..."])
+        yield "", history
+        
+        answer, sources, timing = "", "", ""
         try:
-            # 添加到历史记录
-            history.append([question, ""])
-            
-            # 获取回答
-            answer = await self.rag_system.ask_about_unity_project(question)
-            
-            # 更新历史记录
-            history[-1][1] = answer
-            
-            return "", history
+            async for event in self.rag_system.ask_stream(question):
+                if event['type'] == 'sources':
+                    sources = self._format_sources(event['sources'])
+                elif event['type'] == 'token':
+                    answer += event['text']
+                elif event['type'] == 'done':
+                    timing = (f"⏱️ 检索 {event['retrieval_ms']:.0f}ms · "
+                              f"首个token {event['ttft_ms'] or 0:.0f}ms · 总计 {event['total_ms']:.0f}ms")
+                elif event['type'] == 'error':
+                    answer += f"\n\n❌ {event['message']}"
+                history[-1][1] = "\n\n".join(
+                    part for part in (answer or "⏳ 正在生成回答...", sources, timing) if part
+                )
+                yield "", history
             
         except Exception as e:
             error_msg = f"回答问题时出错: {str(e)}"
             print(f"❌ {error_msg}")
             traceback.print_exc()
             history[-1][1] = error_msg
-            return "", history
+            yield "", history
+    
+    def _format_sources(self, sources):
+        """相关来源列表（最多显示5个）"""
+        if not sources:
+            return ""
+        lines = ["**相关来源**:"]
+        for i, source in enumerate(sources[:5], 1):
+            lines.append(f"{i}. `{source['file']}` ({source['type']}, 相关性: {source['score']:.3f})")
+        return "\n".join(lines)
     
     def clear_chat(self):
         """清空聊天记录"""
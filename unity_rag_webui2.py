@@ -9,12 +9,14 @@ import warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 warnings.filterwarnings('ignore')
 
+from app.core.config import settings
 from app.services.unity_rag_system import UnityRAGSystem
 
 # 允许在 Jupyter / Colab 环境中重复使用事件循环
 nest_asyncio.apply()
 
-PROJECT_PATH = "/content/unity-ai-generator/unity_projects/ShootBubble/"
+# 默认项目与 API 共用配置（环境变量 RAG_PROJECT_PATH 可覆盖）
+PROJECT_PATH = settings.RAG_PROJECT_PATH
 
 class UnityRAGWebUI:
     def __init__(self):
@@ -48,69 +50,68 @@ class UnityRAGWebUI:
             return self.initialization_status, error_msg
     
     async def ask_question(self, question, chat_history):
-        """处理用户提问 - 修复格式问题"""
+        """处理用户提问 - 流式输出：先显示相关来源，再逐步显示回答"""
         if not self.is_initialized or self.rag_system is None:
             chat_history.append({"role": "user", "content": question})
             chat_history.append({"role": "assistant", "content": "请先初始化系统！"})
-            return chat_history
+            yield chat_history
+            return
         
         if not question.strip():
             chat_history.append({"role": "user", "content": question})
             chat_history.append({"role": "assistant", "content": "请输入有效的问题！"})
-            return chat_history
+            yield chat_history
+            return
         
+        # 添加用户消息和占位的助手消息
+        chat_history.append({"role": "user", "content": question})
+        chat_history.append({"role": "assistant", "content": "🔍 正在检索..."})
+        yield chat_history
+        
+        answer, sources, timing = "", [], None
         try:
-            # 添加用户消息到历史
-            chat_history.append({"role": "user", "content": question})
-            
-            # 获取回答（返回的是字典）
-            response = await self.rag_system.ask_about_unity_project(question)
-            
-            # 提取纯文本回答
-            if isinstance(response, dict):
-                answer = self._format_response(response)
-            else:
-                answer = str(response)
-            
-            # 添加助手回答到历史
-            chat_history.append({"role": "assistant", "content": answer})
-            
-            return chat_history
+            async for event in self.rag_system.ask_stream(question):
+                if event['type'] == 'sources':
+                    sources = event['sources']
+                elif event['type'] == 'token':
+                    answer += event['text']
+                elif event['type'] == 'done':
+                    timing = event
+                elif event['type'] == 'error':
+                    answer += f"\n\n❌ {event['message']}"
+                chat_history[-1]["content"] = self._format_response(question, answer, sources, timing)
+                yield chat_history
             
         except Exception as e:
             error_msg = f"❌ 回答问题时出错: {str(e)}"
             print(f"❌ {error_msg}")
             traceback.print_exc()
-            chat_history.append({"role": "assistant", "content": error_msg})
-            return chat_history
+            chat_history[-1]["content"] = error_msg
+            yield chat_history
     
-    def _format_response(self, response_dict):
-        """格式化RAG系统返回的字典为可读文本"""
-        try:
-            # 提取主要信息
-            question = response_dict.get('question', '')
-            answer = response_dict.get('answer', '')
-            relevant_sources = response_dict.get('relevant_sources', [])
-            
-            # 构建格式化响应
-            formatted_response = f"**问题**: {question}\n\n"
-            formatted_response += f"**回答**: {answer}\n\n"
-            
-            # 添加相关来源
-            if relevant_sources:
-                formatted_response += "**相关来源**:\n"
-                for i, source in enumerate(relevant_sources[:5], 1):  # 只显示前5个
-                    file_path = source.get('file', '未知文件')
-                    score = source.get('score', 0)
-                    file_type = source.get('type', '未知类型')
-                    
-                    formatted_response += f"{i}. `{file_path}` "
-                    formatted_response += f"({file_type}, 相关性: {score:.3f})\n"
-            
-            return formatted_response
-            
-        except Exception as e:
-            return f"格式化响应时出错: {str(e)}\n原始响应: {response_dict}"
+    def _format_response(self, question, answer, relevant_sources, timing=None):
+        """把流式问答的当前进度格式化为可读文本"""
+        formatted_response = f"**问题**: {question}\n\n"
+        formatted_response += f"**回答**: {answer or '⏳ 正在生成回答...'}\n\n"
+        
+        # 添加相关来源
+        if relevant_sources:
+            formatted_response += "**相关来源**:\n"
+            for i, source in enumerate(relevant_sources[:5], 1):  # 只显示前5个
+                file_path = source.get('file', '未知文件')
+                score = source.get('score', 0)
+                file_type = source.get('type', '未知类型')
+                
+                formatted_response += f"{i}. `{file_path}` "
+                formatted_response += f"({file_type}, 相关性: {score:.3f})\n"
+        
+        # 耗时：首个token时间与总时间分开显示
+        if timing:
+            formatted_response += (f"\n⏱️ 检索 {timing['retrieval_ms']:.0f}ms · "
+                                   f"首个token {timing['ttft_ms'] or 0:.0f}ms · "
+                                   f"总计 {timing['total_ms']:.0f}ms")
+        
+        return formatted_response
     
     def clear_chat(self):
         """清空聊天记录"""
@@ -235,12 +236,9 @@ def create_gradio_interface():
             outputs=system_info
         )
         
-        # 提问处理
-        def submit_question(question, history):
-            return asyncio.run(ui_manager.ask_question(question, history))
-        
+        # 提问处理（异步生成器，回答逐步刷新到聊天框）
         submit_btn.click(
-            fn=submit_question,
+            fn=ui_manager.ask_question,
             inputs=[question_input, chatbot],
             outputs=chatbot
         ).then(
@@ -250,7 +248,7 @@ def create_gradio_interface():
         
         # 回车键提交
         question_input.submit(
-            fn=submit_question,
+            fn=ui_manager.ask_question,
             inputs=[question_input, chatbot],
             outputs=chatbot
         ).then(